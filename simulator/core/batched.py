@@ -0,0 +1,261 @@
+"""
+Batched simulator: replays one trace against many configurations in a single pass.
+
+MonolithicKV and PagedKV state for all N configurations lives in NumPy arrays,
+so each trace event is applied to every configuration with a handful of vector
+operations. Their occupancy only depends on counts, which makes the batched
+replay exact: results match main.run_simulation config by config.
+
+Traces must spell out their frees (alloc events with a 'lifetime' are only
+expanded by the discrete-event engine in main.run_simulation) and use alloc/free
+only, without shared prefixes; decode and prefix traces need main.run_simulation.
+Without prefixes PrefixSharedKV behaves exactly like PagedKV, so its columns are
+copies of the paged ones.
+
+PagedCompressedKV and TieredKV are not vectorized (their victim choice depends
+on per-page recency), so when include_compressed / include_tiered are set they
+are replayed with one scalar instance per configuration in the same pass. So is
+MonolithicKV for configurations with a monolithic_placement, whose occupancy
+depends on where each extent was placed.
+"""
+import numpy as np
+
+from memory_models.monolithic_kv import monolithic_from_config
+from memory_models.paged_compressed_kv import compressed_from_config
+from memory_models.tiered_kv import TieredKV, tiers_from_config
+from results.stats import EVICTION_KEYS, eviction_summary
+
+
+class BatchedSimulator:
+    def __init__(self, configs, include_compressed=True, include_tiered=True):
+        self.configs = list(configs)
+
+        def column(key):
+            return np.array([c[key] for c in self.configs], dtype=np.int64)
+
+        self.mono_size = column('monolithic_kv_size')
+        self.num_pages = column('paged_kv_num_pages')
+        self.page_size = column('paged_kv_page_size')
+        self.token_time = np.array([c.get('token_time_us', 0) * 1e-6 for c in self.configs])
+        # config index -> scalar MonolithicKV for configurations placing extents in an arena
+        self.arenas = {i: monolithic_from_config(c) for i, c in enumerate(self.configs)
+                       if c.get('monolithic_placement') not in (None, 'none')}
+
+        self.compressed = []
+        if include_compressed:
+            self.compressed = [compressed_from_config(c) for c in self.configs]
+        self.tiered = []
+        if include_tiered:
+            self.tiered = [
+                TieredKV(tiers_from_config(c), c['paged_kv_page_size'], c.get('kv_bytes_per_token', 1))
+                for c in self.configs
+            ]
+
+    def run(self, trace):
+        """Replay trace against every configuration and return a BatchResult."""
+        trace = list(trace)
+        n_steps, n_cfg = len(trace), len(self.configs)
+
+        mono_usage = np.zeros(n_cfg, dtype=np.int64)
+        paged_free = self.num_pages.copy()
+        paged_tokens = np.zeros(n_cfg, dtype=np.int64)
+        # alloc_id -> per-config amount (monolithic) / (blocks, tokens) (paged) actually granted
+        mono_grants = {}
+        paged_grants = {}
+
+        usage_hist = np.empty((n_steps, n_cfg), dtype=np.int64)
+        free_hist = np.empty((n_steps, n_cfg), dtype=np.int64)
+        tokens_hist = np.empty((n_steps, n_cfg), dtype=np.int64)
+        mono_frag = np.zeros((n_steps, n_cfg))
+        mono_internal = np.zeros((n_steps, n_cfg))
+        mono_costs = np.zeros((2, n_steps, n_cfg))  # bytes compacted, compaction seconds
+        pc_mem = np.zeros((n_steps, n_cfg))
+        pc_frag = np.zeros((n_steps, n_cfg))
+        pc_internal = np.zeros((n_steps, n_cfg))
+        pc_costs = np.zeros((2, n_steps, n_cfg))  # compress, decompress seconds
+        pc_evictions = np.zeros((2, n_steps, n_cfg), dtype=np.int64)  # victims, recompressions
+        tiered_cols = {name: np.zeros((n_steps, n_cfg))
+                       for name in ('memory_tiered', 'fragmentation_tiered', 'internal_fragmentation_tiered')}
+        # bytes_moved_<tier> / stall_<tier> for every slower tier named by any config
+        link_names = dict.fromkeys(name for model in self.tiered for name in model.names[1:])
+        for name in link_names:
+            tiered_cols[f'bytes_moved_{name}'] = np.zeros((n_steps, n_cfg))
+            tiered_cols[f'stall_{name}'] = np.zeros((n_steps, n_cfg))
+        failed = {name: np.zeros((n_steps, n_cfg), dtype=np.int64)
+                  for name in ('failed_monolithic', 'failed_paged', 'failed_paged_compressed', 'failed_tiered')}
+        throughput = np.zeros(n_steps, dtype=np.int64)
+
+        for step, event in enumerate(trace):
+            alloc_id = event['id']
+            if 'prefix' in event:
+                raise ValueError("BatchedSimulator cannot replay shared prefixes; use main.run_simulation")
+            if event['op'] == 'alloc':
+                size = event['size']
+                throughput[step] = size
+
+                ok = mono_usage + size <= self.mono_size
+                for c, model in self.arenas.items():
+                    ok[c] = model.allocate(size, alloc_id)
+                failed['failed_monolithic'][step] = ~ok
+                granted = np.where(ok, size, 0)
+                mono_usage += granted
+                mono_grants[alloc_id] = granted
+
+                blocks = -(-size // self.page_size)
+                ok = blocks <= paged_free
+                failed['failed_paged'][step] = ~ok
+                granted = np.where(ok, blocks, 0)
+                paged_free -= granted
+                stored = np.where(ok, size, 0)
+                paged_tokens += stored
+                paged_grants[alloc_id] = (granted, stored)
+
+                for c, model in enumerate(self.compressed):
+                    if not model.allocate(alloc_id, -(-size // model.page_size), timestamp=event.get('time', step),
+                                          tokens=size):
+                        failed['failed_paged_compressed'][step, c] = 1
+                for c, model in enumerate(self.tiered):
+                    if not model.allocate(alloc_id, -(-size // model.page_size), tokens=size):
+                        failed['failed_tiered'][step, c] = 1
+            elif event['op'] == 'free':
+                if alloc_id in mono_grants:
+                    granted = mono_grants.pop(alloc_id)
+                    mono_usage -= granted
+                    for c, model in self.arenas.items():
+                        if granted[c]:
+                            model.free(int(granted[c]), alloc_id)
+                if alloc_id in paged_grants:
+                    granted, stored = paged_grants.pop(alloc_id)
+                    paged_free += granted
+                    paged_tokens -= stored
+                for model in self.compressed:
+                    model.free(alloc_id)
+                for model in self.tiered:
+                    model.free(alloc_id)
+            else:
+                raise ValueError(f"BatchedSimulator replays alloc/free traces only, got {event['op']!r}")
+
+            for c, model in self.arenas.items():
+                # buddy placement rounds reservations up, so usage comes from the model
+                mono_usage[c] = model.usage
+                occ = model.occupancy()
+                mono_frag[step, c] = occ['fragmentation']
+                mono_internal[step, c] = occ['internal_fragmentation']
+                mono_costs[:, step, c] = model.take_step_costs()
+            usage_hist[step] = mono_usage
+            free_hist[step] = paged_free
+            tokens_hist[step] = paged_tokens
+            for c, model in enumerate(self.compressed):
+                occ = model.occupancy()
+                pc_mem[step, c] = occ['memory']
+                pc_frag[step, c] = occ['fragmentation']
+                pc_internal[step, c] = occ['internal_fragmentation']
+                pc_costs[:, step, c] = model.take_step_costs()
+                pc_evictions[:, step, c] = model.take_step_evictions()
+            for c, model in enumerate(self.tiered):
+                occ = model.occupancy()
+                tiered_cols['memory_tiered'][step, c] = occ['memory']
+                tiered_cols['fragmentation_tiered'][step, c] = occ['fragmentation']
+                tiered_cols['internal_fragmentation_tiered'][step, c] = occ['internal_fragmentation']
+                for name, (moved, stall) in model.take_step_costs().items():
+                    tiered_cols[f'bytes_moved_{name}'][step, c] = moved
+                    tiered_cols[f'stall_{name}'][step, c] = stall
+
+        paged_capacity = (self.num_pages - free_hist) * self.page_size
+        with np.errstate(invalid='ignore', divide='ignore'):
+            paged_internal = np.where(paged_capacity > 0, 1 - tokens_hist / paged_capacity, 0.0)
+        columns = {
+            'memory_monolithic': usage_hist,
+            'memory_paged': paged_capacity,
+            'memory_paged_compressed': pc_mem,
+            'fragmentation_monolithic': mono_frag,
+            'fragmentation_paged': free_hist / self.num_pages,
+            'fragmentation_paged_compressed': pc_frag,
+            # monolithic allocations are exact-size (unless buddy-rounded), so they rarely leave an unfilled tail
+            'internal_fragmentation_monolithic': mono_internal,
+            'internal_fragmentation_paged': paged_internal,
+            'internal_fragmentation_paged_compressed': pc_internal,
+            **failed,
+            **tiered_cols,
+        }
+        for metric in ('memory', 'fragmentation', 'internal_fragmentation', 'failed'):
+            columns[f'{metric}_prefix_shared'] = columns[f'{metric}_paged']
+        columns['memory_saved_prefix_shared'] = np.zeros((n_steps, n_cfg))
+        # every model acts on every alloc (batched traces have no appends)
+        is_alloc = np.array([event['op'] == 'alloc' for event in trace], dtype=np.int64)
+        attempted = np.repeat(is_alloc.reshape(-1, 1), n_cfg, axis=1)
+        for name in ('monolithic', 'paged', 'paged_compressed', 'prefix_shared', 'tiered'):
+            columns[f'attempted_{name}'] = attempted
+        columns['bytes_compacted_monolithic'] = mono_costs[0]
+        columns['compaction_time_monolithic'] = mono_costs[1]
+        columns['compress_time_paged_compressed'] = pc_costs[0]
+        columns['decompress_time_paged_compressed'] = pc_costs[1]
+        columns['victims_paged_compressed'] = pc_evictions[0]
+        columns['recompressions_paged_compressed'] = pc_evictions[1]
+        tier_stall = np.zeros((n_steps, n_cfg))
+        for name in link_names:
+            tier_stall = tier_stall + tiered_cols[f'stall_{name}']
+        overhead = {'monolithic': mono_costs[1], 'paged_compressed': pc_costs[0] + pc_costs[1], 'tiered': tier_stall}
+        compute = throughput[:, None] * self.token_time
+        for name in ('monolithic', 'paged', 'paged_compressed', 'prefix_shared', 'tiered'):
+            served = np.where(columns[f'failed_{name}'] == 0, compute, 0.0)
+            columns[f'latency_{name}'] = served + overhead.get(name, 0.0)
+        return BatchResult(self.configs, trace, throughput, columns)
+
+
+class BatchResult:
+    """Per-step metrics for every configuration: columns[name] has shape (steps, configs)."""
+
+    def __init__(self, configs, trace, throughput, columns):
+        self.configs = configs
+        self.trace = trace
+        self.throughput = throughput
+        self.columns = columns
+
+    def records(self, index):
+        """Materialize main.py-style record dicts for configuration `index`."""
+        cols = {k: v[:, index].tolist() for k, v in self.columns.items()}
+        throughput = self.throughput.tolist()
+        out = []
+        for step, event in enumerate(self.trace):
+            record = {'step': step, 'time': event.get('time', step), 'event': event, 'throughput': throughput[step]}
+            for k, values in cols.items():
+                record[k] = values[step]
+            out.append(record)
+        return out
+
+    def stats(self):
+        """compute_stats-shaped summaries for every configuration, computed column-wise."""
+        if not self.trace:
+            return [{} for _ in self.configs]
+        peak = {k: v.max(axis=0) for k, v in self.columns.items()}
+        avg = {k: v.mean(axis=0) for k, v in self.columns.items()}
+        throughput_avg = float(self.throughput.mean())
+        total = {name: self.columns[key].sum(axis=0) for name, key in EVICTION_KEYS.items()}
+        out = []
+        for c in range(len(self.configs)):
+            out.append({
+                'monolithic': {'peak': peak['memory_monolithic'][c].item(), 'avg': avg['memory_monolithic'][c].item()},
+                'paged': {'peak': peak['memory_paged'][c].item(), 'avg': avg['memory_paged'][c].item()},
+                'paged_compressed': {'peak': peak['memory_paged_compressed'][c].item(), 'avg': avg['memory_paged_compressed'][c].item(),
+                                     **eviction_summary({name: int(t[c]) for name, t in total.items()})},
+                'prefix_shared': {'peak': peak['memory_prefix_shared'][c].item(), 'avg': avg['memory_prefix_shared'][c].item(),
+                                  'saved_peak': 0.0, 'saved_avg': 0.0},
+                'tiered': {'peak': peak['memory_tiered'][c].item(), 'avg': avg['memory_tiered'][c].item()},
+                'fragmentation': {
+                    'monolithic': avg['fragmentation_monolithic'][c].item(),
+                    'paged': avg['fragmentation_paged'][c].item(),
+                    'paged_compressed': avg['fragmentation_paged_compressed'][c].item(),
+                    'prefix_shared': avg['fragmentation_prefix_shared'][c].item(),
+                    'tiered': avg['fragmentation_tiered'][c].item(),
+                },
+                'internal_fragmentation': {
+                    'monolithic': avg['internal_fragmentation_monolithic'][c].item(),
+                    'paged': avg['internal_fragmentation_paged'][c].item(),
+                    'paged_compressed': avg['internal_fragmentation_paged_compressed'][c].item(),
+                    'prefix_shared': avg['internal_fragmentation_prefix_shared'][c].item(),
+                    'tiered': avg['internal_fragmentation_tiered'][c].item(),
+                },
+                'throughput_avg': throughput_avg,
+            })
+        return out
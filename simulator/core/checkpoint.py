@@ -0,0 +1,96 @@
+"""
+Checkpoint, resume and fork of a main.run_simulation run.
+
+A snapshot holds everything needed to continue a run: every model's state
+(pages, last_access, usage, block tables, ...), the allocs_* tables, the
+engine's clock, queue and trace cursor (plus the trace's own state such as the
+synthetic generator's RNG), the online stats and the number of records logged.
+It is pickled, zlib-compressed and written atomically behind a magic header.
+
+Resuming rebuilds the trace from the snapshot's config and seed and moves it to
+the saved cursor, so the events before the snapshot are not simulated again.
+Resuming with a different config forks the run: tunables (compaction, pressure
+threshold, compression ratio and costs, token time, tier link speeds, ...) take
+effect from the snapshot on, while keys that define the trace or the pool
+geometry (placement and eviction policies included) must match (check_fork).
+"""
+import os
+import pickle
+import zlib
+
+from utils.instrumentation import TIMED_METHODS
+
+MAGIC = b'KVSNAP\x00'
+VERSION = 2
+# Config keys a fork may not change: they define the trace, the models' pool geometry or their policies
+FROZEN_KEYS = ('monolithic_kv_size', 'monolithic_placement', 'paged_kv_num_pages', 'paged_kv_page_size',
+               'kv_bytes_per_token', 'eviction_policy', 'simulation_steps', 'workload', 'trace_file')
+
+
+def _model_state(model):
+    """The model's attributes without instrumentation (timers wrap methods on the instance)."""
+    state = {k: v for k, v in vars(model).items() if k not in TIMED_METHODS}
+    state['counters'] = None
+    return type(model), state
+
+
+def _model_from_state(packed):
+    cls, state = packed
+    model = cls.__new__(cls)
+    model.__dict__.update(state)
+    return model
+
+
+def save_snapshot(path, state):
+    """Write a snapshot dict (see main.run_simulation) to path; a crash mid-write keeps the old file."""
+    state = dict(state, version=VERSION)
+    state['models'] = {name: _model_state(m) for name, m in state['models'].items()}
+    payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 6)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(payload)
+    os.replace(tmp, path)
+    return len(MAGIC) + len(payload)
+
+
+def load_snapshot(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a simulation snapshot")
+        state = pickle.loads(zlib.decompress(f.read()))
+    if state.get('version') != VERSION:
+        raise ValueError(f"unsupported snapshot version {state.get('version')} in {path}")
+    state['models'] = {name: _model_from_state(packed) for name, packed in state['models'].items()}
+    return state
+
+
+def _tier_geometry(config):
+    return [(t.get('name'), t.get('pages')) for t in config.get('tiers') or []]
+
+
+def check_fork(snapshot_config, config):
+    """Raise ValueError if config changes a key that a run resumed from snapshot_config cannot change."""
+    changed = [k for k in FROZEN_KEYS if snapshot_config.get(k) != config.get(k)]
+    if _tier_geometry(snapshot_config) != _tier_geometry(config):
+        changed.append('tiers (names/pages)')
+    if changed:
+        raise ValueError(f"cannot fork with a different {', '.join(changed)}; only tunables may change")
+
+
+def apply_tunables(models, config):
+    """Push a fork's tunable parameters into restored models."""
+    from memory_models.paged_compressed_kv import compression_from_config
+    from memory_models.tiered_kv import tiers_from_config
+
+    monolithic = models['monolithic']
+    monolithic.compaction = config.get('monolithic_compaction', False)
+    monolithic.compaction_bandwidth = config.get('compaction_bandwidth_gbps', 0) * 1e9
+    compressed = models['paged_compressed']
+    ratio, compressed.compress_time, compressed.decompress_time = compression_from_config(config)
+    compressed.compression_ratio = float(ratio)
+    compressed.pressure_threshold = config['pressure_threshold']
+    tiered = models['tiered']
+    tiers = tiers_from_config(config)
+    tiered.bandwidth = [t.get('bandwidth_gbps', 0) * 1e9 for t in tiers]
+    tiered.latency = [t.get('latency_us', 0) * 1e-6 for t in tiers]
@@ -1,19 +1,145 @@
 """
 Core simulation engine for memory management policies.
 Handles simulation loop, clock cycles, and event scheduling.
+
+SimulatorEngine is a discrete-event scheduler: events are dicts with an 'op'
+(and optionally a 'time'), kept in a heapq ordered by (time, insertion order).
+Handlers registered per op run when an event fires and may schedule further
+events (e.g. the free for an allocation with a known lifetime). The clock jumps
+straight to the next event, so idle time costs nothing and a run takes time
+proportional to the number of events rather than the number of clock ticks.
+
+snapshot() captures the clock, the queue and the source cursor (with the
+source's own state() when it has one, e.g. the synthetic trace's RNG), and
+restore() continues from it, so a run can be checkpointed and resumed or forked.
 """
+import heapq
+import itertools
+
 
 class SimulatorEngine:
-    def __init__(self, config):
-        self.config = config
+    def __init__(self, config=None):
+        self.config = config or {}
         self.time = 0
-        self.events = []
+        self.events = []  # heap of (time, seq, event)
+        self.handlers = {}  # op -> [handler(engine, event)]
+        self.observers = []  # called with (engine, event) after every event's handlers
+        self.processed = 0
+        self._seq = itertools.count()
+        self._source = None
+        self._source_index = 0  # source events pulled so far (the pending one included)
+        self._next_source = None
+        self._stopping = False
+
+    def register(self, op, handler):
+        """Run handler(engine, event) for every event whose op matches."""
+        self.handlers.setdefault(op, []).append(handler)
+
+    def observe(self, observer):
+        """Run observer(engine, event) after each event has been handled."""
+        self.observers.append(observer)
+
+    def schedule(self, time, event):
+        """Queue event at absolute time (not earlier than the current clock)."""
+        if time < self.time:
+            raise ValueError(f"cannot schedule {event!r} at {time}, clock is already at {self.time}")
+        heapq.heappush(self.events, (time, next(self._seq), event))
+
+    def schedule_after(self, delay, event):
+        self.schedule(self.time + delay, event)
+
+    def add_source(self, events):
+        """
+        Attach a (possibly lazy) stream of events in non-decreasing 'time' order; events
+        without a 'time' take their position in the stream. The stream is merged with
+        scheduled events one at a time instead of being loaded into the queue.
+        """
+        self._source = iter(events)
+        self._source_index = 0
+        self._advance_source()
+
+    def _advance_source(self):
+        event = next(self._source, None) if self._source is not None else None
+        if event is None:
+            self._source = self._next_source = None
+            return
+        self._next_source = (event.get('time', self._source_index), event)
+        self._source_index += 1
+
+    def _pop_next(self):
+        """Next event across the queue and the source; queued events win ties."""
+        if self._next_source is not None and (not self.events or self._next_source[0] < self.events[0][0]):
+            time, event = self._next_source
+            self._advance_source()
+            return time, event
+        if self.events:
+            time, _, event = heapq.heappop(self.events)
+            return time, event
+        return None
+
+    def stop(self):
+        """Make run() return after the event being processed (e.g. from an observer)."""
+        self._stopping = True
+
+    @property
+    def stopped(self):
+        """True if the last run() returned because stop() was called."""
+        return self._stopping
+
+    def run(self, until=None):
+        """Process events in time order, optionally stopping before the first event after `until`."""
+        self._stopping = False
+        while not self._stopping:
+            item = self._pop_next()
+            if item is None:
+                break
+            time, event = item
+            if until is not None and time > until:
+                # put it back so a later run() resumes from here
+                heapq.heappush(self.events, (time, next(self._seq), event))
+                break
+            self.time = time
+            self.process_event(event)
+        return self.processed
+
+    def process_event(self, event):
+        for handler in self.handlers.get(event['op'], ()):
+            handler(self, event)
+        for observer in self.observers:
+            observer(self, event)
+        self.processed += 1
 
-    def run(self, steps):
-        for _ in range(steps):
-            self.time += 1
-            self.process_events()
+    def snapshot(self):
+        """Picklable state of the clock, queue and source cursor (handlers are not included)."""
+        source = self._source
+        return {
+            'time': self.time,
+            'events': list(self.events),
+            'processed': self.processed,
+            'seq': next(self._seq),
+            'source_index': self._source_index,
+            'next_source': self._next_source,
+            'source_done': source is None,
+            'source_state': source.state() if hasattr(source, 'state') else None,
+        }
 
-    def process_events(self):
-        # Placeholder for event processing logic
-        pass
+    def restore(self, state, events):
+        """
+        Continue from snapshot() with `events`, a fresh copy of the same source: it is restored
+        from its saved state when it has one, else its first events are skipped.
+        """
+        self.time = state['time']
+        self.events = list(state['events'])
+        self.processed = state['processed']
+        self._seq = itertools.count(state['seq'])
+        self._source_index = state['source_index']
+        self._next_source = state['next_source']
+        if state['source_done']:
+            self._source = None
+            return
+        source = iter(events)
+        if state['source_state'] is not None and hasattr(source, 'restore'):
+            source.restore(state['source_state'])
+        else:
+            source = itertools.islice(source, self._source_index, None)
+        self._source = source
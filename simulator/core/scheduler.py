@@ -0,0 +1,334 @@
+"""
+Continuous-batching request scheduler on top of the memory models.
+
+Instead of replaying a fixed trace (where a failed allocation is just a failed
+event), requests from utils.workloads.generate_requests are queued and the
+scheduler decides when they run, the way an LLM server does. Each iteration
+(one forward pass):
+
+  1. every running sequence decodes one token (appending its KV); when the
+     model runs out of pages the lowest-ranked running sequence is preempted,
+     either dropped and recomputed later ('recompute') or copied out to host
+     memory and back ('swap', charged at swap_bandwidth), and the append retried
+  2. waiting requests are admitted in policy order while the batch has room
+     (max_batch_size sequences, max_batch_tokens tokens including the decodes)
+     and their prefill fits in memory; a prefill emits the first token
+
+Policies rank both queues: 'fcfs' (arrival order), 'shortest' (fewest
+prompt + generated tokens first; generation lengths are known to the
+simulator, so this is the oracle shortest-job-first) and 'priority' (the
+request's priority, 0 = most urgent, then arrival).
+
+An iteration lasts step_overhead + token_time * tokens processed, plus swap
+transfers and the model's own stalls (compression, tier offload). Per request
+the scheduler records queueing delay (arrival to first admission),
+time-to-first-token and time per output token; serving_summary turns them into
+percentiles, throughput and goodput (tokens of requests that met the TTFT/TPOT
+SLOs per second).
+
+A request that cannot fit in memory on its own is aborted rather than retried
+forever.
+"""
+import heapq
+
+import numpy as np
+
+from memory_models.monolithic_kv import monolithic_from_config
+from memory_models.paged_compressed_kv import compressed_from_config
+from memory_models.paged_kv import PagedKV
+from memory_models.prefix_shared_kv import PrefixSharedKV
+from memory_models.tiered_kv import TieredKV, tiers_from_config
+
+POLICIES = ('fcfs', 'shortest', 'priority')
+PREEMPTION_MODES = ('recompute', 'swap')
+
+
+def build_serving_models(config):
+    """
+    One fresh instance of every memory model behind a common interface: name -> {'prefill', 'append',
+    'end', 'stall'}. prefill(seq_id, tokens, max_len, prefix, prefix_len, step) and append(seq_id, step)
+    return True/False, end(seq_id) releases a sequence and stall() drains the model's step costs in seconds.
+    """
+    page_size = config['paged_kv_page_size']
+    max_seq_len = config.get('max_seq_len', 0)
+    monolithic = monolithic_from_config(config)
+    paged = PagedKV(config['paged_kv_num_pages'], page_size)
+    paged_compressed = compressed_from_config(config)
+    prefix_shared = PrefixSharedKV(config['paged_kv_num_pages'], page_size)
+    tiered = TieredKV(tiers_from_config(config), page_size, config.get('kv_bytes_per_token', 1))
+
+    def no_stall():
+        return 0.0
+
+    return {
+        'monolithic': {
+            # the contiguous buffer is reserved for the request's whole output (max_tokens) up front
+            'prefill': lambda seq_id, tokens, max_len, prefix, prefix_len, step:
+                monolithic.prefill(seq_id, tokens, max_len=max(max_len, max_seq_len)),
+            'append': lambda seq_id, step: monolithic.append(seq_id),
+            'end': monolithic.end,
+            'stall': lambda: monolithic.take_step_costs()[1],
+        },
+        'paged': {
+            'prefill': lambda seq_id, tokens, max_len, prefix, prefix_len, step: paged.prefill(seq_id, tokens),
+            'append': lambda seq_id, step: paged.append(seq_id),
+            'end': paged.end,
+            'stall': no_stall,
+        },
+        'paged_compressed': {
+            'prefill': lambda seq_id, tokens, max_len, prefix, prefix_len, step:
+                paged_compressed.prefill(seq_id, tokens, timestamp=step),
+            'append': lambda seq_id, step: paged_compressed.append(seq_id, timestamp=step),
+            'end': paged_compressed.end,
+            'stall': lambda: sum(paged_compressed.take_step_costs()),
+        },
+        'prefix_shared': {
+            'prefill': lambda seq_id, tokens, max_len, prefix, prefix_len, step:
+                prefix_shared.prefill(seq_id, tokens, prefix=prefix, prefix_len=prefix_len),
+            'append': lambda seq_id, step: prefix_shared.append(seq_id),
+            'end': prefix_shared.end,
+            'stall': no_stall,
+        },
+        'tiered': {
+            'prefill': lambda seq_id, tokens, max_len, prefix, prefix_len, step: tiered.prefill(seq_id, tokens),
+            'append': lambda seq_id, step: tiered.append(seq_id),
+            'end': tiered.end,
+            'stall': lambda: sum(stall for _, stall in tiered.take_step_costs().values()),
+        },
+    }
+
+
+class ContinuousBatchScheduler:
+    def __init__(self, model, max_batch_size=64, max_batch_tokens=4096, policy='fcfs', preemption='recompute',
+                 token_time=0.0, step_overhead=0.0, tick=1e-3, swap_bandwidth=0.0, bytes_per_token=1):
+        """
+        model: one entry of build_serving_models. Times are in seconds; tick converts request arrival
+        ticks to seconds and swap_bandwidth is in bytes/s (0: swapping is free).
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"unknown scheduling policy {policy!r}; expected one of {POLICIES}")
+        if preemption not in PREEMPTION_MODES:
+            raise ValueError(f"unknown preemption mode {preemption!r}; expected one of {PREEMPTION_MODES}")
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.policy = policy
+        self.preemption = preemption
+        self.token_time = token_time
+        self.step_overhead = step_overhead
+        self.tick = tick
+        self.swap_bandwidth = swap_bandwidth
+        self.bytes_per_token = bytes_per_token
+        self.iterations = 0
+        self.preemptions = 0
+        self.batch_sizes = 0  # summed over iterations
+
+    def _keys(self, requests):
+        ids = requests['id'].tolist()
+        if self.policy == 'fcfs':
+            return list(zip(requests['arrival'].tolist(), ids))
+        if self.policy == 'shortest':
+            return list(zip((requests['prompt'] + requests['generated']).tolist(), ids))
+        return list(zip(requests['priority'].tolist(), requests['arrival'].tolist(), ids))
+
+    def _swap_time(self, tokens):
+        return tokens * self.bytes_per_token / self.swap_bandwidth if self.swap_bandwidth else 0.0
+
+    def run(self, requests):
+        """
+        Serve a REQUEST_DTYPE array (arrival order) to completion. Returns per-request arrays (seconds,
+        NaN where a request never got that far): 'queueing_delay', 'ttft', 'tpot', 'finish', plus
+        'generated' and 'completed'.
+        """
+        model = self.model
+        n = len(requests)
+        arrival = (requests['arrival'] * self.tick).tolist()
+        prompt = requests['prompt'].tolist()
+        generated = requests['generated'].tolist()
+        prefix = requests['prefix'].tolist()
+        prefix_len = requests['prefix_len'].tolist()
+        keys = self._keys(requests)
+        # request index -> tokens emitted so far; timestamps of its first admission, first token, finish
+        emitted = [0] * n
+        admitted_at = [None] * n
+        first_token = [None] * n
+        finish = [None] * n
+        swapped = set()
+        waiting = []  # heap of (policy key, request index)
+        running = []
+        done = 0
+        next_arrival = 0
+        now = 0.0
+
+        def preempt(index):
+            model['end'](index)
+            self.preemptions += 1
+            heapq.heappush(waiting, (keys[index], index))
+            if self.preemption == 'swap':
+                swapped.add(index)
+                return self._swap_time(prompt[index] + emitted[index])
+            return 0.0
+
+        while done < n:
+            while next_arrival < n and arrival[next_arrival] <= now:
+                heapq.heappush(waiting, (keys[next_arrival], next_arrival))
+                next_arrival += 1
+            if not running and not waiting:
+                now = arrival[next_arrival]
+                continue
+            self.iterations += 1
+            step = self.iterations
+            stall = 0.0
+
+            # 1. decode one token for every running sequence, best-ranked first
+            running.sort(key=keys.__getitem__)
+            i = 0
+            while i < len(running):
+                index = running[i]
+                if model['append'](index, step):
+                    i += 1
+                    continue
+                # out of pages: preempt the lowest-ranked sequence and retry
+                victim = running.pop()
+                if victim == index and i == 0:
+                    # nothing else holds memory, so it can never grow: abort it
+                    model['end'](index)
+                    done += 1
+                    continue
+                stall += preempt(victim)
+            decoding = list(running)
+            tokens = len(decoding)
+
+            # 2. admit waiting requests while the batch has room and their prefill fits
+            admitted = []
+            while waiting and len(running) < self.max_batch_size:
+                index = waiting[0][1]
+                context = prompt[index] + emitted[index]
+                swap_in = index in swapped
+                cost = 0 if swap_in else context
+                if running and tokens + cost > self.max_batch_tokens:
+                    break
+                if not model['prefill'](index, context, prompt[index] + generated[index],
+                                        prefix[index], prefix_len[index], step):
+                    if running:
+                        break
+                    # alone in an empty pool and still too big
+                    heapq.heappop(waiting)
+                    done += 1
+                    continue
+                heapq.heappop(waiting)
+                if swap_in:
+                    swapped.discard(index)
+                    stall += self._swap_time(context)
+                if admitted_at[index] is None:
+                    admitted_at[index] = now
+                tokens += cost
+                running.append(index)
+                admitted.append(index)
+
+            self.batch_sizes += len(running)
+            now += self.step_overhead + self.token_time * tokens + stall + model['stall']()
+
+            for index in decoding:
+                emitted[index] += 1
+            for index in admitted:
+                if emitted[index] == 0:
+                    emitted[index] = 1
+                    first_token[index] = now
+            finished = [index for index in running if emitted[index] >= generated[index]]
+            for index in finished:
+                model['end'](index)
+                finish[index] = now
+                done += 1
+            if finished:
+                running = [index for index in running if finish[index] is None]
+
+        def times(values, start):
+            return np.array([np.nan if v is None else v - s for v, s in zip(values, start)])
+
+        ttft = times(first_token, arrival)
+        decode_time = times(finish, first_token)
+        steps = np.maximum(np.array(generated) - 1, 1)
+        return {
+            'queueing_delay': times(admitted_at, arrival),
+            'ttft': ttft,
+            'tpot': decode_time / steps,
+            'finish': np.array([np.nan if v is None else v for v in finish]),
+            'arrival': np.array(arrival),
+            'generated': np.array(generated),
+            'completed': np.array([v is not None for v in finish]),
+        }
+
+
+def serving_summary(result, scheduler, ttft_slo=None, tpot_slo=None):
+    """Percentiles (seconds), throughput and goodput of one ContinuousBatchScheduler.run result."""
+    completed = result['completed']
+    good = completed.copy()
+    if ttft_slo is not None:
+        good &= result['ttft'] <= ttft_slo
+    if tpot_slo is not None:
+        good &= result['tpot'] <= tpot_slo
+    makespan = float(np.nanmax(result['finish']) - result['arrival'].min()) if completed.any() else 0.0
+
+    def percentiles(values):
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {'mean': float(values.mean()), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+    def per_second(count):
+        return float(count) / makespan if makespan else 0.0
+
+    return {
+        'completed': int(completed.sum()),
+        'aborted': int(len(completed) - completed.sum()),
+        'preemptions': scheduler.preemptions,
+        'iterations': scheduler.iterations,
+        'mean_batch_size': scheduler.batch_sizes / scheduler.iterations if scheduler.iterations else 0.0,
+        'makespan_s': makespan,
+        'queueing_delay': percentiles(result['queueing_delay']),
+        'ttft': percentiles(result['ttft']),
+        'tpot': percentiles(result['tpot']),
+        'throughput_tokens_s': per_second(result['generated'][completed].sum()),
+        'goodput_tokens_s': per_second(result['generated'][good].sum()),
+        'goodput_requests_s': per_second(good.sum()),
+    }
+
+
+def serve_all(config, requests, models=None):
+    """Run the config's `scheduler:` block over requests once per memory model; name -> serving_summary."""
+    params = config.get('scheduler') or {}
+    ttft_slo = params.get('ttft_slo_ms')
+    tpot_slo = params.get('tpot_slo_ms')
+    summaries = {}
+    for name, model in build_serving_models(config).items():
+        if models and name not in models:
+            continue
+        scheduler = ContinuousBatchScheduler(
+            model,
+            max_batch_size=params.get('max_batch_size', 64),
+            max_batch_tokens=params.get('max_batch_tokens', 4096),
+            policy=params.get('policy', 'fcfs'),
+            preemption=params.get('preemption', 'recompute'),
+            token_time=config.get('token_time_us', 0) * 1e-6,
+            step_overhead=params.get('step_overhead_us', 0) * 1e-6,
+            tick=params.get('tick_us', 1000) * 1e-6,
+            swap_bandwidth=params.get('swap_bandwidth_gbps', 0) * 1e9,
+            bytes_per_token=config.get('kv_bytes_per_token', 1),
+        )
+        result = scheduler.run(requests)
+        summaries[name] = serving_summary(result, scheduler,
+                                          ttft_slo=ttft_slo * 1e-3 if ttft_slo is not None else None,
+                                          tpot_slo=tpot_slo * 1e-3 if tpot_slo is not None else None)
+    return summaries
+
+
+def format_serving_table(summaries):
+    lines = [f"{'model':<17} {'done':>6} {'abort':>5} {'preempt':>7} {'ttft p50':>9} {'ttft p99':>9} "
+             f"{'queue p99':>9} {'tpot p50':>9} {'tok/s':>9} {'goodput':>9}"]
+    for name, s in summaries.items():
+        lines.append(f"{name:<17} {s['completed']:>6} {s['aborted']:>5} {s['preemptions']:>7} "
+                     f"{s['ttft']['p50']:>9.3f} {s['ttft']['p99']:>9.3f} {s['queueing_delay']['p99']:>9.3f} "
+                     f"{s['tpot']['p50']:>9.4f} {s['throughput_tokens_s']:>9.1f} {s['goodput_tokens_s']:>9.1f}")
+    return '\n'.join(lines)
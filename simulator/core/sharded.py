@@ -0,0 +1,224 @@
+"""
+Sharded multi-device simulation.
+
+The trace is split across N devices, each holding its own copy of every memory
+model sized by the config (the config describes one device). A router assigns
+each request (alloc or sequence id) to a device when it first appears, and all of
+that request's events follow it:
+
+  round_robin   requests go to devices in turn, in order of arrival
+  hash          a multiplicative hash of the request id
+  least_loaded  the device with the fewest outstanding tokens routed to it so far
+                (grown by alloc/prefill/append, released by free/end), as a load
+                balancer that only sees its own traffic would choose
+
+Routing happens up front in the parent, so the devices never talk to each other:
+the trace is reordered into one contiguous run of rows per device in shared
+memory and every device's run is replayed by main.run_simulation in a worker
+process. Workers feed OnlineStats and sample each model's memory on a common time
+grid, from which the parent builds aggregate occupancy and the imbalance between
+devices (max / mean device memory; 1.0 is perfectly balanced), averaged over
+the grid weighted by cluster memory and taken at the aggregate peak.
+
+Like core/batched.py, traces must spell out their frees. Shared prefixes are only
+shared between requests routed to the same device.
+"""
+import os
+import time
+
+import numpy as np
+
+from core.sweep import shared_trace_pool, worker_trace
+from results.stats import FAILURE_KEYS, MEMORY_KEYS, OnlineStats
+from utils.helpers import (OP_ALLOC, OP_APPEND, OP_END, OP_FREE, OP_PREFILL, generate_synthetic_trace,
+                           iter_trace_array, trace_to_array)
+from utils.trace_io import open_trace
+from utils.workloads import workload_from_config
+
+PLACEMENTS = ('round_robin', 'hash', 'least_loaded')
+# Fibonacci hashing multiplier (2^64 / golden ratio)
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _first_seen(ids):
+    """(unique ids in order of first appearance, index of each row's id in that order)."""
+    unique, first, inverse = np.unique(ids, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(unique), dtype=np.int64)
+    rank[order] = np.arange(len(unique))
+    return unique[order], rank[inverse.reshape(-1)]
+
+
+def _least_loaded(trace, devices):
+    """Device per row, sending each new request to the device with the fewest outstanding tokens."""
+    load = [0] * devices
+    device_of = {}  # request id -> device
+    outstanding = {}  # request id -> tokens routed and not yet released
+    out = np.empty(len(trace), dtype=np.int64)
+    for row, (op, request, size) in enumerate(zip(trace['op'].tolist(), trace['id'].tolist(),
+                                                  trace['size'].tolist())):
+        device = device_of.get(request)
+        if device is None:
+            device = device_of[request] = load.index(min(load))
+        if op in (OP_ALLOC, OP_PREFILL, OP_APPEND):
+            load[device] += size
+            outstanding[request] = outstanding.get(request, 0) + size
+        elif op in (OP_FREE, OP_END):
+            load[device] -= outstanding.pop(request, 0)
+        out[row] = device
+    return out
+
+
+def assign_devices(trace, devices, placement='round_robin'):
+    """Device index for every row of a TRACE_DTYPE array; a request's rows all go to one device."""
+    if placement not in PLACEMENTS:
+        raise ValueError(f"unknown shard placement {placement!r}; expected one of {', '.join(PLACEMENTS)}")
+    if placement == 'least_loaded':
+        return _least_loaded(trace, devices)
+    requests, index = _first_seen(trace['id'])
+    if placement == 'round_robin':
+        per_request = np.arange(len(requests)) % devices
+    else:
+        hashed = (requests.astype(np.uint64) * _HASH_MULTIPLIER) >> np.uint64(32)
+        per_request = (hashed % np.uint64(devices)).astype(np.int64)
+    return per_request[index]
+
+
+def shard_trace(trace, devices, placement='round_robin'):
+    """(rows reordered device by device, keeping each device's rows in trace order; row bounds per device)."""
+    assignment = assign_devices(trace, devices, placement)
+    order = np.argsort(assignment, kind='stable')
+    bounds = np.searchsorted(assignment[order], np.arange(devices + 1))
+    return trace[order], bounds
+
+
+class OccupancySampler:
+    """
+    Logger for run_simulation that keeps each model's memory at fixed times: row k
+    holds the occupancy after every event at or before grid[k].
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.samples = np.zeros((len(grid), len(MEMORY_KEYS)))
+        self._next = 0
+        self._last = [0.0] * len(MEMORY_KEYS)
+
+    def log(self, record):
+        t = record['time']
+        grid = self.grid
+        i = self._next
+        if i < len(grid) and grid[i] < t:
+            j = int(np.searchsorted(grid, t, side='left'))
+            self.samples[i:j] = self._last
+            self._next = j
+        self._last = [record[key] for key in MEMORY_KEYS.values()]
+
+    def finish(self):
+        self.samples[self._next:] = self._last
+        self._next = len(self.grid)
+        return self.samples
+
+
+def _run_device(task):
+    # imported here so the pool workers resolve main's models without a cycle at import time
+    from main import run_simulation
+
+    device, start, stop, config, grid = task
+    stats = OnlineStats(window=config.get('stats_window', 1000))
+    sampler = OccupancySampler(grid)
+    began = time.perf_counter()
+    run_simulation(config, iter_trace_array(worker_trace()[start:stop]), sampler, stats=stats)
+    return {
+        'device': device,
+        'events': stop - start,
+        'elapsed': time.perf_counter() - began,
+        'summary': stats.summary(),
+        'attempts': dict(stats.attempts),
+        'failures': {name: stats.failures[key] for name, key in FAILURE_KEYS.items()},
+        'samples': sampler.finish(),
+    }
+
+
+def _build_trace(config, seed, trace_file):
+    if trace_file:
+        return open_trace(trace_file)
+    if config.get('workload'):
+        return workload_from_config(config['workload'], seed=seed)
+    return trace_to_array(generate_synthetic_trace(config['simulation_steps'], 'mixed', seed=seed))
+
+
+def run_sharded(config, devices, placement='round_robin', seed=None, workers=None, trace_file=None, samples=1000):
+    """
+    Route the run's trace over `devices` devices and replay every device in a worker process.
+
+    The trace comes from trace_file, else the config's `workload:` block, else the legacy
+    generator over config['simulation_steps']. Returns {'devices': [per-device results],
+    'aggregate': {model: ...}, 'wall_time', 'busy_time', 'speedup'}; busy_time sums the
+    workers' own replay times, so speedup = busy_time / wall_time.
+    """
+    began = time.perf_counter()
+    trace = _build_trace(config, seed, trace_file)
+    ordered, bounds = shard_trace(trace, devices, placement)
+    if len(trace):
+        grid = np.linspace(float(trace['timestamp'].min()), float(trace['timestamp'].max()), samples)
+    else:
+        grid = np.zeros(0)
+    tasks = [(d, int(bounds[d]), int(bounds[d + 1]), config, grid) for d in range(devices)]
+
+    with shared_trace_pool(ordered, min(devices, workers or os.cpu_count())) as pool:
+        results = list(pool.map(_run_device, tasks))
+
+    wall = time.perf_counter() - began
+    busy = sum(r['elapsed'] for r in results)
+    return {
+        'devices': results,
+        'aggregate': aggregate_devices(results),
+        'wall_time': wall,
+        'busy_time': busy,
+        'speedup': busy / wall if wall else 0.0,
+    }
+
+
+def aggregate_devices(results):
+    """Per model: cluster-wide memory, device imbalance and failures from the device results."""
+    aggregate = {}
+    for m, name in enumerate(MEMORY_KEYS):
+        attempts = sum(r['attempts'][name] for r in results)
+        memory = np.array([r['samples'][:, m] for r in results])  # devices x samples
+        total = memory.sum(axis=0)
+        mean = memory.mean(axis=0)
+        busy = mean > 0
+        imbalance = memory.max(axis=0)[busy] / mean[busy]
+        # weighted by cluster memory, so the near-empty ramp up and drain do not dominate
+        weights = total[busy]
+        peak = int(total.argmax()) if total.size else 0
+        failures = [r['failures'][name] for r in results]
+        peaks = [r['summary'][name]['peak'] if r['summary'] else 0.0 for r in results]
+        aggregate[name] = {
+            'memory_peak': total.max().item() if total.size else 0.0,
+            'memory_avg': total.mean().item() if total.size else 0.0,
+            'device_peak_max': max(peaks),
+            'device_peak_min': min(peaks),
+            'imbalance_avg': float(np.average(imbalance, weights=weights)) if imbalance.size else 1.0,
+            'imbalance_at_peak': float(memory[:, peak].max() / mean[peak]) if imbalance.size else 1.0,
+            'failures': sum(failures),
+            'failure_rate': sum(failures) / attempts if attempts else 0.0,
+            'device_failures': failures,
+        }
+    return aggregate
+
+
+def format_sharded_table(result):
+    """Plain-text per-model table of a run_sharded result."""
+    devices = result['devices']
+    header = (f"{'model':<18}{'peak':>12}{'avg':>12}{'dev peak max':>14}{'dev peak min':>14}"
+              f"{'imb avg':>9}{'imb @peak':>10}{'failures':>10}{'fail rate':>11}")
+    lines = [f"{len(devices)} devices, events per device {min(r['events'] for r in devices)}.."
+             f"{max(r['events'] for r in devices)}; wall {result['wall_time']:.2f} s, "
+             f"worker time {result['busy_time']:.2f} s (speedup x{result['speedup']:.2f})", header]
+    for name, agg in result['aggregate'].items():
+        lines.append(f"{name:<18}{agg['memory_peak']:>12.0f}{agg['memory_avg']:>12.1f}{agg['device_peak_max']:>14.0f}"
+                     f"{agg['device_peak_min']:>14.0f}{agg['imbalance_avg']:>9.3f}{agg['imbalance_at_peak']:>10.3f}"
+                     f"{agg['failures']:>10}{agg['failure_rate']:>11.4f}")
+    return '\n'.join(lines)
@@ -0,0 +1,143 @@
+"""
+Parameter sweep runner.
+
+Expands a grid (and/or explicit list) of config overrides, generates one seeded
+trace, places it in shared memory and fans the runs out across a process pool.
+Each worker attaches to the shared trace once, replays it for its configs and
+returns its OnlineStats summary; the parent merges everything into one table.
+"""
+import csv
+import itertools
+import os
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from results.stats import OnlineStats
+from utils.helpers import TRACE_DTYPE, generate_synthetic_trace, iter_trace_array, trace_to_array
+from utils.trace_io import open_trace
+from utils.workloads import workload_from_config
+
+# Per-worker view of the shared trace, set up by _attach_trace
+_worker_trace = None
+
+
+def expand_overrides(spec):
+    """
+    Turn a sweep spec into a list of override dicts.
+
+    spec may contain `grid` (key -> list of values, expanded as a cartesian product)
+    and/or `configs` (explicit list of override dicts, appended after the grid).
+    """
+    overrides = []
+    grid = spec.get('grid') or {}
+    if grid:
+        keys = list(grid)
+        for values in itertools.product(*(grid[k] for k in keys)):
+            overrides.append(dict(zip(keys, values)))
+    overrides.extend(dict(o) for o in spec.get('configs') or [])
+    return overrides
+
+
+def flatten_stats(stats, prefix=''):
+    """Flatten a nested stats summary into {'paged.peak': ..., ...}."""
+    flat = {}
+    for k, v in stats.items():
+        name = f"{prefix}{k}"
+        if isinstance(v, dict):
+            flat.update(flatten_stats(v, prefix=name + '.'))
+        else:
+            flat[name] = v
+    return flat
+
+
+def _attach_trace(shm_name, length):
+    global _worker_trace
+    shm = shared_memory.SharedMemory(name=shm_name)
+    # keep a reference to the segment so the buffer outlives this function
+    _worker_trace = (shm, np.ndarray((length,), dtype=TRACE_DTYPE, buffer=shm.buf))
+
+
+def worker_trace():
+    """The trace array of the current pool worker (see shared_trace_pool)."""
+    return _worker_trace[1]
+
+
+@contextmanager
+def shared_trace_pool(trace, workers=None):
+    """
+    ProcessPoolExecutor whose workers attach once to a copy of `trace` (a TRACE_DTYPE array)
+    in shared memory, read with worker_trace(). The segment is removed on exit.
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(1, trace.nbytes))
+    try:
+        np.ndarray(trace.shape, dtype=TRACE_DTYPE, buffer=shm.buf)[:] = trace
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_attach_trace,
+                                 initargs=(shm.name, len(trace))) as pool:
+            yield pool
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _open_trace_file(path):
+    global _worker_trace
+    # every worker maps the same file, so the OS page cache holds a single copy
+    _worker_trace = (None, open_trace(path))
+
+
+def _run_one(config):
+    # imported here so the pool workers resolve main's models without a cycle at import time
+    from main import run_simulation
+    counters = {} if config.get('instrument') else None
+    # the stats are the only logger, so no per-step records are kept
+    online = OnlineStats(window=config.get('stats_window', 1000))
+    run_simulation(config, iter_trace_array(worker_trace()), online, counters=counters)
+    stats = online.summary()
+    if counters is not None:
+        # flattened next to the stats as instrumentation.<model>.<group>.<name> columns
+        stats['instrumentation'] = {name: c.snapshot() for name, c in counters.items()}
+    return stats
+
+
+def run_sweep(base_config, overrides, seed=0, workers=None, workload_type='mixed', trace_file=None):
+    """
+    Run every override on top of base_config against one shared trace.
+
+    The trace is generated once with the given seed (from base_config['workload'] when
+    present, else the legacy generator over base_config['simulation_steps']), so reruns
+    with the same inputs produce identical tables. With trace_file, workers memory-map
+    that recorded trace instead. Returns a list of (config, stats) in override order.
+    """
+    configs = [{**base_config, **o} for o in overrides]
+    if trace_file:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_open_trace_file,
+                                 initargs=(trace_file,)) as pool:
+            stats = list(pool.map(_run_one, configs))
+        return list(zip(configs, stats))
+
+    if base_config.get('workload'):
+        trace = workload_from_config(base_config['workload'], seed=seed)
+    else:
+        trace = trace_to_array(generate_synthetic_trace(base_config['simulation_steps'], workload_type, seed=seed))
+    with shared_trace_pool(trace, workers) as pool:
+        stats = list(pool.map(_run_one, configs))
+    return list(zip(configs, stats))
+
+
+def write_sweep_table(results, overrides, filename):
+    """Write one CSV row per configuration: its overrides followed by flattened stats."""
+    override_keys = list(dict.fromkeys(k for o in overrides for k in o))
+    rows = []
+    for config, stats in results:
+        row = {k: config.get(k, '') for k in override_keys}
+        row.update(flatten_stats(stats))
+        rows.append(row)
+    headers = list(dict.fromkeys(k for r in rows for k in r))
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=headers)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
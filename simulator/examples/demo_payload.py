@@ -30,8 +30,16 @@ pc = PagedCompressedKV(
 )
 
 print('\nSimulating allocations:')
-for i, req in enumerate(trace):
+page_size = CONFIG['paged_kv_page_size']
+for i, event in enumerate(trace):
+    if event['op'] != 'alloc':
+        p.free(event['id'])
+        pc.free(event['id'])
+        print(f"Step {i}: free id={event['id']}")
+        continue
+    req = event['size']
+    blocks = (req + page_size - 1) // page_size
     m_ok = m.allocate(req)
-    p_ok = p.allocate(req // CONFIG['paged_kv_page_size'] + 1)
-    pc_ok = pc.allocate(req // CONFIG['paged_kv_page_size'] + 1)
+    p_ok = p.allocate(event['id'], blocks)
+    pc_ok = pc.allocate(event['id'], blocks, timestamp=i)
     print(f"Step {i}: req={req:2d} | Monolithic: ok={m_ok:5} usage={m.usage:3d} | Paged: ok={p_ok:5} used_pages={sum(p.pages)} | PagedCompressed: ok={pc_ok:5} used_pages={sum(1 for x in pc.pages if x!=0)}")
@@ -3,10 +3,27 @@ Command-line interface for the simulator.
 """
 import argparse
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description='KV-cache Simulator')
-    parser.add_argument('--config', type=str, default='../config/default_config.yaml', help='Path to config file')
-    return parser.parse_args()
+    parser.add_argument('config', nargs='?', default='config/default_config.yaml', help='Path to config file')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for the synthetic trace (default: config `seed`, else random)')
+    parser.add_argument('--trace', type=str, default=None, help='Replay a recorded binary trace file instead of generating one')
+    parser.add_argument('--record-trace', type=str, default=None, help='Save the generated trace to this binary trace file, then replay it')
+    parser.add_argument('--serve', action='store_true', help='Serve the workload through the continuous-batching scheduler (config `scheduler:`)')
+    parser.add_argument('--instrument', action='store_true', help='Count per-model work and failures by cause; written to instrumentation.json')
+    parser.add_argument('--profile', type=str, default=None, help='Profile the run with cProfile and dump pstats to this file')
+    parser.add_argument('--checkpoint', type=str, default=None, help='Save simulation snapshots to this file (default: checkpoint.kvsnap)')
+    parser.add_argument('--checkpoint-every', type=int, default=None, help='Snapshot every N events (default: config `checkpoint_every`)')
+    parser.add_argument('--stop-at', type=int, default=None, help='Snapshot and stop after N events')
+    parser.add_argument('--resume', type=str, default=None, help='Continue from a snapshot; with a different config, fork it')
+    parser.add_argument('--no-cache', action='store_true', help='Simulate even if the results cache (config `cache_dir`) holds this run')
+    parser.add_argument('--csv', action='store_true', help='Also export per-step records to results.csv')
+    parser.add_argument('--sweep', type=str, default=None, help='YAML file with a grid/list of config overrides to run in parallel')
+    parser.add_argument('--shards', type=int, default=None, help='Spread the trace over N devices, one worker process per device (config `sharding:`)')
+    parser.add_argument('--placement', type=str, default=None, help='Request placement for --shards: round_robin, hash or least_loaded')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for --sweep and --shards (default: all cores)')
+    parser.add_argument('--out', type=str, default='sweep_results.csv', help='Output table for --sweep')
+    return parser.parse_args(argv)
 
 if __name__ == '__main__':
     args = parse_args()
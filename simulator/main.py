@@ -1,16 +1,33 @@
 """
 Main entry point for the KV-cache simulator.
 """
+import cProfile
+import json
+import os
+import pstats
+import shutil
+import signal
+
 import yaml
+from core.checkpoint import apply_tunables, check_fork, load_snapshot, save_snapshot
 from core.engine import SimulatorEngine
-from memory_models.monolithic_kv import MonolithicKV
+from memory_models.monolithic_kv import monolithic_from_config
 from memory_models.paged_kv import PagedKV
-from memory_models.paged_compressed_kv import PagedCompressedKV
-from results.logger import Logger
-from results.stats import compute_stats
+from memory_models.paged_compressed_kv import compressed_from_config
+from memory_models.prefix_shared_kv import PrefixSharedKV
+from memory_models.tiered_kv import TieredKV, tiers_from_config
+from results.cache import cache_from_config
+from results.record_store import RecordStore, open_records
+from results.stats import OnlineStats
 from results.plotter import plot_records
-from utils.helpers import generate_synthetic_trace
-import sys
+from utils.helpers import GROW_OPS, iter_synthetic_trace, iter_trace_array
+from utils.instrumentation import instrument
+from utils.trace_io import iter_trace_file, write_trace
+from utils.workloads import requests_from_config, workload_from_config
+from interface.cli import parse_args
+
+
+MODEL_NAMES = ('monolithic', 'paged', 'paged_compressed', 'prefix_shared', 'tiered')
 
 
 def load_config(path):
@@ -18,105 +35,430 @@ def load_config(path):
         return yaml.safe_load(f)
 
 
-def main(config_path):
-    config = load_config(config_path)
-    logger = Logger()
-    trace = generate_synthetic_trace(config['simulation_steps'], 'mixed')
-
-    # Baseline: Monolithic KV
-    monolithic = MonolithicKV(config['monolithic_kv_size'])
-    # Paged KV
-    paged = PagedKV(config['paged_kv_num_pages'], config['paged_kv_page_size'])
-    # Paged + Compression Gate
-    paged_compressed = PagedCompressedKV(
-        config['paged_kv_num_pages'],
-        config['paged_kv_page_size'],
-        config['compression_ratio'],
-        config['pressure_threshold']
-    )
-
-    # Track allocations by id so we can free them later per model
-    alloc_table = {}  # alloc_id -> size
-    allocs_monolithic = {}  # alloc_id -> amount
-    allocs_paged = {}  # alloc_id -> num_blocks
-    allocs_paged_compressed = {}  # alloc_id -> num_blocks
-
-    # Run simulation for each model and record per-step state for all three
-    for step, event in enumerate(trace):
-        if event['op'] == 'alloc':
-            alloc_id = event['id']
-            size = event['size']
-
-            # Monolithic allocate
-            ok_m = monolithic.allocate(size)
-            if ok_m:
-                allocs_monolithic[alloc_id] = size
-
-            # Paged allocations use ceil conversion
-            page_size = config['paged_kv_page_size']
-            blocks_needed = (size + page_size - 1) // page_size
-            ok_p = paged.allocate(blocks_needed)
-            if ok_p:
-                allocs_paged[alloc_id] = blocks_needed
-
-            ok_pc = paged_compressed.allocate(blocks_needed)
-            if ok_pc:
-                allocs_paged_compressed[alloc_id] = blocks_needed
-                # mark the newly allocated pages as accessed at this step for LRU
-                # find indices of pages allocated (state==1) that have last_access==0
-                allocated_indices = [i for i, s in enumerate(paged_compressed.pages) if s == 1 and paged_compressed.last_access[i] == 0]
-                paged_compressed.touch_pages(allocated_indices, step)
-
-            alloc_table[alloc_id] = size
-
-        elif event['op'] == 'free':
-            alloc_id = event['id']
-            # free for monolithic
-            if alloc_id in allocs_monolithic:
-                monolithic.free(allocs_monolithic.pop(alloc_id))
-            # free for paged
-            if alloc_id in allocs_paged:
-                paged.free(allocs_paged.pop(alloc_id))
-            # free for paged_compressed
-            if alloc_id in allocs_paged_compressed:
-                paged_compressed.free(allocs_paged_compressed.pop(alloc_id))
-
-        # Compute memory usage for paged models in bytes (or same units as req)
-        page_size = config['paged_kv_page_size']
-        paged_used_pages = sum(1 for x in paged.pages if x == 1)
-        mem_paged = paged_used_pages * page_size
-
-        pc_used_pages = sum(1 for x in paged_compressed.pages if x == 1)
-        pc_compressed_pages = sum(1 for x in paged_compressed.pages if x == 2)
-        mem_paged_compressed = pc_used_pages * page_size + pc_compressed_pages * page_size * config['compression_ratio']
-
-        # Fragmentation: fraction of free pages (for paged models), monolithic placeholder 0
-        frag_paged = (paged.num_pages - paged_used_pages) / paged.num_pages
-        frag_paged_compressed = (paged_compressed.num_pages - (pc_used_pages + pc_compressed_pages)) / paged_compressed.num_pages
-        frag_monolithic = 0.0
-
-        throughput_val = event['size'] if event['op'] == 'alloc' else 0
-
-        logger.log({
-            'step': step,
+def run_simulation(config, trace, logger, stats=None, counters=None, resume=None, checkpoint=None,
+                   checkpoint_every=0, stop_at=None):
+    """
+    Replay trace against all five models on a SimulatorEngine, logging one record per
+    event (and feeding stats, if given). Alloc events carrying a 'lifetime' get their
+    free scheduled by the engine. Decode traces grow sequences with prefill/append/end;
+    the monolithic model reserves config['max_seq_len'] units per sequence up front.
+
+    Each record also carries a modeled latency per model: token_time_us per token served
+    plus the compaction, compression/decompression or offload stall time the event caused.
+
+    With a `counters` dict every model is instrumented and its Counters stored under its name.
+
+    checkpoint(state) is called with the models, the allocs_* tables and the engine's
+    snapshot every `checkpoint_every` events, after event `stop_at` (which ends the run) and
+    on Ctrl-C (likewise). `resume` is such a state (core.checkpoint.load_snapshot): the run
+    continues from it with `trace` rebuilt as it was, taking config's tunables from there on.
+    """
+    if resume is None:
+        # Baseline: Monolithic KV (a contiguous arena with config['monolithic_placement'], else a counter)
+        monolithic = monolithic_from_config(config)
+        # Paged KV
+        paged = PagedKV(config['paged_kv_num_pages'], config['paged_kv_page_size'])
+        # Paged + Compression Gate (ratio and costs hand-set, or from a measured compression_profile;
+        # victims picked by config['eviction_policy'])
+        paged_compressed = compressed_from_config(config)
+        # Paged + shared prefix pages (same pool geometry as PagedKV)
+        prefix_shared = PrefixSharedKV(config['paged_kv_num_pages'], config['paged_kv_page_size'])
+        # Paged pool spread over memory tiers, offloading cold pages (config['tiers'])
+        tiered = TieredKV(tiers_from_config(config), config['paged_kv_page_size'], config.get('kv_bytes_per_token', 1))
+        # Track allocations by id so we can free them later per model
+        allocs_monolithic = {}  # alloc_id -> amount
+    else:
+        # a fork may have changed tunables such as pressure_threshold; the pools are as saved
+        apply_tunables(resume['models'], config)
+        monolithic, paged, paged_compressed, prefix_shared, tiered = (resume['models'][name] for name in MODEL_NAMES)
+        allocs_monolithic = resume['allocs_monolithic']
+    page_size = config['paged_kv_page_size']
+    max_seq_len = config.get('max_seq_len', 0)
+    token_time = config.get('token_time_us', 0) * 1e-6
+    # Outcome of the event being processed: model -> allocation succeeded (None: not attempted)
+    outcome = {}
+
+    def on_alloc(engine, event):
+        alloc_id = event['id']
+        size = event['size']
+
+        # Monolithic allocate
+        outcome['monolithic'] = monolithic.allocate(size, alloc_id)
+        if outcome['monolithic']:
+            allocs_monolithic[alloc_id] = size
+
+        # Paged allocations use ceil conversion
+        blocks_needed = (size + page_size - 1) // page_size
+        # PagedKV keeps its own block table keyed by alloc_id
+        outcome['paged'] = paged.allocate(alloc_id, blocks_needed, tokens=size)
+
+        # new pages are stamped with the current time for LRU
+        outcome['paged_compressed'] = paged_compressed.allocate(alloc_id, blocks_needed, timestamp=engine.time,
+                                                                tokens=size)
+
+        # declared prefixes map onto cached pages
+        outcome['prefix_shared'] = prefix_shared.allocate(alloc_id, blocks_needed, tokens=size,
+                                                          prefix=event.get('prefix'),
+                                                          prefix_len=event.get('prefix_len', 0))
+
+        outcome['tiered'] = tiered.allocate(alloc_id, blocks_needed, tokens=size)
+
+        if 'lifetime' in event:
+            engine.schedule_after(event['lifetime'], {'op': 'free', 'id': alloc_id})
+
+    def on_free(engine, event):
+        alloc_id = event['id']
+        # free for monolithic
+        if alloc_id in allocs_monolithic:
+            monolithic.free(allocs_monolithic.pop(alloc_id), alloc_id)
+        # free for paged (no-op if the allocation was rejected)
+        paged.free(alloc_id)
+        # free for paged_compressed
+        paged_compressed.free(alloc_id)
+        prefix_shared.free(alloc_id)
+        tiered.free(alloc_id)
+
+    def on_prefill(engine, event):
+        seq_id = event['id']
+        outcome['monolithic'] = monolithic.prefill(seq_id, event['size'], max_len=event.get('max_len', max_seq_len))
+        outcome['paged'] = paged.prefill(seq_id, event['size'])
+        outcome['paged_compressed'] = paged_compressed.prefill(seq_id, event['size'], timestamp=engine.time)
+        outcome['prefix_shared'] = prefix_shared.prefill(seq_id, event['size'], prefix=event.get('prefix'),
+                                                         prefix_len=event.get('prefix_len', 0))
+        outcome['tiered'] = tiered.prefill(seq_id, event['size'])
+
+    def on_append(engine, event):
+        seq_id = event['id']
+        tokens = event.get('size', 1)
+        outcome['monolithic'] = monolithic.append(seq_id, tokens)
+        outcome['paged'] = paged.append(seq_id, tokens)
+        outcome['paged_compressed'] = paged_compressed.append(seq_id, tokens, timestamp=engine.time)
+        outcome['prefix_shared'] = prefix_shared.append(seq_id, tokens)
+        # decoding reads the whole sequence, promoting any offloaded pages
+        outcome['tiered'] = tiered.append(seq_id, tokens)
+
+    def on_end(engine, event):
+        seq_id = event['id']
+        monolithic.end(seq_id)
+        paged.end(seq_id)
+        paged_compressed.end(seq_id)
+        prefix_shared.end(seq_id)
+        tiered.end(seq_id)
+
+    def record_event(engine, event):
+        # Per-event metrics come from each model's live counters (O(1), no pool scans)
+        occ_m = monolithic.occupancy()
+        occ_p = paged.occupancy()
+        occ_pc = paged_compressed.occupancy()
+        occ_ps = prefix_shared.occupancy()
+        occ_t = tiered.occupancy()
+
+        throughput_val = event.get('size', 0) if event['op'] in GROW_OPS else 0
+
+        record = {
+            'step': engine.processed,
+            'time': engine.time,
             'event': event,
             'throughput': throughput_val,
-            'memory_monolithic': monolithic.usage,
-            'memory_paged': mem_paged,
-            'memory_paged_compressed': mem_paged_compressed,
-            'fragmentation_monolithic': frag_monolithic,
-            'fragmentation_paged': frag_paged,
-            'fragmentation_paged_compressed': frag_paged_compressed,
-        })
-
-    # Compute aggregated statistics and produce comparison plots
-    stats = compute_stats(logger.records)
-    print('Simulation stats:', stats)
-    logger.save('results.txt')
-
-    # Create comparison plots (saved to results/)
-    plot_records(logger.records, out_dir='results')
+            'memory_monolithic': occ_m['memory'],
+            'memory_paged': occ_p['memory'],
+            'memory_paged_compressed': occ_pc['memory'],
+            'memory_prefix_shared': occ_ps['memory'],
+            # memory private copies of the shared prefix pages would have taken on top
+            'memory_saved_prefix_shared': occ_ps['saved'] * page_size,
+            'memory_tiered': occ_t['memory'],
+            'fragmentation_monolithic': occ_m['fragmentation'],
+            'fragmentation_paged': occ_p['fragmentation'],
+            'fragmentation_paged_compressed': occ_pc['fragmentation'],
+            'fragmentation_prefix_shared': occ_ps['fragmentation'],
+            'fragmentation_tiered': occ_t['fragmentation'],
+            # unused tail of reserved space (partly filled last pages, unfilled monolithic reservations)
+            'internal_fragmentation_monolithic': occ_m['internal_fragmentation'],
+            'internal_fragmentation_paged': occ_p['internal_fragmentation'],
+            'internal_fragmentation_paged_compressed': occ_pc['internal_fragmentation'],
+            'internal_fragmentation_prefix_shared': occ_ps['internal_fragmentation'],
+            'internal_fragmentation_tiered': occ_t['internal_fragmentation'],
+        }
+        # attempted is 1 when this event asked the model for memory (an append to a sequence the
+        # model never admitted does not), failed is 1 when the model rejected it
+        for name in MODEL_NAMES:
+            result = outcome.get(name)
+            record[f'attempted_{name}'] = int(result is not None)
+            record[f'failed_{name}'] = int(result is not None and not result)
+        # offload traffic caused by this event, per slower tier
+        tier_stall = 0.0
+        for name, (moved, stall) in tiered.take_step_costs().items():
+            record[f'bytes_moved_{name}'] = moved
+            record[f'stall_{name}'] = stall
+            tier_stall += stall
+        compacted, compact_s = monolithic.take_step_costs()
+        record['bytes_compacted_monolithic'] = compacted
+        record['compaction_time_monolithic'] = compact_s
+        compress_s, decompress_s = paged_compressed.take_step_costs()
+        record['compress_time_paged_compressed'] = compress_s
+        record['decompress_time_paged_compressed'] = decompress_s
+        # pages the eviction policy picked for compression, and those that had been read back before
+        victims, recompressed = paged_compressed.take_step_evictions()
+        record['victims_paged_compressed'] = victims
+        record['recompressions_paged_compressed'] = recompressed
+        # modeled service time of this event: compute for the tokens served plus memory stalls
+        overhead = {'monolithic': compact_s, 'paged_compressed': compress_s + decompress_s, 'tiered': tier_stall}
+        for name in MODEL_NAMES:
+            served = throughput_val * token_time if outcome.get(name) else 0.0
+            record[f'latency_{name}'] = served + overhead.get(name, 0.0)
+        outcome.clear()
+        logger.log(record)
+        if stats is not None:
+            stats.update(record)
+
+    models = dict(zip(MODEL_NAMES, (monolithic, paged, paged_compressed, prefix_shared, tiered)))
+    if counters is not None:
+        for name, model in models.items():
+            counters[name] = instrument(model)
+
+    engine = SimulatorEngine(config)
+    engine.register('alloc', on_alloc)
+    engine.register('free', on_free)
+    engine.register('prefill', on_prefill)
+    engine.register('append', on_append)
+    engine.register('end', on_end)
+    engine.observe(record_event)
+    if resume is None:
+        engine.add_source(trace)
+    else:
+        engine.restore(resume['engine'], trace)
+
+    # Checkpoints are taken between events: the observer only asks the engine to stop
+    # after the current one, and the loop below saves and carries on (or ends the run).
+    request = {}
+
+    def request_checkpoint(engine, event):
+        done = engine.processed + 1
+        if request.get('interrupted') or done == stop_at:
+            request['stop'] = True
+        elif not checkpoint_every or done % checkpoint_every:
+            return
+        engine.stop()
+
+    def on_interrupt(signum, frame):
+        request['interrupted'] = True
+
+    if checkpoint is not None or stop_at is not None:
+        engine.observe(request_checkpoint)
+    previous_handler = signal.signal(signal.SIGINT, on_interrupt) if checkpoint is not None else None
+    try:
+        while True:
+            engine.run()
+            if not engine.stopped:
+                break
+            if checkpoint is not None:
+                checkpoint({'models': models, 'allocs_monolithic': allocs_monolithic, 'engine': engine.snapshot()})
+            if request.pop('stop', False):
+                break
+    finally:
+        if previous_handler is not None:
+            signal.signal(signal.SIGINT, previous_handler)
+    return logger
+
+
+def build_trace(config, seed, trace_file=None, record_trace=None):
+    """The run's event stream: a replayed trace file, the `workload:` generator or the legacy synthetic trace."""
+    if trace_file:
+        return iter_trace_file(trace_file)
+    # a `workload:` block selects the vectorized LLM-serving generator over the legacy one
+    workload = config.get('workload')
+    if workload:
+        trace = workload_from_config(workload, seed=seed)
+    else:
+        trace = iter_synthetic_trace(config['simulation_steps'], 'mixed', seed=seed)
+    if record_trace:
+        n = write_trace(record_trace, trace)
+        print(f"Recorded {n} events to {record_trace}")
+        return iter_trace_file(record_trace)
+    return iter_trace_array(trace) if workload else trace
+
+
+def main(config_path, seed=None, export_csv=False, trace_file=None, record_trace=None, instrument=False,
+         profile=None, checkpoint=None, checkpoint_every=None, stop_at=None, resume=None, use_cache=True):
+    config = load_config(config_path)
+    # The trace is generated lazily (or memory-mapped from a recorded trace file) and records
+    # are streamed into a columnar binary store in chunks, so memory stays flat however many
+    # steps are simulated.
+    snapshot = None
+    if resume:
+        # resuming rebuilds the snapshot's trace; a different config file forks the run
+        snapshot = load_snapshot(resume)
+        check_fork(snapshot['config'], config)
+        seed, trace_file = snapshot['seed'], snapshot['trace_file']
+        print(f"Resuming from {resume} after {snapshot['records']} events")
+    else:
+        if seed is None:
+            seed = config.get('seed')
+        trace_file = trace_file or config.get('trace_file')
+    # Opt-in per-model counters (--instrument or config `instrument: true`) and a cProfile dump (--profile)
+    instrument = bool(instrument or config.get('instrument'))
+    if checkpoint_every is None:
+        checkpoint_every = config.get('checkpoint_every', 0)
+    if checkpoint is None and (checkpoint_every or stop_at):
+        checkpoint = 'checkpoint.kvsnap'
+
+    # Reproducible runs (seeded or replaying a trace file) are looked up in the results cache
+    # (config `cache_dir`); runs that resume, checkpoint, profile or record their trace always simulate.
+    cache = key = cached = None
+    if use_cache and not (snapshot or checkpoint or profile or record_trace):
+        cache = cache_from_config(config)
+        key = cache.key(config, seed, trace_file, instrument) if cache else None
+        cached = cache.lookup(key) if key else None
+
+    if cached:
+        print(f"Cache hit {key[:12]}: stats and records of an identical run")
+        summary, instrumentation = cached['summary'], cached['instrumentation']
+        shutil.rmtree('results.kvrec', ignore_errors=True)
+        shutil.copytree(cached['records'], 'results.kvrec')
+    else:
+        if snapshot:
+            trace = build_trace(snapshot['config'], seed, trace_file)
+        else:
+            trace = build_trace(config, seed, trace_file, record_trace)
+            trace_file = trace_file or record_trace
+        stats = snapshot['stats'] if snapshot else OnlineStats(window=config.get('stats_window', 1000))
+        counters = {} if instrument else None
+
+        chunk_size = config.get('log_chunk_size', 65536)
+        store = None
+        if snapshot:
+            try:
+                store = RecordStore('results.kvrec', chunk_size=chunk_size, resume_rows=snapshot['records'])
+            except (OSError, ValueError) as e:
+                print(f"Not appending to results.kvrec ({e}); it will only hold the resumed steps")
+        if store is None:
+            store = RecordStore('results.kvrec', chunk_size=chunk_size)
+
+        def save_checkpoint(state):
+            store.flush()
+            state.update(config=config, seed=seed, trace_file=trace_file, stats=stats, records=store.count)
+            size = save_snapshot(checkpoint, state)
+            print(f"Checkpoint after {store.count} events saved to {checkpoint} ({size} bytes)")
+
+        def simulate():
+            run_simulation(config, trace, store, stats=stats, counters=counters, resume=snapshot,
+                           checkpoint=save_checkpoint if checkpoint else None, checkpoint_every=checkpoint_every,
+                           stop_at=stop_at)
+
+        with store:
+            if profile:
+                with cProfile.Profile() as profiler:
+                    simulate()
+                profiler.dump_stats(profile)
+            else:
+                simulate()
+        # Aggregated statistics were accumulated during the run
+        summary = stats.summary()
+        instrumentation = {name: c.snapshot() for name, c in counters.items()} if counters is not None else None
+        if key:
+            cache.store(key, 'results.kvrec', summary, instrumentation)
+    records = open_records('results.kvrec')
+
+    print('Simulation stats:', summary)
+    if summary:
+        compressed = summary['paged_compressed']
+        print(f"Eviction policy {config.get('eviction_policy', 'lru')}: {compressed['victims']} victims, "
+              f"{compressed['recompressions']} recompressed after decompression "
+              f"(rate {compressed['recompression_rate']:.3f}), latency p99 {compressed['latency']['p99']:.6f} s")
+    if instrumentation is not None:
+        with open('instrumentation.json', 'w') as f:
+            json.dump(instrumentation, f, indent=2)
+        print('Instrumentation:', instrumentation)
+    if profile:
+        print(f"Profile saved to {profile}; top functions by cumulative time:")
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(15)
+    if export_csv:
+        records.to_csv('results.csv')
+
+    # Create comparison plots (saved to results/); a cache entry keeps one set per plot setting,
+    # rendered from its stored records the first time those settings are used
+    plot_key = cache.plot_key(config) if key else None
+    plots = cache.plots(key, plot_key) if key else None
+    if plots:
+        os.makedirs('results', exist_ok=True)
+        for path in plots:
+            shutil.copy2(path, 'results')
+        print(f"Cached plots copied to results/: {', '.join(os.path.basename(p) for p in plots)}")
+    else:
+        plots = plot_records(records, out_dir='results',
+                             max_points=config.get('plot_max_points', 2000),
+                             method=config.get('plot_downsample', 'minmax'))
+        if key:
+            cache.store_plots(key, plot_key, plots)
+
+
+def sweep(config_path, sweep_path, seed=None, workers=None, out='sweep_results.csv', trace_file=None):
+    """Run every override in sweep_path on top of config_path in parallel and write one stats table."""
+    from core.sweep import expand_overrides, run_sweep, write_sweep_table
+
+    config = load_config(config_path)
+    spec = load_config(sweep_path)
+    if seed is None:
+        seed = spec.get('seed', config.get('seed', 0))
+    overrides = expand_overrides(spec)
+    results = run_sweep(config, overrides, seed=seed, workers=workers,
+                        trace_file=trace_file or config.get('trace_file'))
+    write_sweep_table(results, overrides, out)
+    print(f"Ran {len(results)} configurations (seed={seed}); table saved to {out}")
+
+
+def serve(config_path, seed=None):
+    """Serve the config's workload through the continuous-batching scheduler once per memory model."""
+    from core.scheduler import format_serving_table, serve_all
+
+    config = load_config(config_path)
+    if seed is None:
+        seed = config.get('seed')
+    requests = requests_from_config(config.get('workload') or {'num_requests': 1000}, seed=seed)
+    summaries = serve_all(config, requests)
+    print('Serving stats:', summaries)
+    print(format_serving_table(summaries))
+
+
+def shard(config_path, devices=None, placement=None, seed=None, workers=None, trace_file=None):
+    """Spread the run's trace over several devices (config `sharding:`), one worker process per device."""
+    from core.sharded import format_sharded_table, run_sharded
+
+    config = load_config(config_path)
+    sharding = config.get('sharding') or {}
+    devices = devices or sharding.get('devices', 8)
+    placement = placement or sharding.get('placement', 'round_robin')
+    if seed is None:
+        seed = config.get('seed', 0)
+    result = run_sharded(config, devices, placement=placement, seed=seed, workers=workers,
+                         trace_file=trace_file or config.get('trace_file'), samples=sharding.get('samples', 1000))
+    report = {
+        'devices': devices,
+        'placement': placement,
+        'seed': seed,
+        'wall_time': result['wall_time'],
+        'busy_time': result['busy_time'],
+        'aggregate': result['aggregate'],
+        'per_device': [{'device': r['device'], 'events': r['events'], 'elapsed': r['elapsed'],
+                        'failures': r['failures'], 'stats': r['summary']} for r in result['devices']],
+    }
+    with open('sharded_stats.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Placement {placement} (seed={seed}); per-device stats saved to sharded_stats.json")
+    print(format_sharded_table(result))
+
 
 if __name__ == '__main__':
-    config_path = sys.argv[1] if len(sys.argv) > 1 else 'config/default_config.yaml'
-    main(config_path)
+    args = parse_args()
+    if args.serve:
+        serve(args.config, seed=args.seed)
+    elif args.shards or args.placement:
+        shard(args.config, devices=args.shards, placement=args.placement, seed=args.seed, workers=args.workers,
+              trace_file=args.trace)
+    elif args.sweep:
+        sweep(args.config, args.sweep, seed=args.seed, workers=args.workers, out=args.out, trace_file=args.trace)
+    else:
+        main(args.config, seed=args.seed, export_csv=args.csv, trace_file=args.trace, record_trace=args.record_trace,
+             instrument=args.instrument, profile=args.profile, checkpoint=args.checkpoint,
+             checkpoint_every=args.checkpoint_every, stop_at=args.stop_at, resume=args.resume,
+             use_cache=not args.no_cache)
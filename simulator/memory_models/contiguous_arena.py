@@ -0,0 +1,326 @@
+"""
+Contiguous-range arena behind MonolithicKV's placement policies.
+
+Every reservation takes one contiguous extent of the arena, so freed holes
+between live extents are only reusable by reservations that fit in them. The
+arena reports true external fragmentation, 1 - largest free extent / total
+free, and can compact: live extents slide to the bottom and the units moved
+are the compaction cost.
+
+Placement policies (PLACEMENTS):
+  first_fit  lowest-address free extent that fits
+  best_fit   smallest free extent that fits (lowest address among equals)
+  buddy      power-of-two blocks split and merged with their buddies; requests
+             are rounded up to a power of two (the round-up is reserved space)
+
+Fit arenas index their free extents in a treap augmented with the largest
+extent in each subtree, keyed by start (first fit) or by (length, start) (best
+fit), so placement, freeing with coalescing and the largest free extent are
+O(log n) in the number of free extents. The buddy arena keeps one free list
+per order, so it is O(log arena size).
+"""
+import heapq
+import random
+
+
+class _Treap:
+    """Ordered map key -> length, answering "first key whose length >= n" via subtree maxima."""
+    # node: [key, length, priority, left, right, largest length in subtree]
+
+    def __init__(self, seed=0):
+        self.root = None
+        self._rng = random.Random(seed)
+
+    @staticmethod
+    def _update(node):
+        best = node[1]
+        if node[3] is not None and node[3][5] > best:
+            best = node[3][5]
+        if node[4] is not None and node[4][5] > best:
+            best = node[4][5]
+        node[5] = best
+
+    def _split(self, node, key):
+        """(keys < key, keys >= key)"""
+        if node is None:
+            return None, None
+        if node[0] < key:
+            node[4], right = self._split(node[4], key)
+            self._update(node)
+            return node, right
+        left, node[3] = self._split(node[3], key)
+        self._update(node)
+        return left, node
+
+    def _merge(self, a, b):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        if a[2] > b[2]:
+            a[4] = self._merge(a[4], b)
+            self._update(a)
+            return a
+        b[3] = self._merge(a, b[3])
+        self._update(b)
+        return b
+
+    def _insert(self, node, new):
+        if node is None:
+            return new
+        if new[2] > node[2]:
+            new[3], new[4] = self._split(node, new[0])
+            self._update(new)
+            return new
+        if new[0] < node[0]:
+            node[3] = self._insert(node[3], new)
+        else:
+            node[4] = self._insert(node[4], new)
+        self._update(node)
+        return node
+
+    def _remove(self, node, key):
+        if node[0] == key:
+            return self._merge(node[3], node[4])
+        if key < node[0]:
+            node[3] = self._remove(node[3], key)
+        else:
+            node[4] = self._remove(node[4], key)
+        self._update(node)
+        return node
+
+    def insert(self, key, length):
+        self.root = self._insert(self.root, [key, length, self._rng.random(), None, None, length])
+
+    def remove(self, key):
+        self.root = self._remove(self.root, key)
+
+    def first_at_least(self, n):
+        """Smallest key whose length is >= n, or None."""
+        node = self.root
+        if node is None or node[5] < n:
+            return None
+        while True:
+            left = node[3]
+            if left is not None and left[5] >= n:
+                node = left
+            elif node[1] >= n:
+                return node[0]
+            else:
+                node = node[4]
+
+    def largest(self):
+        return self.root[5] if self.root is not None else 0
+
+    def clear(self):
+        self.root = None
+
+
+class FitArena:
+    """First-fit arena: free extents indexed by start."""
+    name = 'first_fit'
+
+    def __init__(self, size):
+        self.size = size
+        self.extents = {}  # key -> (start, length) of live reservations
+        self.free_units = size
+        self._free_at = {}  # start -> length of free extents
+        self._free_end = {}  # end -> start of free extents
+        self._tree = _Treap()
+        if size > 0:
+            self._add_free(0, size)
+
+    def _tree_key(self, start, length):
+        return start
+
+    def _add_free(self, start, length):
+        self._free_at[start] = length
+        self._free_end[start + length] = start
+        self._tree.insert(self._tree_key(start, length), length)
+
+    def _remove_free(self, start):
+        length = self._free_at.pop(start)
+        del self._free_end[start + length]
+        self._tree.remove(self._tree_key(start, length))
+        return length
+
+    def _find(self, amount):
+        """Start of the free extent a reservation of `amount` units goes into, or None."""
+        return self._tree.first_at_least(amount)
+
+    def reserve_size(self, amount):
+        """Units a request of `amount` takes (at least one unit)."""
+        return max(1, amount)
+
+    def allocate(self, key, amount):
+        """Reserve an extent for `key`; returns the units reserved, or 0 if no free extent fits."""
+        self._check_new(key)
+        amount = self.reserve_size(amount)
+        start = self._find(amount)
+        if start is None:
+            return 0
+        length = self._remove_free(start)
+        if length > amount:
+            self._add_free(start + amount, length - amount)
+        self.extents[key] = (start, amount)
+        self.free_units -= amount
+        return amount
+
+    def _check_new(self, key):
+        if key in self.extents:
+            raise ValueError(f"arena already holds an extent for {key!r}")
+
+    def free(self, key):
+        """Release `key`'s extent, merging it with free neighbours; returns its length (0 if unknown)."""
+        extent = self.extents.pop(key, None)
+        if extent is None:
+            return 0
+        start, length = extent
+        self.free_units += length
+        if start in self._free_end:
+            before = self._free_end[start]
+            length += self._remove_free(before)
+            start = before
+        if start + length in self._free_at:
+            length += self._remove_free(start + length)
+        self._add_free(start, length)
+        return extent[1]
+
+    def largest_free(self):
+        return self._tree.largest()
+
+    def fragmentation(self):
+        """External fragmentation: 1 - largest free extent / total free units (0 when nothing is free)."""
+        if not self.free_units:
+            return 0.0
+        return 1.0 - self.largest_free() / self.free_units
+
+    def _packing_order(self):
+        return sorted(self.extents.items(), key=lambda item: item[1][0])
+
+    def _reset_free(self, start):
+        self._free_at.clear()
+        self._free_end.clear()
+        self._tree.clear()
+        if start < self.size:
+            self._add_free(start, self.size - start)
+
+    def compact(self):
+        """Slide every live extent to the bottom of the arena; returns the units moved."""
+        moved = 0
+        offset = 0
+        for key, (start, length) in self._packing_order():
+            if start != offset:
+                moved += length
+                self.extents[key] = (offset, length)
+            offset += length
+        self._reset_free(offset)
+        return moved
+
+
+class BestFitArena(FitArena):
+    """Best-fit arena: free extents indexed by (length, start)."""
+    name = 'best_fit'
+
+    def _tree_key(self, start, length):
+        return (length, start)
+
+    def _find(self, amount):
+        found = self._tree.first_at_least(amount)
+        return None if found is None else found[1]
+
+
+class BuddyArena(FitArena):
+    """Binary buddy arena: one free list (set + lowest-address heap) per power-of-two order."""
+    name = 'buddy'
+
+    def __init__(self, size):
+        self.size = size
+        self.extents = {}
+        self.free_units = size
+        self.max_order = max(size, 1).bit_length()
+        self._free = [set() for _ in range(self.max_order + 1)]
+        self._heaps = [[] for _ in range(self.max_order + 1)]
+        self._reset_free(0)
+
+    def reserve_size(self, amount):
+        return 1 << (max(1, amount) - 1).bit_length()
+
+    def _add_block(self, order, start):
+        self._free[order].add(start)
+        heap = self._heaps[order]
+        heapq.heappush(heap, start)
+        if len(heap) > 2 * len(self._free[order]) + 16:
+            # drop entries of blocks since merged or taken
+            self._heaps[order] = sorted(self._free[order])
+
+    def _pop_block(self, order):
+        heap, blocks = self._heaps[order], self._free[order]
+        while True:
+            start = heapq.heappop(heap)
+            if start in blocks:
+                blocks.remove(start)
+                return start
+
+    def allocate(self, key, amount):
+        self._check_new(key)
+        amount = self.reserve_size(amount)
+        order = amount.bit_length() - 1
+        found = next((k for k in range(order, self.max_order + 1) if self._free[k]), None)
+        if found is None:
+            return 0
+        start = self._pop_block(found)
+        while found > order:
+            found -= 1
+            self._add_block(found, start + (1 << found))
+        self.extents[key] = (start, amount)
+        self.free_units -= amount
+        return amount
+
+    def free(self, key):
+        extent = self.extents.pop(key, None)
+        if extent is None:
+            return 0
+        start, length = extent
+        self.free_units += length
+        order = length.bit_length() - 1
+        while order < self.max_order and (start ^ (1 << order)) in self._free[order]:
+            self._free[order].remove(start ^ (1 << order))
+            start = min(start, start ^ (1 << order))
+            order += 1
+        self._add_block(order, start)
+        return length
+
+    def largest_free(self):
+        for order in range(self.max_order, -1, -1):
+            if self._free[order]:
+                return 1 << order
+        return 0
+
+    def _packing_order(self):
+        # largest blocks first keeps every block aligned to its size
+        return sorted(self.extents.items(), key=lambda item: (-item[1][1], item[1][0]))
+
+    def _reset_free(self, start):
+        for order in range(self.max_order + 1):
+            self._free[order].clear()
+            self._heaps[order] = []
+        # split [start, size) into the largest aligned power-of-two blocks
+        while start < self.size:
+            order = min((start & -start).bit_length() - 1 if start else self.max_order,
+                        (self.size - start).bit_length() - 1)
+            self._add_block(order, start)
+            start += 1 << order
+
+
+PLACEMENTS = {
+    'first_fit': FitArena,
+    'best_fit': BestFitArena,
+    'buddy': BuddyArena,
+}
+
+
+def make_arena(size, placement):
+    if placement not in PLACEMENTS:
+        raise ValueError(f"unknown placement {placement!r}; expected one of {', '.join(PLACEMENTS)}")
+    return PLACEMENTS[placement](size)
@@ -0,0 +1,305 @@
+"""
+Victim selection policies for PagedCompressedKV's compression gate.
+
+A policy tracks the model's used (uncompressed) pages and picks which ones to
+compress when the gate fires. The model reports every event:
+
+  add(page, t)          a page became used (new block)
+  access(page, t)       a used page was read (touch, decode append)
+  reloaded(pages, t)    compressed page pages[0] was decompressed into pages
+  compressed(first, group)  group (victims) was packed into page `first`
+  remove(page)          a page was freed (used or compressed)
+
+and asks for victims with pop_victims(k), which removes and returns up to k
+pages, coldest first; putback(pages) returns victims the model did not use.
+
+POLICIES:
+  lru    exact LRU by last-access time: a lazily invalidated min-heap, O(log n)
+  clock  second chance: a ring of reference bits swept by a hand, amortized O(1)
+  lfu    least frequently used, ties broken by recency: frequency buckets in
+         insertion order plus a heap of bucket frequencies, O(log n)
+  arc    Adaptive Replacement Cache: recency (T1) and frequency (T2) lists with
+         ghost lists of compressed pages (B1, B2) steering their target split,
+         O(1)
+
+`scanned` counts the entries each policy examined to find its victims.
+"""
+import heapq
+from collections import OrderedDict
+
+
+class LRUPolicy:
+    name = 'lru'
+
+    def __init__(self, num_pages):
+        self.num_pages = num_pages
+        # min-heap of (last_access, seq, page); only the entry whose seq matches
+        # heap_seq[page] is live (0 = page not tracked)
+        self.heap = []
+        self.heap_seq = [0] * num_pages
+        self.last_access = [0] * num_pages
+        self._seq = 0
+        self._popped = {}  # victim -> its heap seq, until compressed or put back
+        self.scanned = 0
+        self.compactions = 0
+
+    def add(self, page, timestamp):
+        self.last_access[page] = timestamp
+        self._seq += 1
+        self.heap_seq[page] = self._seq
+        heapq.heappush(self.heap, (timestamp, self._seq, page))
+        # Drop stale entries once they dominate the heap
+        if len(self.heap) > 2 * self.num_pages + 64:
+            self.compactions += 1
+            self.scanned += len(self.heap)
+            self.heap = [e for e in self.heap if self.heap_seq[e[2]] == e[1]]
+            heapq.heapify(self.heap)
+
+    access = add
+
+    def reloaded(self, pages, timestamp):
+        for page in pages:
+            self.add(page, timestamp)
+
+    def compressed(self, first, group):
+        for page in group:
+            self._popped.pop(page, None)
+
+    def remove(self, page):
+        self.heap_seq[page] = 0
+
+    def pop_victims(self, k):
+        heap = self.heap
+        out = []
+        while heap and len(out) < k:
+            _, seq, page = heapq.heappop(heap)
+            self.scanned += 1
+            if self.heap_seq[page] == seq:
+                self.heap_seq[page] = 0
+                self._popped[page] = seq
+                out.append(page)
+        return out
+
+    def putback(self, pages):
+        # back under their old seq, so they keep their place among equal timestamps
+        for page in pages:
+            seq = self.heap_seq[page] = self._popped.pop(page)
+            heapq.heappush(self.heap, (self.last_access[page], seq, page))
+
+    def stats(self):
+        return {'scanned': self.scanned, 'heap_compactions': self.compactions}
+
+
+class ClockPolicy:
+    name = 'clock'
+
+    def __init__(self, num_pages):
+        # page -> reference bit; the hand sits at the front, new pages go just behind it
+        self.ring = OrderedDict()
+        self.scanned = 0
+
+    def add(self, page, timestamp):
+        self.ring[page] = 1
+
+    def access(self, page, timestamp):
+        if page in self.ring:
+            self.ring[page] = 1
+
+    def reloaded(self, pages, timestamp):
+        for page in pages:
+            self.ring[page] = 1
+
+    def compressed(self, first, group):
+        pass
+
+    def remove(self, page):
+        self.ring.pop(page, None)
+
+    def pop_victims(self, k):
+        ring = self.ring
+        out = []
+        while ring and len(out) < k:
+            page = next(iter(ring))
+            self.scanned += 1
+            if ring[page]:
+                # second chance: clear the bit and move the hand past it
+                ring[page] = 0
+                ring.move_to_end(page)
+            else:
+                del ring[page]
+                out.append(page)
+        return out
+
+    def putback(self, pages):
+        for page in reversed(pages):
+            self.ring[page] = 0
+            self.ring.move_to_end(page, last=False)
+
+    def stats(self):
+        return {'scanned': self.scanned}
+
+
+class LFUPolicy:
+    name = 'lfu'
+
+    def __init__(self, num_pages):
+        self.freq = {}  # page -> access count
+        self.buckets = {}  # count -> OrderedDict of pages, least recently used first
+        self.counts = []  # min-heap of counts that may have a non-empty bucket
+        self._queued = set()  # counts in the heap
+        self._popped = {}  # victim -> its count, until compressed or put back
+        self.scanned = 0
+
+    def _place(self, page, count, last=True):
+        bucket = self.buckets.get(count)
+        if bucket is None:
+            bucket = self.buckets[count] = OrderedDict()
+            if count not in self._queued:
+                self._queued.add(count)
+                heapq.heappush(self.counts, count)
+        bucket[page] = None
+        if not last:
+            bucket.move_to_end(page, last=False)
+        self.freq[page] = count
+
+    def _unplace(self, page):
+        count = self.freq.pop(page)
+        bucket = self.buckets[count]
+        del bucket[page]
+        if not bucket:
+            del self.buckets[count]
+        return count
+
+    def add(self, page, timestamp):
+        self._place(page, 1)
+
+    def access(self, page, timestamp):
+        if page in self.freq:
+            self._place(page, self._unplace(page) + 1)
+
+    def reloaded(self, pages, timestamp):
+        # read back because it was needed: counts as an access on top of its first use
+        for page in pages:
+            self._place(page, 2)
+
+    def compressed(self, first, group):
+        for page in group:
+            self._popped.pop(page, None)
+
+    def remove(self, page):
+        if page in self.freq:
+            self._unplace(page)
+
+    def pop_victims(self, k):
+        out = []
+        while self.freq and len(out) < k:
+            count = self.counts[0]
+            bucket = self.buckets.get(count)
+            if not bucket:
+                self._queued.discard(heapq.heappop(self.counts))
+                self.scanned += 1
+                continue
+            page = next(iter(bucket))
+            self.scanned += 1
+            self._popped[page] = self._unplace(page)
+            out.append(page)
+        return out
+
+    def putback(self, pages):
+        for page in reversed(pages):
+            self._place(page, self._popped.pop(page), last=False)
+
+    def stats(self):
+        return {'scanned': self.scanned}
+
+
+class ARCPolicy:
+    name = 'arc'
+
+    def __init__(self, num_pages):
+        self.capacity = num_pages
+        self.t1 = OrderedDict()  # used pages seen once, LRU first
+        self.t2 = OrderedDict()  # used pages seen again
+        self.b1 = OrderedDict()  # ghosts: compressed pages whose victims came from t1
+        self.b2 = OrderedDict()  # ghosts: compressed pages holding a victim from t2
+        self.target = 0.0  # adaptive target size of t1
+        self.scanned = 0
+        self._from_t2 = set()  # victims popped from t2 and not yet compressed or put back
+
+    def add(self, page, timestamp):
+        self.t1[page] = None
+
+    def access(self, page, timestamp):
+        if page in self.t1:
+            del self.t1[page]
+            self.t2[page] = None
+        elif page in self.t2:
+            self.t2.move_to_end(page)
+
+    def reloaded(self, pages, timestamp):
+        first = pages[0]
+        if first in self.b1:
+            # evicted from the recency side too early: grow t1's share
+            self.target = min(self.capacity, self.target + max(1.0, len(self.b2) / len(self.b1)))
+            del self.b1[first]
+        elif first in self.b2:
+            self.target = max(0.0, self.target - max(1.0, len(self.b1) / len(self.b2)))
+            del self.b2[first]
+        for page in pages:
+            self.t2[page] = None
+
+    def compressed(self, first, group):
+        ghosts = self.b2 if any(page in self._from_t2 for page in group) else self.b1
+        self._from_t2.difference_update(group)
+        ghosts[first] = None
+        # keep the ghost directory within twice the pool, dropping the oldest ghosts
+        while self.b1 and len(self.t1) + len(self.b1) > self.capacity:
+            self.b1.popitem(last=False)
+        while self.b2 and len(self.t1) + len(self.t2) + len(self.b1) + len(self.b2) > 2 * self.capacity:
+            self.b2.popitem(last=False)
+
+    def remove(self, page):
+        for pages in (self.t1, self.t2, self.b1, self.b2):
+            if page in pages:
+                del pages[page]
+                return
+
+    def pop_victims(self, k):
+        out = []
+        while len(out) < k and (self.t1 or self.t2):
+            self.scanned += 1
+            if self.t1 and (len(self.t1) > self.target or not self.t2):
+                page, _ = self.t1.popitem(last=False)
+            else:
+                page, _ = self.t2.popitem(last=False)
+                self._from_t2.add(page)
+            out.append(page)
+        return out
+
+    def putback(self, pages):
+        for page in reversed(pages):
+            if page in self._from_t2:
+                self._from_t2.discard(page)
+                self.t2[page] = None
+                self.t2.move_to_end(page, last=False)
+            else:
+                self.t1[page] = None
+                self.t1.move_to_end(page, last=False)
+
+    def stats(self):
+        return {'scanned': self.scanned, 'target_t1': self.target, 't1': len(self.t1), 't2': len(self.t2),
+                'ghosts': len(self.b1) + len(self.b2)}
+
+
+POLICIES = {
+    'lru': LRUPolicy,
+    'clock': ClockPolicy,
+    'lfu': LFUPolicy,
+    'arc': ARCPolicy,
+}
+
+
+def make_policy(name, num_pages):
+    if name not in POLICIES:
+        raise ValueError(f"unknown eviction policy {name!r}; expected one of {', '.join(POLICIES)}")
+    return POLICIES[name](num_pages)
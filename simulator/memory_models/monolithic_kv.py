@@ -1,21 +1,158 @@
 """
 Monolithic KV-cache model (baseline).
+
+Decoding sequences (prefill/append/end) reserve a contiguous region of
+max(prompt, max_len) units up front, since a contiguous buffer cannot grow in
+place; the reserved-but-unwritten tail is reported as internal fragmentation.
+
+With a placement policy (first_fit, best_fit or buddy; see
+memory_models/contiguous_arena.py) every reservation is placed in a contiguous
+arena, so freed holes fragment it: fragmentation is the true external
+fragmentation (1 - largest free extent / total free) and a request can fail
+with enough free units but no extent to hold it. With compaction enabled such a
+request first compacts the arena; the units moved are charged at
+compaction_bandwidth bytes/s and drained per step with take_step_costs().
+Without a placement the model is a plain usage counter and never fragments.
 """
+from memory_models.contiguous_arena import make_arena
+from utils.instrumentation import failed
+
+
+def monolithic_from_config(config):
+    """MonolithicKV from the config's monolithic_kv_size and monolithic_placement/compaction settings."""
+    placement = config.get('monolithic_placement')
+    return MonolithicKV(
+        config['monolithic_kv_size'],
+        placement=None if placement in (None, 'none') else placement,
+        compaction=config.get('monolithic_compaction', False),
+        bytes_per_token=config.get('kv_bytes_per_token', 1),
+        compaction_bandwidth=config.get('compaction_bandwidth_gbps', 0) * 1e9,
+    )
+
 
 class MonolithicKV:
-    def __init__(self, size):
+    def __init__(self, size, placement=None, compaction=False, bytes_per_token=1, compaction_bandwidth=0.0):
         self.size = size
         self.usage = 0
+        self.tokens = 0  # units actually holding KV (usage minus unfilled reservations)
+        self.sequences = {}  # seq_id -> [reserved, tokens]
+        self.counters = None  # utils.instrumentation.Counters when instrumented
+        # Contiguous arena placing every reservation (None: usage counter only)
+        self.arena = make_arena(size, placement) if placement else None
+        self.compaction = compaction
+        self.bytes_per_token = bytes_per_token
+        self.compaction_bandwidth = compaction_bandwidth  # bytes/s, 0 = free
+        # Cumulative and not-yet-drained compaction costs
+        self.compactions = 0
+        self.bytes_compacted = 0
+        self.compaction_time = 0.0
+        self._step_bytes = 0
+        self._step_time = 0.0
+
+    def _reserve(self, key, amount):
+        """Reserve `amount` units for key; returns the units taken (buddy rounds up), or None on failure."""
+        arena = self.arena
+        if arena is None:
+            if self.usage + amount > self.size:
+                failed(self, 'capacity')
+                return None
+            return amount
+        if arena.reserve_size(amount) > arena.free_units:
+            failed(self, 'capacity')
+            return None
+        reserved = arena.allocate(key, amount)
+        if not reserved and self.compaction:
+            self._compact()
+            reserved = arena.allocate(key, amount)
+        if not reserved:
+            failed(self, 'fragmentation')
+            return None
+        return reserved
+
+    def _compact(self):
+        moved = self.arena.compact() * self.bytes_per_token
+        seconds = moved / self.compaction_bandwidth if self.compaction_bandwidth else 0.0
+        self.compactions += 1
+        self.bytes_compacted += moved
+        self.compaction_time += seconds
+        self._step_bytes += moved
+        self._step_time += seconds
+        if self.counters is not None:
+            self.counters.add('compactions')
+            self.counters.add('units_compacted', moved // self.bytes_per_token)
+
+    def take_step_costs(self):
+        """(bytes moved, seconds) spent compacting since the last call."""
+        costs = (self._step_bytes, self._step_time)
+        self._step_bytes = 0
+        self._step_time = 0.0
+        return costs
+
+    def allocate(self, amount, alloc_id=None):
+        """Reserve `amount` units; with a placement policy, alloc_id (required) names the extent for free()."""
+        if self.arena is not None:
+            if alloc_id is None:
+                raise ValueError('MonolithicKV.allocate needs an alloc_id when reservations are placed in an arena')
+            if alloc_id in self.arena.extents:
+                return failed(self, 'duplicate_id')
+        reserved = self._reserve(alloc_id, amount)
+        if reserved is None:
+            return False
+        self.usage += reserved
+        self.tokens += amount
+        return True
 
-    def allocate(self, amount):
-        if self.usage + amount <= self.size:
-            self.usage += amount
-            return True
-        return False
+    def free(self, amount, alloc_id=None):
+        if self.arena is not None:
+            reserved = self.arena.free(alloc_id)
+            self.usage -= reserved
+            self.tokens = max(0, self.tokens - min(amount, reserved))
+            return
+        amount = min(amount, self.usage)
+        self.usage -= amount
+        self.tokens = max(0, self.tokens - amount)
 
-    def free(self, amount):
-        self.usage = max(0, self.usage - amount)
+    def prefill(self, seq_id, tokens, max_len=0):
+        """Reserve max(tokens, max_len) units for a new sequence holding `tokens`."""
+        if seq_id in self.sequences:
+            return failed(self, 'duplicate_id')
+        reserved = self._reserve(('seq', seq_id), max(tokens, max_len))
+        if reserved is None:
+            return False
+        self.usage += reserved
+        self.tokens += tokens
+        self.sequences[seq_id] = [reserved, tokens]
+        return True
 
+    def append(self, seq_id, tokens=1):
+        """Write decoded tokens into the sequence's reservation; fails once it is full."""
+        seq = self.sequences.get(seq_id)
+        if seq is None:
+            return None  # never admitted (or already ended): not an allocation attempt
+        if seq[1] + tokens > seq[0]:
+            return failed(self, 'reservation_full')
+        seq[1] += tokens
+        self.tokens += tokens
+        return True
 
+    def end(self, seq_id):
+        """Release a sequence's whole reservation. Returns False for unknown ids."""
+        seq = self.sequences.pop(seq_id, None)
+        if seq is None:
+            return False
+        if self.arena is not None:
+            self.arena.free(('seq', seq_id))
+        self.usage -= seq[0]
+        self.tokens -= seq[1]
+        return True
 
-        
+    def occupancy(self):
+        """Snapshot of pool state (units); fragmentation is the arena's external fragmentation (0 without one)."""
+        return {
+            'used': self.usage,
+            'compressed': 0,
+            'free': self.size - self.usage,
+            'memory': self.usage,
+            'fragmentation': self.arena.fragmentation() if self.arena is not None else 0.0,
+            'internal_fragmentation': 1 - self.tokens / self.usage if self.usage else 0.0,
+        }
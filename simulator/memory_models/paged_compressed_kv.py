@@ -1,10 +1,68 @@
 """
 Paged KV-cache with compression gate.
+
+Like PagedKV, sequences can grow token by token (prefill/append/end); a new
+block is requested only when the sequence's last one fills, going through the
+same capacity checks (and compression) as a fresh allocation.
+
+Compression is not free: every page packed costs compress_time seconds, and a
+compressed page that is accessed (touch_pages, or a decode append reading its
+sequence) is decompressed at decompress_time seconds per packed block, back
+into used pages when there is room. The time spent is drained per step with
+take_step_costs().
+
+Which used pages get compressed is decided by a pluggable victim policy
+(memory_models/eviction.py: lru, clock, lfu or arc). The model counts the
+pages each policy picked (victims) and how many of them had been decompressed
+before, i.e. hot pages compressed again (recompressions).
+
+compression_from_config derives the ratio and times from the config, or from a
+profile measured by utils/compression_bench.py when `compression_profile` is set;
+compressed_from_config builds the whole model.
 """
+import yaml
+
+from memory_models.eviction import make_policy
+from utils.instrumentation import failed
+
+
+def compression_from_config(config):
+    """
+    (compression_ratio, compress_time, decompress_time) in seconds per page. A `compression_profile`
+    (path to a profile YAML, or the profile inline) overrides the hand-set compression_ratio,
+    compress_time_us and decompress_time_us: times are one page of paged_kv_page_size *
+    kv_bytes_per_token bytes at the measured MB/s.
+    """
+    profile = config.get('compression_profile')
+    if isinstance(profile, str):
+        with open(profile, 'r') as f:
+            profile = yaml.safe_load(f)
+    if not profile:
+        return (config['compression_ratio'], config.get('compress_time_us', 0) * 1e-6,
+                config.get('decompress_time_us', 0) * 1e-6)
+    page_bytes = config['paged_kv_page_size'] * config.get('kv_bytes_per_token', 1)
+    return (profile['ratio'], page_bytes / (profile['compress_mb_s'] * 1e6),
+            page_bytes / (profile['decompress_mb_s'] * 1e6))
+
+
+def compressed_from_config(config):
+    """PagedCompressedKV over the paged pool, with compression_from_config costs and config['eviction_policy']."""
+    ratio, compress_time, decompress_time = compression_from_config(config)
+    return PagedCompressedKV(
+        config['paged_kv_num_pages'],
+        config['paged_kv_page_size'],
+        ratio,
+        config['pressure_threshold'],
+        compress_time=compress_time,
+        decompress_time=decompress_time,
+        policy=config.get('eviction_policy', 'lru'),
+    )
+
 
 class PagedCompressedKV:
-    
-    def __init__(self, num_pages, page_size, compression_ratio, pressure_threshold):
+
+    def __init__(self, num_pages, page_size, compression_ratio, pressure_threshold,
+                 compress_time=0.0, decompress_time=0.0, policy='lru'):
         self.num_pages = num_pages
         self.page_size = page_size
         self.compression_ratio = float(compression_ratio)
@@ -12,57 +70,151 @@ class PagedCompressedKV:
         self.pages = [0] * num_pages  # 0: free, 1: used, 2: compressed
         # LRU: per-page last access timestamp (higher = more recent). 0 = never used.
         self.last_access = [0] * num_pages
+        # Monotonic clock: the largest timestamp handed out so far (replaces max(last_access))
+        self.clock = 0
+        self.free_list = list(range(num_pages - 1, -1, -1))
+        # Block tables: alloc_id -> {page index: number of the allocation's blocks held there}.
+        # A used page holds one block; a compressed page may hold several.
+        self.block_tables = {}
+        self.page_owner = [None] * num_pages  # owner alloc_id of each used page
+        self.compressed_members = {}  # compressed page -> {alloc_id: blocks packed}
+        # Victim selection over used pages (memory_models/eviction.py)
+        self.policy = make_policy(policy, num_pages)
+        # Pages picked for compression, and those of them that had been decompressed before
+        self.reloaded = [False] * num_pages
+        self.victims = 0
+        self.recompressions = 0
+        self._step_evictions = [0, 0]
+        # Live page counters (free pages = len(free_list))
+        self.used_pages = 0
+        self.compressed_pages = 0
+        # Logical blocks held and tokens stored (per allocation and in total), for internal fragmentation
+        self.seq_blocks = {}
+        self.seq_tokens = {}
+        self.blocks_held = 0
+        self.tokens = 0
+        # Cost model: seconds per page compressed / block decompressed, cumulative and since take_step_costs()
+        self.compress_time = compress_time
+        self.decompress_time = decompress_time
+        self.compress_seconds = 0.0
+        self.decompress_seconds = 0.0
+        self._step_costs = [0.0, 0.0]
+        self.counters = None  # utils.instrumentation.Counters when instrumented
 
 
     def effective_usage_pages(self):
         """Return effective usage in page-equivalents: used pages count as 1, compressed count as compression_ratio."""
-        used = sum(1 for s in self.pages if s == 1)
-        compressed = sum(1 for s in self.pages if s == 2)
-        return used + compressed * self.compression_ratio
+        return self.used_pages + self.compressed_pages * self.compression_ratio
+
+    def occupancy(self):
+        """O(1) snapshot of pool state; memory is in request units."""
+        free = len(self.free_list)
+        return {
+            'used': self.used_pages,
+            'compressed': self.compressed_pages,
+            'free': free,
+            'memory': self.effective_usage_pages() * self.page_size,
+            'fragmentation': free / self.num_pages,
+            'internal_fragmentation': 1 - self.tokens / (self.blocks_held * self.page_size) if self.blocks_held else 0.0,
+        }
+
+    def allocate(self, alloc_id, num_blocks, timestamp=None, tokens=None):
+        """Reserve num_blocks blocks holding `tokens` units (default: full blocks)."""
+        if alloc_id in self.block_tables:
+            return failed(self, 'duplicate_id')
+        if not self._make_room(num_blocks):
+            return False
+        if timestamp is not None:
+            self.clock = max(self.clock, timestamp)
+        table = {}
+        self._take_pages(alloc_id, table, num_blocks)
+        self.block_tables[alloc_id] = table
+        self.seq_blocks[alloc_id] = num_blocks
+        if tokens is None:
+            tokens = num_blocks * self.page_size
+        self.seq_tokens[alloc_id] = tokens
+        self.tokens += tokens
+        # After allocation, check compression gate
+        self.check_compression_gate()
+        return True
+
+    def prefill(self, seq_id, tokens, timestamp=None):
+        """Start a sequence with its prompt: ceil(tokens / page_size) blocks."""
+        return self.allocate(seq_id, -(-tokens // self.page_size), timestamp=timestamp, tokens=tokens)
+
+    def append(self, seq_id, tokens=1, timestamp=None):
+        """
+        A decode step: read the whole sequence (decompressing its compressed pages), then add
+        tokens, requesting new blocks only as the last one fills.
+        """
+        table = self.block_tables.get(seq_id)
+        if table is None:
+            return None  # never admitted (or already ended): not an allocation attempt
+        self.touch(seq_id, self.clock if timestamp is None else timestamp)
+        total = self.seq_tokens[seq_id] + tokens
+        extra = -(-total // self.page_size) - self.seq_blocks[seq_id]
+        if extra > 0:
+            if not self._make_room(extra):
+                return False
+            if timestamp is not None:
+                self.clock = max(self.clock, timestamp)
+            self._take_pages(seq_id, table, extra)
+            self.seq_blocks[seq_id] += extra
+            self.check_compression_gate()
+        self.seq_tokens[seq_id] = total
+        self.tokens += tokens
+        return True
 
-    def allocate(self, num_blocks):
+    def _make_room(self, num_blocks):
+        """Compress cold pages as needed so num_blocks new blocks fit; False if they cannot."""
         # Check whether there's enough effective capacity
         if self.effective_usage_pages() + num_blocks > self.num_pages:
             # try to compress more to make room
             self.compress_cold_blocks(target_free=num_blocks)
             if self.effective_usage_pages() + num_blocks > self.num_pages:
-                return False
+                return failed(self, 'effective_capacity')
 
         # Ensure there are enough physical free pages. If not, attempt to compress to free physical pages.
-        free_pages = [i for i, s in enumerate(self.pages) if s == 0]
-        if len(free_pages) < num_blocks:
+        if len(self.free_list) < num_blocks:
             # attempt compression to free physical slots
-            self.compress_cold_blocks(target_free=num_blocks - len(free_pages))
-            free_pages = [i for i, s in enumerate(self.pages) if s == 0]
-            if len(free_pages) < num_blocks:
-                return False
+            self.compress_cold_blocks(target_free=num_blocks - len(self.free_list))
+            if len(self.free_list) < num_blocks:
+                return failed(self, 'no_free_pages')
+        return True
 
-        # Allocate into free pages
-        for i in free_pages[:num_blocks]:
+    def _take_pages(self, alloc_id, table, num_blocks):
+        # Allocate into free pages; new pages count as accessed now
+        for _ in range(num_blocks):
+            i = self.free_list.pop()
             self.pages[i] = 1
-            self.last_access[i] = 0  # will be set by caller via touch
-        # After allocation, check compression gate
-        self.check_compression_gate()
-        return True
+            self.page_owner[i] = alloc_id
+            self.last_access[i] = self.clock
+            self.policy.add(i, self.clock)
+            table[i] = 1
+        self.used_pages += num_blocks
+        self.blocks_held += num_blocks
+        if self.counters is not None:
+            self.counters.add('pages_allocated', num_blocks)
 
-    def free(self, num_blocks):
-        # Free used pages first, then compressed pages
-        freed = 0
-        for i in range(self.num_pages):
-            if self.pages[i] == 1:
-                self.pages[i] = 0
-                self.last_access[i] = 0
-                freed += 1
-                if freed == num_blocks:
-                    return True
-        for i in range(self.num_pages):
+    def free(self, alloc_id):
+        """Release alloc_id's pages. Compressed pages are released once all blocks packed in them are gone."""
+        table = self.block_tables.pop(alloc_id, None)
+        if table is None:
+            return False
+        self.blocks_held -= self.seq_blocks.pop(alloc_id)
+        self.tokens -= self.seq_tokens.pop(alloc_id)
+        for i in table:
             if self.pages[i] == 2:
-                self.pages[i] = 0
-                self.last_access[i] = 0
-                freed += 1
-                if freed == num_blocks:
-                    return True
-        return False
+                members = self.compressed_members[i]
+                members.pop(alloc_id, None)
+                if members:
+                    continue
+                del self.compressed_members[i]
+            self._release_page(i)
+        return True
+
+    # a finished sequence releases its blocks like any allocation
+    end = free
 
     def check_compression_gate(self):
         pressure = self.effective_usage_pages() / self.num_pages
@@ -71,10 +223,45 @@ class PagedCompressedKV:
             self.compress_cold_blocks()
 
     def touch_pages(self, indices, timestamp):
-        """Mark given page indices as accessed at timestamp (for LRU)."""
+        """Mark given page indices as accessed at timestamp (for the victim policy), decompressing compressed ones."""
+        self.clock = max(self.clock, timestamp)
+        if self.counters is not None:
+            self.counters.add('pages_touched', len(indices))
         for i in indices:
             if 0 <= i < self.num_pages:
-                self.last_access[i] = timestamp
+                if self.pages[i] == 1:
+                    self.last_access[i] = timestamp
+                    self.policy.access(i, timestamp)
+                elif self.pages[i] == 2:
+                    self._decompress_page(i, timestamp)
+                else:
+                    self.last_access[i] = timestamp
+
+    def touch(self, alloc_id, timestamp):
+        """Access every page of alloc_id (e.g. attention over the whole sequence)."""
+        self.touch_pages(list(self.block_tables.get(alloc_id, ())), timestamp)
+
+    def take_step_costs(self):
+        """(compress seconds, decompress seconds) spent since the last call, then reset."""
+        costs = tuple(self._step_costs)
+        self._step_costs = [0.0, 0.0]
+        return costs
+
+    def take_step_evictions(self):
+        """(victims, recompressions) since the last call, then reset."""
+        evictions = tuple(self._step_evictions)
+        self._step_evictions = [0, 0]
+        return evictions
+
+    def eviction_stats(self):
+        """Victim counts and the hot-page recompression rate of the policy so far."""
+        return {
+            'policy': self.policy.name,
+            'victims': self.victims,
+            'recompressions': self.recompressions,
+            'recompression_rate': self.recompressions / self.victims if self.victims else 0.0,
+            **self.policy.stats(),
+        }
 
     def compress_cold_blocks(self, target_free=0):
         """
@@ -84,6 +271,7 @@ class PagedCompressedKV:
         For a compression_ratio r, group_size = int(round(1 / r)) pages can be packed into 1 compressed page.
         This will free group_size - 1 physical pages per group.
 
+        Groups are taken coldest-first as ranked by the victim policy (O(1) or O(log n) per page).
         If target_free > 0, we'll try to free at least that many physical pages by performing groups.
         """
         if self.compression_ratio <= 0 or self.compression_ratio >= 1:
@@ -92,45 +280,116 @@ class PagedCompressedKV:
 
         group_size = max(2, int(round(1.0 / self.compression_ratio)))
 
-        # indices of currently used pages
-        used_indices = [i for i, s in enumerate(self.pages) if s == 1]
-        if not used_indices:
-            return
-
         freed_total = 0
-        # For better results, sort used pages by last_access ascending (cold first)
-        used_indices.sort(key=lambda x: self.last_access[x])
-
-        # iterate in groups of group_size over cold pages first
-        i = 0
-        while i + group_size <= len(used_indices):
-            group = used_indices[i:i+group_size]
-            # compress the group into one compressed page: pick the coldest page as the compressed target
-            group_sorted = sorted(group, key=lambda x: self.last_access[x])
-            first = group_sorted[0]
-            others = group_sorted[1:]
-            self.pages[first] = 2
-            # reset last_access for compressed page to recent (simulate compression activity)
-            self.last_access[first] = max(self.last_access) + 1 if self.last_access else 1
-            for idx in others:
-                self.pages[idx] = 0
-                self.last_access[idx] = 0
-            freed_total += (group_size - 1)
-            i += group_size
-            if target_free and freed_total >= target_free:
-                break
-
-        # try compressing smaller leftover group into 1 compressed page
-        if target_free and freed_total < target_free:
-            # take remaining used pages if any
-            remaining = [i for i, s in enumerate(self.pages) if s == 1]
-            if remaining:
-                # compress all remaining into one compressed page
-                first = remaining[0]
-                others = remaining[1:]
-                self.pages[first] = 2
-                for idx in others:
-                    self.pages[idx] = 0
-                freed_total += len(others)
+        packed_total = 0
+        scanned = self.policy.scanned
+        while not (target_free and freed_total >= target_free):
+            group = self.policy.pop_victims(group_size)
+            if len(group) == group_size:
+                self._compress_group(group)
+                freed_total += group_size - 1
+                packed_total += group_size
+                continue
+            # fewer than group_size used pages are left
+            if target_free and group:
+                # compress the smaller leftover group into 1 compressed page
+                self._compress_group(group)
+                freed_total += len(group) - 1
+                packed_total += len(group)
+            else:
+                self.policy.putback(group)
+            break
+        counters = self.counters
+        if counters is not None:
+            counters.add('policy_entries_scanned', self.policy.scanned - scanned)
+            counters.add('compression_passes')
+            counters.add('pages_compressed', packed_total)
+            counters.add('pages_freed', freed_total)
+            counters.observe('pages_compressed', packed_total)
+            counters.observe('pages_freed', freed_total)
+
+    def _decompress_page(self, i, timestamp):
+        """
+        Decompress page i: expand it into one used page per packed block, compressing colder
+        pages for room if needed. Without room it is decompressed into a scratch buffer for
+        this access only and stays compressed. Either way the decompression is charged.
+        """
+        members = self.compressed_members[i]
+        blocks = sum(members.values())
+        self._charge(1, blocks * self.decompress_time)
+        if len(self.free_list) < blocks - 1:
+            self.compress_cold_blocks(target_free=blocks - 1 - len(self.free_list))
+            if len(self.free_list) < blocks - 1:
+                self.last_access[i] = timestamp
+                if self.counters is not None:
+                    self.counters.add('scratch_decompressions')
+                return False
+        if self.counters is not None:
+            self.counters.add('decompressions')
+        del self.compressed_members[i]
+        targets = [i] + [self.free_list.pop() for _ in range(blocks - 1)]
+        self.compressed_pages -= 1
+        self.used_pages += blocks
+        pos = 0
+        for owner, count in members.items():
+            table = self.block_tables[owner]
+            del table[i]
+            for p in targets[pos:pos + count]:
+                self.pages[p] = 1
+                self.page_owner[p] = owner
+                self.last_access[p] = timestamp
+                self.reloaded[p] = True
+                table[p] = 1
+            pos += count
+        self.policy.reloaded(targets, timestamp)
+        return True
+
+    def _charge(self, kind, seconds):
+        if kind:
+            self.decompress_seconds += seconds
+        else:
+            self.compress_seconds += seconds
+        self._step_costs[kind] += seconds
 
+    def _compress_group(self, group):
+        """Pack the used pages in group (coldest first) into the coldest one."""
+        first = group[0]
+        members = {}
+        recompressed = 0
+        for i in group:
+            if self.reloaded[i]:
+                recompressed += 1
+                self.reloaded[i] = False
+            owner = self.page_owner[i]
+            table = self.block_tables[owner]
+            del table[i]
+            table[first] = table.get(first, 0) + 1
+            members[owner] = members.get(owner, 0) + 1
+            self.page_owner[i] = None
+        self.compressed_members[first] = members
+        self.policy.compressed(first, group)
+        self.victims += len(group)
+        self.recompressions += recompressed
+        self._step_evictions[0] += len(group)
+        self._step_evictions[1] += recompressed
+        self._charge(0, len(group) * self.compress_time)
+        self.pages[first] = 2
+        self.used_pages -= 1
+        self.compressed_pages += 1
+        # reset last_access for compressed page to recent (simulate compression activity)
+        self.clock += 1
+        self.last_access[first] = self.clock
+        for i in group[1:]:
+            self._release_page(i)
 
+    def _release_page(self, i):
+        if self.pages[i] == 1:
+            self.used_pages -= 1
+        else:
+            self.compressed_pages -= 1
+        self.policy.remove(i)
+        self.pages[i] = 0
+        self.last_access[i] = 0
+        self.reloaded[i] = False
+        self.page_owner[i] = None
+        self.free_list.append(i)
@@ -1,29 +1,96 @@
 """
 Paged KV-cache model.
+
+Sequences can also grow token by token (prefill/append/end): a new page is
+taken only when the last one fills up, so the only waste is the unfilled tail
+of each sequence's last page (reported as internal fragmentation).
 """
+from utils.instrumentation import failed
+
 
 class PagedKV:
     def __init__(self, num_pages, page_size):
         self.num_pages = num_pages
         self.page_size = page_size
         self.pages = [0] * num_pages  # 0: free, 1: used
+        # Free pages are kept on a stack (lowest index on top) so allocate/free
+        # never have to scan `pages`.
+        self.free_list = list(range(num_pages - 1, -1, -1))
+        # Block tables: alloc_id -> list of page indices owned by that allocation
+        self.block_tables = {}
+        # Tokens stored per allocation, and in total, for internal fragmentation
+        self.seq_tokens = {}
+        self.tokens = 0
+        self.counters = None  # utils.instrumentation.Counters when instrumented
+
+    def occupancy(self):
+        """O(1) snapshot of pool state; memory is in request units."""
+        free = len(self.free_list)
+        capacity = (self.num_pages - free) * self.page_size
+        return {
+            'used': self.num_pages - free,
+            'compressed': 0,
+            'free': free,
+            'memory': capacity,
+            'fragmentation': free / self.num_pages,
+            'internal_fragmentation': 1 - self.tokens / capacity if capacity else 0.0,
+        }
+
+    def allocate(self, alloc_id, num_blocks, tokens=None):
+        """
+        Reserve num_blocks pages for alloc_id, holding `tokens` units (default: the pages
+        are full). Returns False if they don't fit.
+        """
+        if alloc_id in self.block_tables:
+            return failed(self, 'duplicate_id')
+        if num_blocks > len(self.free_list):
+            return failed(self, 'no_free_pages')
+        self.block_tables[alloc_id] = self._take_pages(num_blocks)
+        if tokens is None:
+            tokens = num_blocks * self.page_size
+        self.seq_tokens[alloc_id] = tokens
+        self.tokens += tokens
+        return True
+
+    def prefill(self, seq_id, tokens):
+        """Start a sequence with its prompt: ceil(tokens / page_size) pages."""
+        return self.allocate(seq_id, -(-tokens // self.page_size), tokens=tokens)
+
+    def append(self, seq_id, tokens=1):
+        """Add decoded tokens to a sequence, taking new pages only as the last one fills."""
+        owned = self.block_tables.get(seq_id)
+        if owned is None:
+            return None  # never admitted (or already ended): not an allocation attempt
+        total = self.seq_tokens[seq_id] + tokens
+        extra = -(-total // self.page_size) - len(owned)
+        if extra > len(self.free_list):
+            return failed(self, 'no_free_pages')
+        if extra > 0:
+            owned.extend(self._take_pages(extra))
+        self.seq_tokens[seq_id] = total
+        self.tokens += tokens
+        return True
+
+    def _take_pages(self, n):
+        split = len(self.free_list) - n
+        taken = self.free_list[split:]
+        del self.free_list[split:]
+        for i in taken:
+            self.pages[i] = 1
+        if self.counters is not None:
+            self.counters.add('pages_allocated', n)
+        return taken
+
+    def free(self, alloc_id):
+        """Release every page owned by alloc_id. Returns False for unknown ids."""
+        owned = self.block_tables.pop(alloc_id, None)
+        if owned is None:
+            return False
+        self.tokens -= self.seq_tokens.pop(alloc_id)
+        for i in owned:
+            self.pages[i] = 0
+        self.free_list.extend(owned)
+        return True
 
-    def allocate(self, num_blocks):
-        allocated = 0
-        for i in range(self.num_pages):
-            if self.pages[i] == 0:
-                self.pages[i] = 1
-                allocated += 1
-                if allocated == num_blocks:
-                    return True
-        return False
-
-    def free(self, num_blocks):
-        freed = 0
-        for i in range(self.num_pages):
-            if self.pages[i] == 1:
-                self.pages[i] = 0
-                freed += 1
-                if freed == num_blocks:
-                    return True
-        return False
+    # a finished sequence releases its pages like any allocation
+    end = free
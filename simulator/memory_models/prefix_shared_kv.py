@@ -0,0 +1,182 @@
+"""
+Paged KV-cache with prefix sharing.
+
+Allocations may declare a shared prefix (e.g. a system prompt) by id and
+length. Pages holding only prefix tokens are looked up in a prefix index keyed
+by (prefix, page number, tokens in page) and shared with a reference count, so
+a request reuses every cached page of its prefix in O(prefix pages) and only
+takes new pages for the rest. Appending to a shared, partly filled page copies
+it first (copy-on-write). Pages leave the index when their last reference is
+freed.
+"""
+from utils.instrumentation import failed
+
+
+class PrefixSharedKV:
+    def __init__(self, num_pages, page_size):
+        self.num_pages = num_pages
+        self.page_size = page_size
+        self.refcount = [0] * num_pages  # 0: free
+        self.page_fill = [0] * num_pages  # tokens held by each page
+        self.page_key = [None] * num_pages  # prefix index key of a shared-prefix page
+        self.free_list = list(range(num_pages - 1, -1, -1))
+        # Prefix index: (prefix, page number, fill) -> page
+        self.prefix_index = {}
+        # Block tables: alloc_id -> list of page indices (shared pages appear in several tables)
+        self.block_tables = {}
+        self.seq_tokens = {}
+        # Live counters: tokens on physical pages, pages referenced by all block tables
+        self.tokens = 0
+        self.logical_pages = 0
+        self.shared_pages = 0  # physical pages with refcount > 1
+        self.cow_copies = 0
+        self.counters = None  # utils.instrumentation.Counters when instrumented
+
+    def occupancy(self):
+        """O(1) snapshot of pool state; memory is in request units, `saved` in pages."""
+        free = len(self.free_list)
+        used = self.num_pages - free
+        capacity = used * self.page_size
+        return {
+            'used': used,
+            'compressed': 0,
+            'free': free,
+            'memory': capacity,
+            'fragmentation': free / self.num_pages,
+            'internal_fragmentation': 1 - self.tokens / capacity if capacity else 0.0,
+            'shared': self.shared_pages,
+            # pages private copies would need on top of what is in use
+            'saved': self.logical_pages - used,
+        }
+
+    def _prefix_keys(self, tokens, prefix, prefix_len):
+        """Index keys for the leading pages of an allocation that hold prefix tokens only."""
+        if prefix is None or prefix_len <= 0:
+            return []
+        prefix_len = min(prefix_len, tokens)
+        full, tail = divmod(prefix_len, self.page_size)
+        keys = [(prefix, i, self.page_size) for i in range(full)]
+        # a partly filled prefix page is shareable only if no private tokens follow it
+        if tail and prefix_len == tokens:
+            keys.append((prefix, full, tail))
+        return keys
+
+    def allocate(self, alloc_id, num_blocks, tokens=None, prefix=None, prefix_len=0):
+        """
+        Map alloc_id onto num_blocks pages holding `tokens` units (default: full pages), reusing
+        indexed pages for its first prefix_len tokens of `prefix`. Returns False if the new pages don't fit.
+        """
+        if alloc_id in self.block_tables:
+            return failed(self, 'duplicate_id')
+        if tokens is None:
+            tokens = num_blocks * self.page_size
+        keys = self._prefix_keys(tokens, prefix, prefix_len)[:num_blocks]
+        cached = [self.prefix_index.get(key) for key in keys]
+        hits = len(cached) - cached.count(None)
+        if self.counters is not None:
+            self.counters.add('prefix_page_hits', hits)
+            self.counters.add('prefix_page_misses', len(cached) - hits)
+        if num_blocks - hits > len(self.free_list):
+            return failed(self, 'no_free_pages')
+
+        owned = []
+        for key, page in zip(keys, cached):
+            if page is None:
+                page = self._take_page(key[2])
+                self.page_key[page] = key
+                self.prefix_index[key] = page
+            else:
+                self._ref(page)
+            owned.append(page)
+        remaining = tokens - sum(key[2] for key in keys)
+        for _ in range(num_blocks - len(owned)):
+            fill = min(self.page_size, max(remaining, 0))
+            owned.append(self._take_page(fill))
+            remaining -= fill
+        self.block_tables[alloc_id] = owned
+        self.seq_tokens[alloc_id] = tokens
+        self.logical_pages += num_blocks
+        return True
+
+    def prefill(self, seq_id, tokens, prefix=None, prefix_len=0):
+        """Start a sequence with its prompt, sharing the cached pages of its prefix."""
+        return self.allocate(seq_id, -(-tokens // self.page_size), tokens=tokens, prefix=prefix, prefix_len=prefix_len)
+
+    def append(self, seq_id, tokens=1):
+        """Add decoded tokens; a shared last page is copied before it is written (copy-on-write)."""
+        owned = self.block_tables.get(seq_id)
+        if owned is None:
+            return None  # never admitted (or already ended): not an allocation attempt
+        current = self.seq_tokens[seq_id]
+        total = current + tokens
+        extra = -(-total // self.page_size) - len(owned)
+        last = owned[-1] if owned else None
+        writes_last = last is not None and current % self.page_size != 0
+        copy = writes_last and self.refcount[last] > 1
+        if max(extra, 0) + copy > len(self.free_list):
+            return failed(self, 'no_free_pages')
+
+        if writes_last:
+            if copy:
+                self._unref(last)
+                last = self._take_page(self.page_fill[last])
+                owned[-1] = last
+                self.cow_copies += 1
+            elif self.page_key[last] is not None:
+                # written in place: its content no longer matches the indexed prefix page
+                del self.prefix_index[self.page_key[last]]
+                self.page_key[last] = None
+            added = min(self.page_size - self.page_fill[last], tokens)
+            self.page_fill[last] += added
+            self.tokens += added
+            remaining = tokens - added
+        else:
+            remaining = tokens
+        for _ in range(max(extra, 0)):
+            fill = min(self.page_size, remaining)
+            owned.append(self._take_page(fill))
+            remaining -= fill
+        self.logical_pages += max(extra, 0)
+        self.seq_tokens[seq_id] = total
+        return True
+
+    def free(self, alloc_id):
+        """Drop alloc_id's references; pages return to the free list when no one else holds them."""
+        owned = self.block_tables.pop(alloc_id, None)
+        if owned is None:
+            return False
+        del self.seq_tokens[alloc_id]
+        self.logical_pages -= len(owned)
+        for page in owned:
+            self._unref(page)
+        return True
+
+    # a finished sequence releases its pages like any allocation
+    end = free
+
+    def _take_page(self, fill):
+        page = self.free_list.pop()
+        if self.counters is not None:
+            self.counters.add('pages_allocated')
+        self.refcount[page] = 1
+        self.page_fill[page] = fill
+        self.tokens += fill
+        return page
+
+    def _ref(self, page):
+        self.refcount[page] += 1
+        if self.refcount[page] == 2:
+            self.shared_pages += 1
+
+    def _unref(self, page):
+        self.refcount[page] -= 1
+        if self.refcount[page] == 1:
+            self.shared_pages -= 1
+        elif self.refcount[page] == 0:
+            key = self.page_key[page]
+            if key is not None:
+                del self.prefix_index[key]
+                self.page_key[page] = None
+            self.tokens -= self.page_fill[page]
+            self.page_fill[page] = 0
+            self.free_list.append(page)
@@ -0,0 +1,174 @@
+"""
+Multi-tier paged KV-cache with offload (e.g. HBM / host DRAM / disk).
+
+Pages live in the fastest tier while it has room. When it fills up, its least
+recently used page is demoted one tier down (cascading further if that tier is
+full too), and a page in a slower tier is promoted back to the fastest one when
+its sequence is accessed. Allocation only fails once every tier is full.
+
+Every page move is charged to the links it crosses: the link into tier k has a
+bandwidth and a latency, and moving one page over it costs
+latency + page_bytes / bandwidth seconds of stall. Bytes moved and stall time
+are accumulated per tier and can be drained per step with take_step_costs().
+"""
+from collections import OrderedDict
+
+from utils.instrumentation import failed
+
+
+def tiers_from_config(config):
+    """The config's `tiers` list, or a single tier matching the paged pool when it has none."""
+    tiers = config.get('tiers')
+    if not tiers:
+        return [{'name': 'hbm', 'pages': config['paged_kv_num_pages']}]
+    tiers = [dict(t) for t in tiers]
+    tiers[0].setdefault('pages', config['paged_kv_num_pages'])
+    return tiers
+
+
+class TieredKV:
+    def __init__(self, tiers, page_size, bytes_per_token=1):
+        """
+        tiers: fastest first, each {'name', 'pages', 'bandwidth_gbps', 'latency_us'}; bandwidth and
+        latency describe the link from the tier above (ignored for the first tier).
+        """
+        if not tiers or any(t['pages'] < 1 for t in tiers):
+            raise ValueError("every tier needs at least one page")
+        self.page_size = page_size
+        self.names = [t['name'] for t in tiers]
+        self.capacity = [t['pages'] for t in tiers]
+        self.bandwidth = [t.get('bandwidth_gbps', 0) * 1e9 for t in tiers]  # bytes/s
+        self.latency = [t.get('latency_us', 0) * 1e-6 for t in tiers]  # s
+        self.page_bytes = page_size * bytes_per_token
+        self.total_pages = sum(self.capacity)
+        # Per tier: page -> None in LRU order (coldest first)
+        self.lru = [OrderedDict() for _ in tiers]
+        self.page_tier = {}
+        self.block_tables = {}
+        self.seq_tokens = {}
+        self.tokens = 0
+        self.used_pages = 0
+        self._next_page = 0  # page ids are never reused
+        # Cumulative and not-yet-drained per-step transfer costs, indexed by tier
+        self.bytes_moved = [0] * len(tiers)
+        self.stall_time = [0.0] * len(tiers)
+        self._step_bytes = [0] * len(tiers)
+        self._step_stall = [0.0] * len(tiers)
+        self.counters = None  # utils.instrumentation.Counters when instrumented
+
+    def occupancy(self):
+        """O(1) snapshot over all tiers; memory is in request units, tier_pages per tier."""
+        free = self.total_pages - self.used_pages
+        capacity = self.used_pages * self.page_size
+        return {
+            'used': self.used_pages,
+            'compressed': 0,
+            'free': free,
+            'memory': capacity,
+            'fragmentation': free / self.total_pages,
+            'internal_fragmentation': 1 - self.tokens / capacity if capacity else 0.0,
+            'tier_pages': {name: len(lru) for name, lru in zip(self.names, self.lru)},
+        }
+
+    def take_step_costs(self):
+        """Bytes moved and stall seconds per tier link since the last call, then reset."""
+        costs = {name: (self._step_bytes[k], self._step_stall[k]) for k, name in enumerate(self.names) if k}
+        self._step_bytes = [0] * len(self.names)
+        self._step_stall = [0.0] * len(self.names)
+        return costs
+
+    def allocate(self, alloc_id, num_blocks, tokens=None):
+        """Place num_blocks new pages in the fastest tier, demoting cold pages to make room."""
+        if alloc_id in self.block_tables:
+            return failed(self, 'duplicate_id')
+        if num_blocks > self.total_pages - self.used_pages:
+            return failed(self, 'all_tiers_full')
+        self.block_tables[alloc_id] = [self._new_page() for _ in range(num_blocks)]
+        if tokens is None:
+            tokens = num_blocks * self.page_size
+        self.seq_tokens[alloc_id] = tokens
+        self.tokens += tokens
+        return True
+
+    def prefill(self, seq_id, tokens):
+        """Start a sequence with its prompt: ceil(tokens / page_size) pages."""
+        return self.allocate(seq_id, -(-tokens // self.page_size), tokens=tokens)
+
+    def append(self, seq_id, tokens=1):
+        """A decode step: read the whole sequence (promoting offloaded pages), then add tokens."""
+        owned = self.block_tables.get(seq_id)
+        if owned is None:
+            return None  # never admitted (or already ended): not an allocation attempt
+        total = self.seq_tokens[seq_id] + tokens
+        extra = -(-total // self.page_size) - len(owned)
+        if extra > self.total_pages - self.used_pages:
+            return failed(self, 'all_tiers_full')
+        self.touch(seq_id)
+        owned.extend(self._new_page() for _ in range(max(extra, 0)))
+        self.seq_tokens[seq_id] = total
+        self.tokens += tokens
+        return True
+
+    def touch(self, alloc_id):
+        """Mark alloc_id's pages as just used, promoting any in slower tiers to the fastest one."""
+        for page in self.block_tables.get(alloc_id, ()):
+            tier = self.page_tier[page]
+            if tier == 0:
+                self.lru[0].move_to_end(page)
+                continue
+            del self.lru[tier][page]
+            # the slot just vacated guarantees the cascade finds room
+            self._make_room(0)
+            self.lru[0][page] = None
+            self.page_tier[page] = 0
+            self._charge(0, tier)
+            if self.counters is not None:
+                self.counters.add('promotions')
+
+    def free(self, alloc_id):
+        """Release alloc_id's pages in whichever tiers hold them. Returns False for unknown ids."""
+        owned = self.block_tables.pop(alloc_id, None)
+        if owned is None:
+            return False
+        self.tokens -= self.seq_tokens.pop(alloc_id)
+        for page in owned:
+            del self.lru[self.page_tier.pop(page)][page]
+        self.used_pages -= len(owned)
+        return True
+
+    # a finished sequence releases its pages like any allocation
+    end = free
+
+    def _new_page(self):
+        self._make_room(0)
+        page = self._next_page
+        self._next_page += 1
+        if self.counters is not None:
+            self.counters.add('pages_allocated')
+        self.lru[0][page] = None
+        self.page_tier[page] = 0
+        self.used_pages += 1
+        return page
+
+    def _make_room(self, tier):
+        """Free a slot in `tier` by demoting its coldest page (recursively); False if all lower tiers are full."""
+        if len(self.lru[tier]) < self.capacity[tier]:
+            return True
+        if tier + 1 == len(self.lru) or not self._make_room(tier + 1):
+            return False
+        victim, _ = self.lru[tier].popitem(last=False)
+        self.lru[tier + 1][victim] = None
+        self.page_tier[victim] = tier + 1
+        self._charge(tier, tier + 1)
+        if self.counters is not None:
+            self.counters.add('demotions')
+        return True
+
+    def _charge(self, upper, lower):
+        """Charge one page crossing every link between tiers upper and lower."""
+        for k in range(upper + 1, lower + 1):
+            stall = self.latency[k] + (self.page_bytes / self.bandwidth[k] if self.bandwidth[k] else 0.0)
+            self.bytes_moved[k] += self.page_bytes
+            self.stall_time[k] += stall
+            self._step_bytes[k] += self.page_bytes
+            self._step_stall[k] += stall
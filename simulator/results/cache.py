@@ -0,0 +1,202 @@
+"""
+Content-addressed on-disk cache of simulation results.
+
+A run of main.py is keyed by a SHA-256 of everything its records depend on: the
+config (minus keys that only affect plotting or bookkeeping, see
+NON_RESULT_KEYS), the trace identity (the seed, the `workload:` block's own
+seed, or the content of a replayed trace file), the content of a compression_profile file, whether the run is
+instrumented, and the code version, a digest of the simulator's sources. An
+entry holds the run's record store, its stats summary and instrumentation
+counters, plus one set of plots per plot key (plot settings and plotter
+source), so new plot settings are rendered from the stored records without
+simulating again.
+
+Entries live in <cache_dir>/<key>/ and are written to a temporary directory
+first, then renamed into place. The cache is bounded by total size: after each
+store the least recently used entries (directory mtime, refreshed on every hit)
+are removed until it fits.
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+# Config keys that do not change main.run_simulation's records or stats
+NON_RESULT_KEYS = ('plot_max_points', 'plot_downsample', 'cache_dir', 'cache_max_mb', 'checkpoint_every',
+                   'log_chunk_size', 'scheduler', 'sharding')
+# Sources whose content defines the code version, relative to the simulator directory
+SOURCE_DIRS = ('core', 'memory_models', 'utils', 'results')
+SOURCE_FILES = ('main.py',)
+PLOT_SOURCES = ('results/plotter.py',)
+SIMULATOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECORDS_DIR = 'records'
+STATS_FILE = 'stats.json'
+PLOTS_DIR = 'plots'
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _digest_sources(paths):
+    digest = hashlib.sha256()
+    for rel in paths:
+        digest.update(rel.encode())
+        with open(os.path.join(SIMULATOR_DIR, rel), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def code_version():
+    """Digest of the simulator sources that produce records and stats (the plotter has its own)."""
+    paths = list(SOURCE_FILES)
+    for top in SOURCE_DIRS:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(SIMULATOR_DIR, top)):
+            dirnames[:] = sorted(d for d in dirnames if d != '__pycache__')
+            for name in sorted(filenames):
+                rel = os.path.relpath(os.path.join(dirpath, name), SIMULATOR_DIR)
+                if name.endswith('.py') and rel not in PLOT_SOURCES:
+                    paths.append(rel)
+    return _digest_sources(paths)
+
+
+def _hash(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _tree_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def cache_from_config(config):
+    """ResultCache at config['cache_dir'] bounded by config['cache_max_mb'], or None when caching is off."""
+    root = config.get('cache_dir')
+    if not root:
+        return None
+    return ResultCache(root, max_bytes=int(config.get('cache_max_mb', 1024) * 2 ** 20))
+
+
+class ResultCache:
+    def __init__(self, root, max_bytes=2 ** 30):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, config, seed=None, trace_file=None, instrument=False):
+        """Entry key of a run; None when its trace is not reproducible (no seed of either kind, no trace file)."""
+        workload = config.get('workload') or {}
+        if trace_file:
+            trace = {'trace_file_sha256': file_digest(trace_file)}
+        elif workload.get('seed') is not None:
+            # the block's own seed wins over the run's (utils/workloads.py::workload_from_config)
+            trace = {'workload_seed': workload['seed']}
+        elif seed is not None:
+            trace = {'seed': seed}
+        else:
+            return None
+        settings = {k: v for k, v in config.items() if k not in NON_RESULT_KEYS}
+        profile = settings.get('compression_profile')
+        if isinstance(profile, str):
+            settings['compression_profile'] = {'path': profile, 'sha256': file_digest(profile)}
+        return _hash({'config': settings, 'trace': trace, 'instrument': bool(instrument), 'code': code_version()})
+
+    def plot_key(self, config):
+        """Key of a set of plots of an entry's records: the plot settings and the plotter's source."""
+        return _hash({'max_points': config.get('plot_max_points', 2000),
+                      'method': config.get('plot_downsample', 'minmax'),
+                      'code': _digest_sources(PLOT_SOURCES)})[:16]
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def lookup(self, key):
+        """The entry's stored {'summary', 'instrumentation'} and records path, or None; a hit marks it used."""
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, STATS_FILE)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        entry['records'] = os.path.join(path, RECORDS_DIR)
+        return entry
+
+    def store(self, key, records_path, summary, instrumentation=None):
+        """Copy a finished run's record store and stats into the cache, then evict down to max_bytes."""
+        tmp = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        try:
+            shutil.copytree(records_path, os.path.join(tmp, RECORDS_DIR))
+            with open(os.path.join(tmp, STATS_FILE), 'w') as f:
+                json.dump({'summary': summary, 'instrumentation': instrumentation}, f, default=float)
+            try:
+                os.rename(tmp, self._path(key))
+            except OSError:
+                # another run stored the same key first
+                pass
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def plots(self, key, plot_key):
+        """Paths of the entry's plots for plot_key, or None if they have not been rendered yet."""
+        path = os.path.join(self._path(key), PLOTS_DIR, plot_key)
+        if not os.path.isdir(path):
+            return None
+        return [os.path.join(path, name) for name in sorted(os.listdir(path))]
+
+    def store_plots(self, key, plot_key, files):
+        """Keep copies of rendered plot files under the entry (skipped if the entry was evicted)."""
+        entry = self._path(key)
+        if not os.path.isdir(entry):
+            return
+        tmp = os.path.join(entry, PLOTS_DIR, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        try:
+            for path in files:
+                shutil.copy2(path, tmp)
+            try:
+                os.rename(tmp, os.path.join(entry, PLOTS_DIR, plot_key))
+            except OSError:
+                pass
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """(last used, size in bytes, key) of every entry, least recently used first."""
+        out = []
+        for name in os.listdir(self.root):
+            path = self._path(name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                out.append((os.stat(path).st_mtime, _tree_size(path), name))
+            except OSError:
+                pass
+        return sorted(out)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes; returns the keys removed."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._path(key), ignore_errors=True)
+            total -= size
+            removed.append(key)
+        return removed
@@ -1,24 +1,108 @@
 """Plotting utilities for simulation results.
 Saves one image per comparison metric into an output directory.
+
+Long series are downsampled before drawing (min/max bucketing or LTTB), so the
+number of points handed to matplotlib, and with it plot time, does not depend
+on the number of simulated steps.
 """
 import os
 import matplotlib.pyplot as plt
+import numpy as np
+
+
+def _series(records, key):
+    """
+    Column `key` as a NumPy array. records may be a column source (RecordColumns),
+    a dict of arrays, a structured array, or a list of record dicts.
+    """
+    if hasattr(records, 'column_names') or isinstance(records, dict):
+        return np.asarray(records[key])
+    if isinstance(records, np.ndarray) and records.dtype.names:
+        return records[key]
+    return np.array([r[key] for r in records])
+
+
+def minmax_downsample(x, y, max_points):
+    """Keep the min and max of each of max_points // 2 buckets covering the series (plus the end points), in order."""
+    n = len(y)
+    n_buckets = max_points // 2
+    if n <= max_points or n_buckets < 1:
+        return np.asarray(x), np.asarray(y)
+    # buckets of n // n_buckets or one more samples, together covering every sample;
+    # shorter buckets repeat their last sample to fill the rectangle
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    width = int(np.diff(edges).max())
+    rows = np.minimum(edges[:-1, None] + np.arange(width), edges[1:, None] - 1)
+    body = np.asarray(y)[rows]
+    lo = rows[np.arange(n_buckets), body.argmin(axis=1)]
+    hi = rows[np.arange(n_buckets), body.argmax(axis=1)]
+    idx = np.unique(np.concatenate([[0], lo, hi, [n - 1]]))
+    return np.asarray(x[idx]), np.asarray(y[idx])
+
 
+def lttb(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets downsampling: from each bucket keep the point forming
+    the largest triangle with the previously kept point and the next bucket's average.
+    """
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.asarray(x), np.asarray(y)
+    every = (n - 2) / (max_points - 2)
+    idx = np.empty(max_points, dtype=np.int64)
+    idx[0] = 0
+    a = 0
+    for i in range(max_points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if end >= next_end:
+            avg_x, avg_y = float(x[n - 1]), float(y[n - 1])
+        else:
+            avg_x = float(np.mean(x[end:next_end]))
+            avg_y = float(np.mean(y[end:next_end]))
+        ax, ay = float(x[a]), float(y[a])
+        xs = np.asarray(x[start:end], dtype=np.float64)
+        ys = np.asarray(y[start:end], dtype=np.float64)
+        area = np.abs((ax - avg_x) * (ys - ay) - (ax - xs) * (avg_y - ay))
+        a = start + int(area.argmax())
+        idx[i + 1] = a
+    idx[-1] = n - 1
+    return np.asarray(x[idx]), np.asarray(y[idx])
 
-def plot_records(records, out_dir='results'):
+
+DOWNSAMPLERS = {
+    'minmax': minmax_downsample,
+    'lttb': lttb,
+}
+
+
+def plot_records(records, out_dir='results', max_points=2000, method='minmax'):
+    """
+    Save memory, fragmentation and throughput plots. Each series is reduced to at most
+    max_points points with `method` ('minmax' keeps spikes, 'lttb' keeps visual shape);
+    pass max_points=None to plot every step. Returns the paths of the three PNGs.
+    """
     os.makedirs(out_dir, exist_ok=True)
+    downsample = DOWNSAMPLERS[method]
 
-    steps = [r['step'] for r in records]
+    steps = _series(records, 'step')
 
-    # Memory over time for each model
-    mem_mono = [r['memory_monolithic'] for r in records]
-    mem_paged = [r['memory_paged'] for r in records]
-    mem_pc = [r['memory_paged_compressed'] for r in records]
+    def plot_series(key, **kwargs):
+        y = _series(records, key)
+        if max_points:
+            x, y = downsample(steps, y, max_points)
+        else:
+            x = steps
+        plt.plot(x, y, **kwargs)
 
+    # Memory over time for each model
     plt.figure(figsize=(10, 6))
-    plt.plot(steps, mem_mono, label='Monolithic')
-    plt.plot(steps, mem_paged, label='Paged')
-    plt.plot(steps, mem_pc, label='Paged+Compressed')
+    plot_series('memory_monolithic', label='Monolithic')
+    plot_series('memory_paged', label='Paged')
+    plot_series('memory_paged_compressed', label='Paged+Compressed')
+    plot_series('memory_prefix_shared', label='Paged+Prefix sharing')
+    plot_series('memory_tiered', label='Tiered offload (all tiers)')
     plt.xlabel('Step')
     plt.ylabel('Memory usage (units)')
     plt.title('Memory usage over time')
@@ -29,14 +113,12 @@ def plot_records(records, out_dir='results'):
     plt.close()
 
     # Fragmentation comparison
-    frag_mono = [r['fragmentation_monolithic'] for r in records]
-    frag_paged = [r['fragmentation_paged'] for r in records]
-    frag_pc = [r['fragmentation_paged_compressed'] for r in records]
-
     plt.figure(figsize=(10, 6))
-    plt.plot(steps, frag_mono, label='Monolithic')
-    plt.plot(steps, frag_paged, label='Paged')
-    plt.plot(steps, frag_pc, label='Paged+Compressed')
+    plot_series('fragmentation_monolithic', label='Monolithic')
+    plot_series('fragmentation_paged', label='Paged')
+    plot_series('fragmentation_paged_compressed', label='Paged+Compressed')
+    plot_series('fragmentation_prefix_shared', label='Paged+Prefix sharing')
+    plot_series('fragmentation_tiered', label='Tiered offload (all tiers)')
     plt.xlabel('Step')
     plt.ylabel('Fragmentation (fraction)')
     plt.title('Fragmentation over time')
@@ -47,9 +129,8 @@ def plot_records(records, out_dir='results'):
     plt.close()
 
     # Throughput over time
-    throughput = [r['throughput'] for r in records]
     plt.figure(figsize=(10, 6))
-    plt.plot(steps, throughput, label='Throughput')
+    plot_series('throughput', label='Throughput')
     plt.xlabel('Step')
     plt.ylabel('Request size')
     plt.title('Request sizes (throughput) over time')
@@ -59,3 +140,4 @@ def plot_records(records, out_dir='results'):
     plt.close()
 
     print(f"Saved plots: {mem_path}, {frag_path}, {thr_path}")
+    return [mem_path, frag_path, thr_path]
@@ -0,0 +1,214 @@
+"""
+Columnar binary store for per-step simulation records.
+
+A store is a directory holding one raw little-endian file per column
+(`<name>.bin`) plus `meta.json` with the column dtypes and the row count.
+Columns are appended in fixed-size chunks while the simulation runs and read
+back with numpy.memmap, so neither writing nor reading needs the whole history
+in memory. CSV export is available on demand.
+"""
+import csv
+import json
+import os
+
+import numpy as np
+
+from utils.helpers import OP_CODES, OP_NAMES, decode_event
+
+# Known record fields and their on-disk types. Other numeric keys found in the
+# first logged record (e.g. the per-tier bytes_moved_<tier>/stall_<tier>) are
+# stored as float64 columns.
+RECORD_COLUMNS = [
+    ('step', '<i8'),
+    ('time', '<i8'),
+    ('op', 'u1'),
+    ('id', '<i8'),
+    ('size', '<u4'),
+    ('throughput', '<u4'),
+    ('memory_monolithic', '<f8'),
+    ('memory_paged', '<f8'),
+    ('memory_paged_compressed', '<f8'),
+    ('memory_prefix_shared', '<f8'),
+    ('memory_saved_prefix_shared', '<f8'),
+    ('memory_tiered', '<f8'),
+    ('fragmentation_monolithic', '<f4'),
+    ('fragmentation_paged', '<f4'),
+    ('fragmentation_paged_compressed', '<f4'),
+    ('fragmentation_prefix_shared', '<f4'),
+    ('fragmentation_tiered', '<f4'),
+    ('internal_fragmentation_monolithic', '<f4'),
+    ('internal_fragmentation_paged', '<f4'),
+    ('internal_fragmentation_paged_compressed', '<f4'),
+    ('internal_fragmentation_prefix_shared', '<f4'),
+    ('internal_fragmentation_tiered', '<f4'),
+    ('failed_monolithic', 'u1'),
+    ('failed_paged', 'u1'),
+    ('failed_paged_compressed', 'u1'),
+    ('failed_prefix_shared', 'u1'),
+    ('failed_tiered', 'u1'),
+    ('attempted_monolithic', 'u1'),
+    ('attempted_paged', 'u1'),
+    ('attempted_paged_compressed', 'u1'),
+    ('attempted_prefix_shared', 'u1'),
+    ('attempted_tiered', 'u1'),
+]
+EVENT_COLUMNS = ('op', 'id', 'size')
+META_FILE = 'meta.json'
+FORMAT_VERSION = 1
+
+
+class RecordStore:
+    """
+    Streaming writer. Accepts the same record dicts as Logger.log, splitting the
+    `event` dict into op/id/size columns.
+
+    With resume_rows, an existing store is cut back to its first resume_rows rows and
+    appended to (a run resumed from a checkpoint taken after that many records).
+    """
+
+    def __init__(self, path, chunk_size=65536, resume_rows=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.columns = None
+        self._buffers = None
+        self._fill = 0
+        self._files = {}
+        os.makedirs(path, exist_ok=True)
+        if resume_rows is not None:
+            self._reopen(resume_rows)
+
+    def _reopen(self, rows):
+        with open(os.path.join(self.path, META_FILE)) as f:
+            meta = json.load(f)
+        if meta['count'] < rows:
+            raise ValueError(f"{self.path} holds {meta['count']} records, fewer than the {rows} to resume after")
+        self.count = rows
+        if not meta['columns']:
+            return
+        self.columns = [tuple(c) for c in meta['columns']]
+        self._buffers = {name: np.zeros(self.chunk_size, dtype=dtype) for name, dtype in self.columns}
+        for name, dtype in self.columns:
+            f = open(os.path.join(self.path, f"{name}.bin"), 'r+b')
+            f.truncate(rows * np.dtype(dtype).itemsize)
+            f.seek(0, os.SEEK_END)
+            self._files[name] = f
+        self._write_meta()
+
+    def _init_columns(self, record):
+        known = dict(RECORD_COLUMNS)
+        has_event = isinstance(record.get('event'), dict)
+        columns = [(name, dtype) for name, dtype in RECORD_COLUMNS
+                   if name in record or (has_event and name in EVENT_COLUMNS)]
+        for k, v in record.items():
+            if k not in known and k != 'event' and isinstance(v, (int, float)):
+                columns.append((k, '<f8'))
+        self.columns = columns
+        self._buffers = {name: np.zeros(self.chunk_size, dtype=dtype) for name, dtype in columns}
+        for name, _ in columns:
+            self._files[name] = open(os.path.join(self.path, f"{name}.bin"), 'wb')
+
+    def log(self, data):
+        if self.columns is None:
+            self._init_columns(data)
+        i = self._fill
+        event = data.get('event')
+        for name, buf in self._buffers.items():
+            if name in EVENT_COLUMNS and isinstance(event, dict):
+                value = OP_CODES[event['op']] if name == 'op' else event.get(name, 0)
+            else:
+                value = data.get(name, 0)
+            buf[i] = value
+        self._fill += 1
+        self.count += 1
+        if self._fill == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.columns is None:
+            return
+        for name, buf in self._buffers.items():
+            self._files[name].write(buf[:self._fill].tobytes())
+            self._files[name].flush()
+        self._fill = 0
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = {'version': FORMAT_VERSION, 'count': self.count, 'columns': self.columns or []}
+        with open(os.path.join(self.path, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        if self.columns is None:
+            self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordColumns:
+    """Read-only view of a store: records['memory_paged'] is a memory-mapped column."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        self.count = meta['count']
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in meta['columns']}
+        self._cache = {}
+
+    @property
+    def column_names(self):
+        return list(self.dtypes)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, name):
+        return name in self.dtypes
+
+    def __getitem__(self, name):
+        if name not in self._cache:
+            if self.count == 0:
+                self._cache[name] = np.zeros(0, dtype=self.dtypes[name])
+            else:
+                self._cache[name] = np.memmap(os.path.join(self.path, f"{name}.bin"),
+                                              dtype=self.dtypes[name], mode='r', shape=(self.count,))
+        return self._cache[name]
+
+    def iter_records(self, chunk_size=65536):
+        """Yield record dicts (event rebuilt from op/id/size) without loading every column at once."""
+        names = [n for n in self.column_names if n not in EVENT_COLUMNS]
+        for start in range(0, self.count, chunk_size):
+            stop = min(start + chunk_size, self.count)
+            cols = {n: self[n][start:stop].tolist() for n in self.column_names}
+            for j in range(stop - start):
+                record = {n: cols[n][j] for n in names}
+                if 'op' in cols:
+                    record['event'] = decode_event(cols['op'][j], cols['id'][j], cols['size'][j])
+                yield record
+
+    def to_csv(self, filename, chunk_size=65536):
+        """Export the store as CSV, one row per step, with op/id/size as plain columns."""
+        names = self.column_names
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(names)
+            for start in range(0, self.count, chunk_size):
+                stop = min(start + chunk_size, self.count)
+                cols = [self[n][start:stop].tolist() for n in names]
+                if 'op' in self.dtypes:
+                    op_index = names.index('op')
+                    cols[op_index] = [OP_NAMES[op] for op in cols[op_index]]
+                writer.writerows(zip(*cols))
+
+
+def open_records(path):
+    return RecordColumns(path)
@@ -1,32 +1,364 @@
 """
 Statistics computation for simulation results.
+
+compute_stats summarizes a finished run (records or a record store).
+OnlineStats is fed one record per step while the simulation runs and can be
+summarized at any point in constant memory.
 """
+import math
+
+import numpy as np
+
+from utils.helpers import GROW_OPS
+
+MEMORY_KEYS = {
+    'monolithic': 'memory_monolithic',
+    'paged': 'memory_paged',
+    'paged_compressed': 'memory_paged_compressed',
+    'prefix_shared': 'memory_prefix_shared',
+    'tiered': 'memory_tiered',
+}
+FRAGMENTATION_KEYS = {
+    'monolithic': 'fragmentation_monolithic',
+    'paged': 'fragmentation_paged',
+    'paged_compressed': 'fragmentation_paged_compressed',
+    'prefix_shared': 'fragmentation_prefix_shared',
+    'tiered': 'fragmentation_tiered',
+}
+INTERNAL_FRAGMENTATION_KEYS = {
+    'monolithic': 'internal_fragmentation_monolithic',
+    'paged': 'internal_fragmentation_paged',
+    'paged_compressed': 'internal_fragmentation_paged_compressed',
+    'prefix_shared': 'internal_fragmentation_prefix_shared',
+    'tiered': 'internal_fragmentation_tiered',
+}
+FAILURE_KEYS = {
+    'monolithic': 'failed_monolithic',
+    'paged': 'failed_paged',
+    'paged_compressed': 'failed_paged_compressed',
+    'prefix_shared': 'failed_prefix_shared',
+    'tiered': 'failed_tiered',
+}
+# 1 when the event asked the model for memory: alloc/prefill, or an append to a sequence it admitted
+ATTEMPT_KEYS = {
+    'monolithic': 'attempted_monolithic',
+    'paged': 'attempted_paged',
+    'paged_compressed': 'attempted_paged_compressed',
+    'prefix_shared': 'attempted_prefix_shared',
+    'tiered': 'attempted_tiered',
+}
+# Modeled service time per event (seconds): token compute plus memory stalls
+LATENCY_KEYS = {
+    'monolithic': 'latency_monolithic',
+    'paged': 'latency_paged',
+    'paged_compressed': 'latency_paged_compressed',
+    'prefix_shared': 'latency_prefix_shared',
+    'tiered': 'latency_tiered',
+}
+# Memory the prefix-sharing model avoided by sharing pages (units)
+PREFIX_SAVED_KEY = 'memory_saved_prefix_shared'
+# Per-tier offload traffic of the tiered model: bytes_moved_<tier>, stall_<tier> (seconds)
+TRANSFER_PREFIXES = ('bytes_moved_', 'stall_')
+# Pages the compressed model's eviction policy picked, and those that had been decompressed before
+EVICTION_KEYS = {'victims': 'victims_paged_compressed', 'recompressions': 'recompressions_paged_compressed'}
+QUANTILES = (0.5, 0.95, 0.99)
+
 
 def compute_stats(records):
-    if not records:
-        return {}
+    """
+    Aggregate peak/avg per model.
 
-    def peak_avg(values):
-        return {'peak': max(values), 'avg': sum(values) / len(values)}
+    records may be a column source (e.g. RecordColumns from results/record_store.py), which is reduced
+    column-wise with NumPy, or any iterable of record dicts, which is consumed in a single pass.
+    """
+    if hasattr(records, 'column_names'):
+        return _compute_stats_columns(records)
+    count = 0
+    peak = {}
+    total = {}
+    throughput_total = 0
+    evictions = dict.fromkeys(EVICTION_KEYS, 0)
+    for r in records:
+        for key in MEMORY_KEYS.values():
+            value = r[key]
+            total[key] = total.get(key, 0) + value
+            if count == 0 or value > peak[key]:
+                peak[key] = value
+        for key in FRAGMENTATION_KEYS.values():
+            total[key] = total.get(key, 0) + r[key]
+        for key in INTERNAL_FRAGMENTATION_KEYS.values():
+            total[key] = total.get(key, 0) + r.get(key, 0.0)
+        saved = r.get(PREFIX_SAVED_KEY, 0)
+        total[PREFIX_SAVED_KEY] = total.get(PREFIX_SAVED_KEY, 0) + saved
+        peak[PREFIX_SAVED_KEY] = max(peak.get(PREFIX_SAVED_KEY, 0), saved)
+        for name, key in EVICTION_KEYS.items():
+            evictions[name] += r.get(key, 0)
+        throughput_total += r['throughput']
+        count += 1
 
-    mem_mono = [r['memory_monolithic'] for r in records]
-    mem_paged = [r['memory_paged'] for r in records]
-    mem_pc = [r['memory_paged_compressed'] for r in records]
+    if not count:
+        return {}
 
-    frag_mono = [r['fragmentation_monolithic'] for r in records]
-    frag_paged = [r['fragmentation_paged'] for r in records]
-    frag_pc = [r['fragmentation_paged_compressed'] for r in records]
+    stats = {name: {'peak': peak[key], 'avg': total[key] / count} for name, key in MEMORY_KEYS.items()}
+    stats['fragmentation'] = {name: total[key] / count for name, key in FRAGMENTATION_KEYS.items()}
+    stats['internal_fragmentation'] = {name: total[key] / count for name, key in INTERNAL_FRAGMENTATION_KEYS.items()}
+    stats['prefix_shared']['saved_peak'] = peak[PREFIX_SAVED_KEY]
+    stats['prefix_shared']['saved_avg'] = total[PREFIX_SAVED_KEY] / count
+    stats['paged_compressed'].update(eviction_summary(evictions))
+    stats['throughput_avg'] = throughput_total / count
+    return stats
 
-    throughput = [r['throughput'] for r in records]
 
+def eviction_summary(totals):
+    """Victim and recompression totals (keys of EVICTION_KEYS) plus the recompression rate."""
+    victims = totals['victims']
     return {
-        'monolithic': peak_avg(mem_mono),
-        'paged': peak_avg(mem_paged),
-        'paged_compressed': peak_avg(mem_pc),
-        'fragmentation': {
-            'monolithic': sum(frag_mono) / len(frag_mono),
-            'paged': sum(frag_paged) / len(frag_paged),
-            'paged_compressed': sum(frag_pc) / len(frag_pc),
-        },
-        'throughput_avg': sum(throughput) / len(throughput),
+        'victims': victims,
+        'recompressions': totals['recompressions'],
+        'recompression_rate': totals['recompressions'] / victims if victims else 0.0,
     }
+
+
+def _compute_stats_columns(columns):
+    if not len(columns):
+        return {}
+    # stores written by older versions lack the newer columns; those are left out (or reported as 0)
+    present = set(columns.column_names)
+    # accumulate in float64 even for narrower on-disk columns
+    stats = {name: {'peak': columns[key].max().item(), 'avg': columns[key].mean(dtype=np.float64).item()}
+             for name, key in MEMORY_KEYS.items() if key in present}
+    stats['fragmentation'] = {name: columns[key].mean(dtype=np.float64).item()
+                              for name, key in FRAGMENTATION_KEYS.items() if key in present}
+    stats['internal_fragmentation'] = {
+        name: columns[key].mean(dtype=np.float64).item() if key in present else 0.0
+        for name, key in INTERNAL_FRAGMENTATION_KEYS.items()
+    }
+    if PREFIX_SAVED_KEY in present and 'prefix_shared' in stats:
+        stats['prefix_shared']['saved_peak'] = columns[PREFIX_SAVED_KEY].max().item()
+        stats['prefix_shared']['saved_avg'] = columns[PREFIX_SAVED_KEY].mean(dtype=np.float64).item()
+    if 'paged_compressed' in stats:
+        stats['paged_compressed'].update(eviction_summary(
+            {name: int(columns[key].sum()) if key in present else 0 for name, key in EVICTION_KEYS.items()}))
+    stats['throughput_avg'] = columns['throughput'].mean(dtype=np.float64).item()
+    return stats
+
+
+class QuantileSketch:
+    """
+    Streaming quantile sketch with log-spaced buckets (DDSketch-style).
+
+    Estimates are within `relative_accuracy` of the true value, and the number of
+    buckets only depends on the spread of the values, not on how many were added.
+    Sketches with the same accuracy can be merged.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}  # bucket index -> count
+        self.zero_count = 0
+        self.count = 0
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        self.count += len(values)
+        if len(positive):
+            index = np.ceil(np.log(positive) / self._log_gamma).astype(np.int64)
+            for i, n in zip(*np.unique(index, return_counts=True)):
+                i = int(i)
+                self.buckets[i] = self.buckets.get(i, 0) + int(n)
+
+    def merge(self, other):
+        for i, n in other.buckets.items():
+            self.buckets[i] = self.buckets.get(i, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if rank < seen:
+                # midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+                return 2 * self.gamma ** i / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class RunningMoments:
+    """Count, mean, variance and peak, merged chunk by chunk (Chan et al. parallel update)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.peak = None
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if not n:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.count + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        peak = values.max().item()
+        self.peak = peak if self.peak is None else max(self.peak, peak)
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else 0.0
+
+
+class OnlineStats:
+    """
+    One-pass aggregator fed once per simulation step (via update/log).
+
+    Values are staged in small fixed-size NumPy chunks and folded into running
+    moments and quantile sketches when a chunk fills, and the last `window` steps
+    are kept in ring buffers for rolling aggregates. Memory is constant in the
+    number of steps, and summary() can be called mid-run.
+    """
+
+    def __init__(self, window=1000, chunk_size=4096, relative_accuracy=0.01):
+        self.window = window
+        self.chunk_size = chunk_size
+        self.steps = 0
+        self.metrics = (list(MEMORY_KEYS.values()) + list(FRAGMENTATION_KEYS.values())
+                        + list(INTERNAL_FRAGMENTATION_KEYS.values()) + [PREFIX_SAVED_KEY])
+        self.moments = {k: RunningMoments() for k in self.metrics}
+        self.sketches = {k: QuantileSketch(relative_accuracy) for k in self.metrics}
+        self.throughput_total = 0
+        self.transfer_totals = None  # record key -> running sum, found in the first record
+        self.evictions = dict.fromkeys(EVICTION_KEYS, 0)
+        # Tokens actually served and modeled busy time per model, for tokens/s
+        self.served_tokens = {name: 0 for name in LATENCY_KEYS}
+        self.busy_time = {name: 0.0 for name in LATENCY_KEYS}
+        # latencies of the alloc/prefill/append events each model served, staged like the per-step
+        # metrics; rejected events only count towards failure_rate
+        self.latency_sketches = {name: QuantileSketch(relative_accuracy) for name in LATENCY_KEYS}
+        self._latency_chunk = {name: np.zeros(chunk_size) for name in LATENCY_KEYS}
+        self._latency_fill = {name: 0 for name in LATENCY_KEYS}
+        # grow events seen, and those each model acted on (the failure_rate denominator)
+        self.alloc_attempts = 0
+        self.attempts = {name: 0 for name in ATTEMPT_KEYS}
+        self.failures = {k: 0 for k in FAILURE_KEYS.values()}
+        self._chunk = {k: np.zeros(chunk_size) for k in self.metrics}
+        self._fill = 0
+        # rolling window ring buffers (metrics, plus per-step attempts/failures per model)
+        self._ring = {k: np.zeros(window)
+                      for k in self.metrics + list(FAILURE_KEYS.values()) + list(ATTEMPT_KEYS.values())}
+
+    def update(self, record):
+        i = self._fill
+        slot = self.steps % self.window
+        for k in self.metrics:
+            value = record.get(k, 0.0)
+            self._chunk[k][i] = value
+            self._ring[k][slot] = value
+        event = record.get('event')
+        is_alloc = isinstance(event, dict) and event['op'] in GROW_OPS
+        self.alloc_attempts += is_alloc
+        latency_full = False
+        throughput = record.get('throughput', 0)
+        for name, key in LATENCY_KEYS.items():
+            latency = record.get(key, 0.0)
+            self.busy_time[name] += latency
+            # records without the flag (batched runs, older stores) count every grow event
+            attempted = record.get(ATTEMPT_KEYS[name], 1) if is_alloc else 0
+            self._ring[ATTEMPT_KEYS[name]][slot] = attempted
+            if not attempted:
+                continue
+            self.attempts[name] += 1
+            if record.get(FAILURE_KEYS[name], 0):
+                continue
+            self.served_tokens[name] += throughput
+            fill = self._latency_fill[name]
+            self._latency_chunk[name][fill] = latency
+            self._latency_fill[name] = fill + 1
+            latency_full = latency_full or fill + 1 == self.chunk_size
+        for k in FAILURE_KEYS.values():
+            failed = record.get(k, 0)
+            self._ring[k][slot] = failed
+            self.failures[k] += failed
+        self.throughput_total += record.get('throughput', 0)
+        for name, key in EVICTION_KEYS.items():
+            self.evictions[name] += record.get(key, 0)
+        if self.transfer_totals is None:
+            self.transfer_totals = {k: 0 for k in record if k.startswith(TRANSFER_PREFIXES)}
+        for k in self.transfer_totals:
+            self.transfer_totals[k] += record[k]
+        self.steps += 1
+        self._fill += 1
+        if self._fill == self.chunk_size or latency_full:
+            self._fold()
+
+    # OnlineStats can be passed anywhere a logger is expected
+    log = update
+
+    def _fold(self):
+        for k in self.metrics:
+            values = self._chunk[k][:self._fill]
+            self.moments[k].add_many(values)
+            self.sketches[k].add_many(values)
+        self._fill = 0
+        for name, sketch in self.latency_sketches.items():
+            sketch.add_many(self._latency_chunk[name][:self._latency_fill[name]])
+            self._latency_fill[name] = 0
+
+    def _describe(self, key):
+        m = self.moments[key]
+        out = {'peak': m.peak, 'avg': m.mean, 'var': m.variance}
+        for q in QUANTILES:
+            out[f"p{round(q * 100)}"] = self.sketches[key].quantile(q)
+        return out
+
+    def summary(self):
+        """Aggregates over every step seen so far, plus the rolling window."""
+        self._fold()
+        if not self.steps:
+            return {}
+        stats = {}
+        for name, key in MEMORY_KEYS.items():
+            stats[name] = self._describe(key)
+            failed = self.failures[FAILURE_KEYS[name]]
+            attempts = self.attempts[name]
+            stats[name]['failure_rate'] = failed / attempts if attempts else 0.0
+            busy = self.busy_time[name]
+            stats[name]['tokens_per_s'] = self.served_tokens[name] / busy if busy else None
+            stats[name]['latency'] = {f"p{round(q * 100)}": self.latency_sketches[name].quantile(q) for q in QUANTILES}
+        stats['fragmentation'] = {name: self._describe(key) for name, key in FRAGMENTATION_KEYS.items()}
+        stats['internal_fragmentation'] = {name: self._describe(key) for name, key in INTERNAL_FRAGMENTATION_KEYS.items()}
+        saved = self.moments[PREFIX_SAVED_KEY]
+        stats['prefix_shared']['saved_peak'] = saved.peak
+        stats['prefix_shared']['saved_avg'] = saved.mean
+        stats['paged_compressed'].update(eviction_summary(self.evictions))
+        for prefix, name in zip(TRANSFER_PREFIXES, ('bytes_moved', 'stall_time')):
+            stats['tiered'][name] = {k[len(prefix):]: v for k, v in self.transfer_totals.items() if k.startswith(prefix)}
+        stats['throughput_avg'] = self.throughput_total / self.steps
+
+        n = min(self.steps, self.window)
+        window = {'steps': n}
+        for name in MEMORY_KEYS:
+            mem = self._ring[MEMORY_KEYS[name]][:n]
+            attempts = self._ring[ATTEMPT_KEYS[name]][:n].sum()
+            window[name] = {
+                'memory_avg': mem.mean().item(),
+                'memory_peak': mem.max().item(),
+                'fragmentation_avg': self._ring[FRAGMENTATION_KEYS[name]][:n].mean().item(),
+                'internal_fragmentation_avg': self._ring[INTERNAL_FRAGMENTATION_KEYS[name]][:n].mean().item(),
+                'failure_rate': (self._ring[FAILURE_KEYS[name]][:n].sum() / attempts).item() if attempts else 0.0,
+            }
+        stats['window'] = window
+        return stats
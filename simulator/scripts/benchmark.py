@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks and scaling checks for the memory models' hot paths.
+
+For MonolithicKV (as a usage counter and with each contiguous placement policy),
+PagedKV and PagedCompressedKV (with each eviction policy) and every pool size (pages, 10^2 to 10^7 by
+default) it times, in nanoseconds per call:
+
+  allocate / free      single-page allocations on a half-full pool
+  compress_cold_blocks one group per call on a full pool (compressed model)
+  touch_pages          one used page per call on a half-full pool (compressed model)
+  replay               a full alloc/free workload trace (utils/workloads.py)
+                       whose load scales with the pool, per event
+
+The hot paths are meant to be O(1) or O(log n) in the pool size, so each result
+also gets a scaling exponent: the slope of log(ns/call) against log(pages). A
+linear scan shows up as an exponent near 1 long before it hurts a long run.
+
+Run from the simulator directory:
+
+  python -m scripts.benchmark run --out bench.json [--sizes 100 1000] [--ops 20000]
+  python -m scripts.benchmark compare baseline.json bench.json [--threshold 1.5]
+
+`compare` flags every (benchmark, size) that got more than `threshold` times
+slower and every benchmark whose scaling exponent grew by more than
+`exponent_slack` or exceeds `max_exponent`, and exits with status 1 if anything
+was flagged.
+"""
+import argparse
+import datetime
+import gc
+import json
+import math
+import platform
+import sys
+import time
+
+import numpy as np
+
+from memory_models.monolithic_kv import MonolithicKV
+from memory_models.paged_compressed_kv import PagedCompressedKV
+from memory_models.paged_kv import PagedKV
+from utils.helpers import OP_ALLOC
+from utils.workloads import generate_workload
+
+SIZES = [10 ** k for k in range(2, 8)]
+MODELS = ('monolithic', 'monolithic_first_fit', 'monolithic_best_fit', 'monolithic_buddy', 'paged', 'paged_compressed',
+          'paged_compressed_clock', 'paged_compressed_lfu', 'paged_compressed_arc')
+PAGE_SIZE = 32
+FILL_BLOCKS = 8  # pages per allocation when filling a pool
+FORMAT_VERSION = 1
+
+
+def _make(name, pages, pressure_threshold=0.8):
+    """(model, alloc(alloc_id, blocks, timestamp), free(alloc_id)) over a pool of `pages` pages."""
+    if name.startswith('monolithic'):
+        # monolithic_<placement> places extents in a contiguous arena
+        model = MonolithicKV(pages * PAGE_SIZE, placement=name[len('monolithic_'):] or None)
+        sizes = {}
+
+        def alloc(alloc_id, blocks, timestamp):
+            if model.allocate(blocks * PAGE_SIZE, alloc_id):
+                sizes[alloc_id] = blocks * PAGE_SIZE
+
+        def free(alloc_id):
+            if alloc_id in sizes:
+                model.free(sizes.pop(alloc_id), alloc_id)
+        return model, alloc, free
+    if name == 'paged':
+        model = PagedKV(pages, PAGE_SIZE)
+        return model, lambda alloc_id, blocks, timestamp: model.allocate(alloc_id, blocks), model.free
+    # paged_compressed_<policy> picks victims with that eviction policy
+    model = PagedCompressedKV(pages, PAGE_SIZE, 0.5, pressure_threshold,
+                              policy=name[len('paged_compressed_'):] or 'lru')
+    return model, lambda alloc_id, blocks, timestamp: model.allocate(alloc_id, blocks, timestamp=timestamp), model.free
+
+
+def _fill(alloc, pages, fraction):
+    """Fill `fraction` of the pool with FILL_BLOCKS-page allocations; returns the next unused id."""
+    count = int(pages * fraction) // FILL_BLOCKS
+    for alloc_id in range(count):
+        alloc(alloc_id, FILL_BLOCKS, alloc_id)
+    return count
+
+
+def bench_alloc_free(name, pages, ops):
+    """ns per single-page allocate and per free, in batches of at most a quarter of the pool."""
+    _, alloc, free = _make(name, pages)
+    next_id = _fill(alloc, pages, 0.5)
+    batch = max(1, min(ops, pages // 4))
+    alloc_ns = free_ns = done = 0
+    while done < ops:
+        ids = range(next_id, next_id + batch)
+        start = time.perf_counter_ns()
+        for alloc_id in ids:
+            alloc(alloc_id, 1, alloc_id)
+        alloc_ns += time.perf_counter_ns() - start
+        start = time.perf_counter_ns()
+        for alloc_id in ids:
+            free(alloc_id)
+        free_ns += time.perf_counter_ns() - start
+        next_id += batch
+        done += batch
+    return {'allocate': alloc_ns / done, 'free': free_ns / done}
+
+
+def bench_compress(name, pages, ops):
+    """ns per compress_cold_blocks(target_free=1) call on a full pool."""
+    model, alloc, _ = _make(name, pages, pressure_threshold=1.0)
+    _fill(alloc, pages, 1.0)
+    calls = max(1, min(ops, pages // 4))
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        model.compress_cold_blocks(target_free=1)
+    return (time.perf_counter_ns() - start) / calls
+
+
+def bench_touch(name, pages, ops, seed=0):
+    """ns per touch_pages call on one random used page of a half-full pool."""
+    model, alloc, _ = _make(name, pages)
+    clock = _fill(alloc, pages, 0.5)
+    used = [i for i, state in enumerate(model.pages) if state == 1]
+    picks = np.random.default_rng(seed).choice(used, ops).tolist()
+    start = time.perf_counter_ns()
+    for t, i in enumerate(picks, clock + 1):
+        model.touch_pages([i], t)
+    return (time.perf_counter_ns() - start) / ops
+
+
+def bench_replay(name, pages, ops, seed=0):
+    """ns per event replaying an alloc/free workload sized to keep the pool busy."""
+    # ~15 pages per request living ~3.4 ticks: this rate keeps roughly the whole pool in use
+    trace = generate_workload(max(1, ops // 2), seed=seed, arrival_rate=pages / 50)
+    ops_col = trace['op'].tolist()
+    ids = trace['id'].tolist()
+    blocks = (-(-trace['size'] // PAGE_SIZE)).tolist()
+    times = trace['timestamp'].tolist()
+    _, alloc, free = _make(name, pages)
+    start = time.perf_counter_ns()
+    for op, alloc_id, n, t in zip(ops_col, ids, blocks, times):
+        if op == OP_ALLOC:
+            alloc(alloc_id, n, t)
+        else:
+            free(alloc_id)
+    return (time.perf_counter_ns() - start) / len(ops_col)
+
+
+def run_case(name, pages, ops):
+    """All benchmarks of one model at one pool size: benchmark -> ns per call."""
+    results = bench_alloc_free(name, pages, ops)
+    if name.startswith('paged_compressed'):
+        results['compress_cold_blocks'] = bench_compress(name, pages, ops)
+        results['touch_pages'] = bench_touch(name, pages, ops)
+    results['replay'] = bench_replay(name, pages, ops)
+    return results
+
+
+def scaling_exponent(by_size):
+    """Least-squares slope of log(ns) against log(pages); 0 for O(1), ~1 for a linear scan."""
+    points = [(math.log(int(size)), math.log(ns)) for size, ns in by_size.items() if ns > 0]
+    if len(points) < 2:
+        return 0.0
+    x, y = np.array(points).T
+    return float(np.polyfit(x, y, 1)[0])
+
+
+def run_suite(sizes=None, ops=20000, repeat=1, models=MODELS, log=print):
+    """Run every benchmark; returns the JSON-ready result (meta, results, scaling)."""
+    sizes = sizes or SIZES
+    results = {}
+    for name in models:
+        for pages in sizes:
+            best = None
+            for _ in range(repeat):
+                case = run_case(name, pages, ops)
+                best = case if best is None else {k: min(v, best[k]) for k, v in case.items()}
+                gc.collect()
+            for bench, ns in best.items():
+                results.setdefault(f"{name}.{bench}", {})[str(pages)] = ns
+            if log:
+                log(f"{name:<22} {pages:>9} " + ' '.join(f"{bench}={ns:.0f}ns" for bench, ns in best.items()))
+    return {
+        'meta': {
+            'version': FORMAT_VERSION,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'ops': ops,
+            'repeat': repeat,
+            'sizes': list(sizes),
+        },
+        'results': results,
+        'scaling': {key: scaling_exponent(by_size) for key, by_size in results.items()},
+    }
+
+
+def compare(baseline, current, threshold=1.5, exponent_slack=0.15, max_exponent=0.5):
+    """Lines describing every regression of current against baseline (empty if none)."""
+    flagged = []
+    for key, by_size in current['results'].items():
+        base = baseline['results'].get(key, {})
+        for size, ns in by_size.items():
+            if size in base and base[size] > 0 and ns / base[size] > threshold:
+                flagged.append(f"{key} @ {size} pages: {base[size]:.0f} -> {ns:.0f} ns/call (x{ns / base[size]:.2f})")
+    for key, exponent in current['scaling'].items():
+        base_exponent = baseline.get('scaling', {}).get(key)
+        if base_exponent is not None and exponent - base_exponent > exponent_slack:
+            flagged.append(f"{key}: scaling exponent {base_exponent:.2f} -> {exponent:.2f}")
+        elif exponent > max_exponent:
+            flagged.append(f"{key}: scaling exponent {exponent:.2f} exceeds {max_exponent}")
+    return flagged
+
+
+def _load(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Memory-model microbenchmarks with a JSON baseline')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run', help='Run the suite and write the results as JSON')
+    run.add_argument('--out', default='bench.json')
+    run.add_argument('--sizes', type=int, nargs='+', default=None, help='Pool sizes in pages (default: 10^2 .. 10^7)')
+    run.add_argument('--ops', type=int, default=20000, help='Calls timed per benchmark')
+    run.add_argument('--repeat', type=int, default=1, help='Keep the best of this many runs per case')
+    run.add_argument('--models', nargs='+', default=list(MODELS), choices=MODELS)
+    run.add_argument('--baseline', default=None, help='Compare against this baseline after running')
+    cmp = sub.add_parser('compare', help='Flag regressions of a result file against a baseline')
+    cmp.add_argument('baseline')
+    cmp.add_argument('current')
+    for p in (run, cmp):
+        p.add_argument('--threshold', type=float, default=1.5, help='Flag cases this many times slower')
+        p.add_argument('--exponent-slack', type=float, default=0.15, help='Flag scaling exponents that grew by more')
+        p.add_argument('--max-exponent', type=float, default=0.5, help='Flag scaling exponents above this')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        current = run_suite(args.sizes, args.ops, args.repeat, args.models)
+        with open(args.out, 'w') as f:
+            json.dump(current, f, indent=2)
+        for key, exponent in current['scaling'].items():
+            print(f"{key:<40} scaling exponent {exponent:+.2f}")
+        print(f"Wrote {args.out}")
+        if not args.baseline:
+            return 0
+        baseline = _load(args.baseline)
+    else:
+        baseline, current = _load(args.baseline), _load(args.current)
+    flagged = compare(baseline, current, args.threshold, args.exponent_slack, args.max_exponent)
+    for line in flagged:
+        print('REGRESSION', line)
+    if not flagged:
+        print('No regressions')
+    return 1 if flagged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
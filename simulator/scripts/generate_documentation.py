@@ -49,14 +49,31 @@ def make_doc():
     files = [
         ('main.py', 'Top-level runner: loads config, generates trace, runs simulation loop, logs results and writes plots.'),
         ('utils/helpers.py', 'Synthetic trace generator. Produces alloc/free events with configurable lifetimes.'),
-        ('memory_models/monolithic_kv.py', 'Monolithic allocator model: single scalar usage, allocate/free.'),
+        ('memory_models/monolithic_kv.py', 'Monolithic allocator model: scalar usage, or contiguous placement in an arena with compaction.'),
+        ('memory_models/contiguous_arena.py', 'Contiguous arenas (first fit, best fit, buddy) with O(log n) placement, external fragmentation and compaction.'),
         ('memory_models/paged_kv.py', 'Paged allocator: fixed pages, allocate/free by blocks.'),
-        ('memory_models/paged_compressed_kv.py', 'Paged allocator with compression gate and LRU-informed compression.'),
-        ('results/logger.py', 'Logger: collects per-step records and saves text + CSV output.'),
+        ('memory_models/paged_compressed_kv.py', 'Paged allocator with compression gate; victims picked by a pluggable eviction policy.'),
+        ('memory_models/eviction.py', 'Eviction policies for the compression gate: LRU heap, CLOCK, LFU and ARC.'),
+        ('memory_models/prefix_shared_kv.py', 'Paged allocator with a prefix index and refcounted copy-on-write shared pages.'),
+        ('memory_models/tiered_kv.py', 'Multi-tier (HBM/DRAM/disk) paged allocator with LRU demotion, promotion on access and transfer cost accounting.'),
+        ('results/logger.py', 'Logger: collects per-step records in memory and saves them to a record store.'),
+        ('results/record_store.py', 'Columnar binary record store: chunked per-column writer, memory-mapped reader and CSV export.'),
         ('results/plotter.py', 'Plotter: creates PNG comparison plots for memory, fragmentation, and throughput.'),
         ('results/stats.py', 'Aggregate statistics computation for each model.'),
+        ('results/cache.py', 'Content-addressed results cache keyed by config, trace and code version, with per-plot-setting plots and LRU size bound.'),
         ('examples/demo_payload.py', 'Small demo script that generates a short trace and prints allocation results.'),
         ('config/default_config.yaml', 'Default simulation configuration values.'),
+        ('utils/trace_io.py', 'Binary trace format: chunked writer and zero-copy memory-mapped reader.'),
+        ('utils/workloads.py', 'Vectorized, seeded LLM-serving workload generator producing TRACE_DTYPE arrays.'),
+        ('utils/compression_bench.py', 'Codec benchmark (zlib, lzma, int8, int4, top-k) on KV-like float16 pages producing calibrated compression profiles.'),
+        ('utils/instrumentation.py', 'Opt-in per-model counters (work, failures by cause, per-pass compression) and method wall-time timers.'),
+        ('scripts/benchmark.py', 'Microbenchmarks of allocate/free/compress_cold_blocks/touch_pages and trace replay across pool sizes, with a JSON baseline and regression comparison.'),
+        ('core/scheduler.py', 'Continuous-batching request scheduler with preemption, TTFT/queueing/goodput metrics per memory model.'),
+        ('core/sharded.py', 'Multi-device runs: request placement across devices, one worker process per device, aggregate occupancy and imbalance.'),
+        ('core/engine.py', 'Discrete-event engine: heapq event queue, per-op handlers, lazily merged trace source, snapshot/restore.'),
+        ('core/checkpoint.py', 'Compressed binary snapshots of a run, fork compatibility checks and tunables applied on resume.'),
+        ('tests/test_contiguous_arena.py', 'Pytest cases for the placement arenas: fit choice, treap subtree maxima, buddy merging, compaction.'),
+        ('tests/test_eviction.py', 'Pytest cases for the eviction policies: ARC target and ghost bounds, LFU order, CLOCK second chances.'),
         ('README.md', 'Project README (also present in repo).'),
     ]
 
@@ -89,39 +106,137 @@ def make_doc():
 FUNCTION_SUMMARIES = {
     'main.py': [
         ('load_config(path)', 'Load YAML config file and return dict.'),
-        ('main(config_path)', 'Main entry: loads config, instantiates models, processes trace events, logs state, computes stats, and plots results.'),
+        ('run_simulation(config, trace, logger, stats, counters)', 'Instantiate the five models (instrumented when counters is given), register them as handlers on a SimulatorEngine and log one record per event (also fed to stats).'),
+        ('main(config_path, seed, export_csv)', 'Main entry: loads config, streams the trace through run_simulation into a record store, computes stats, and plots results.'),
+        ('sweep(config_path, sweep_path, ...)', 'Run a grid of config overrides in parallel and write one stats table.'),
+        ('serve(config_path, seed)', 'Serve the workload through the continuous-batching scheduler once per memory model and print serving stats.'),
     ],
     'utils/helpers.py': [
-        ('generate_synthetic_trace(num_steps, workload_type, free_probability, lifetime_range)',
-         'Generates a sequence of allocation/free events; allocations are given IDs and frees scheduled after a random lifetime.'),
+        ('iter_synthetic_trace(num_steps, workload_type, free_probability, lifetime_range, seed, arrival_probability)',
+         'Lazily yields time-stamped allocation/free events; every scheduled free is emitted, idle ticks are skipped.'),
+        ('generate_synthetic_trace(...)', 'Same trace as a list.'),
+        ('trace_to_array(trace) / iter_trace_array(arr)', 'Convert between event dicts and the fixed-width TRACE_DTYPE array form.'),
     ],
     'memory_models/monolithic_kv.py': [
-        ('MonolithicKV.__init__(size)', 'Create monolithic allocator with capacity `size`.'),
-        ('MonolithicKV.allocate(amount)', 'Attempt to allocate `amount`; increments usage if enough capacity and returns True/False.'),
-        ('MonolithicKV.free(amount)', 'Frees `amount` by decreasing usage, not below zero.'),
+        ('MonolithicKV.__init__(size, placement, compaction, ...)', 'Create monolithic allocator with capacity `size`; monolithic_from_config(config) reads the placement settings.'),
+        ('MonolithicKV.allocate(amount, alloc_id)', 'Attempt to reserve `amount` (as a contiguous extent with a placement policy) and return True/False.'),
+        ('MonolithicKV.free(amount, alloc_id)', 'Release the reservation (or decrease usage, not below zero).'),
+        ('MonolithicKV.take_step_costs()', 'Bytes moved and seconds spent compacting since the last call.'),
+        ('MonolithicKV.prefill(seq_id, tokens, max_len) / append / end', 'Decode growth inside a max-length reservation made up front.'),
+    ],
+    'memory_models/contiguous_arena.py': [
+        ('make_arena(size, placement)', 'FitArena (first_fit), BestFitArena (best_fit) or BuddyArena (buddy) over `size` units.'),
+        ('arena.allocate(key, amount) / free(key)', 'Place or release one extent; freed extents merge with free neighbours.'),
+        ('arena.fragmentation() / largest_free() / compact()', 'External fragmentation, the largest free extent, and compaction returning the units moved.'),
     ],
     'memory_models/paged_kv.py': [
         ('PagedKV.__init__(num_pages, page_size)', 'Initialize pages and sizes.'),
-        ('PagedKV.allocate(num_blocks)', 'Find free pages and mark them used for `num_blocks`; return True if allocated.'),
-        ('PagedKV.free(num_blocks)', 'Free up to `num_blocks` used pages.'),
+        ('PagedKV.allocate(alloc_id, num_blocks)', 'Pop `num_blocks` pages off the free list into the block table of `alloc_id`; return True if allocated.'),
+        ('PagedKV.free(alloc_id)', 'Return the pages owned by `alloc_id` to the free list.'),
+        ('PagedKV.prefill(seq_id, tokens) / append(seq_id, tokens) / end(seq_id)', 'Grow a sequence token by token, taking a page only when the last one fills.'),
+        ('PagedKV.occupancy()', 'O(1) used/free/memory/fragmentation/internal_fragmentation snapshot.'),
     ],
     'memory_models/paged_compressed_kv.py': [
-        ('PagedCompressedKV.__init__', 'Initialize pages, compression_ratio, pressure_threshold, and LRU timestamps.'),
+        ('PagedCompressedKV.__init__', 'Initialize pages, compression_ratio, pressure_threshold, and the eviction policy.'),
         ('effective_usage_pages()', 'Return effective pages used accounting for compressed pages.'),
-        ('allocate(num_blocks)', 'Attempt allocation: may compress cold pages to make room; returns True/False.'),
-        ('free(num_blocks)', 'Free used pages then compressed pages.'),
-        ('compress_cold_blocks(target_free=0)', 'Perform LRU-guided grouping compression to free physical pages.'),
-        ('touch_pages(indices, timestamp)', 'Update LRU timestamps for pages when accessed.'),
+        ('allocate(alloc_id, num_blocks, timestamp)', 'Attempt allocation: may compress cold pages to make room; returns True/False.'),
+        ('free(alloc_id)', 'Free the allocation\'s used pages and its share of compressed pages.'),
+        ('prefill / append / end', 'Token-by-token sequence growth; new blocks go through the same capacity checks as allocate.'),
+        ('compress_cold_blocks(target_free=0)', 'Pop victims from the eviction policy and compress them in groups.'),
+        ('occupancy()', 'O(1) used/compressed/free/memory/fragmentation snapshot.'),
+        ('touch_pages(indices, timestamp) / touch(alloc_id, timestamp)', 'Report accesses to the eviction policy and decompress compressed pages (charged per block).'),
+        ('take_step_costs()', 'Compress and decompress seconds spent since the last call.'),
+        ('compression_from_config(config)', 'Ratio and per-page times from the config, or from a measured compression_profile.'),
+        ('compressed_from_config(config)', 'PagedCompressedKV with the config\'s pool, compression and eviction_policy settings.'),
+        ('eviction_stats()', 'Policy name, victims, recompressions of decompressed pages and their rate.'),
+    ],
+    'memory_models/eviction.py': [
+        ('make_policy(name, num_pages)', 'LRUPolicy, ClockPolicy, LFUPolicy or ARCPolicy for a pool of num_pages.'),
+        ('policy.add / access / reloaded / compressed / remove', 'Page events reported by PagedCompressedKV.'),
+        ('policy.pop_victims(k) / putback(pages)', 'Take up to k coldest used pages; return the ones not compressed.'),
     ],
     'results/logger.py': [
         ('Logger.log(data)', 'Append a record to in-memory list.'),
-        ('Logger.save(filename)', 'Write text log and CSV derived from records.'),
+        ('Logger.save(path, csv_name)', 'Write records to a columnar record store, optionally exporting CSV.'),
+    ],
+    'results/record_store.py': [
+        ('RecordStore.log(data)', 'Buffer one record into typed columns; flushed to disk every chunk_size rows.'),
+        ('RecordStore(path, chunk_size, resume_rows)', 'With resume_rows, cut an existing store back to that many rows and append.'),
+        ('open_records(path)', 'Open a store read-only; each column is a numpy.memmap.'),
+        ('RecordColumns.to_csv(filename)', 'Export the store as CSV in chunks.'),
+    ],
+    'utils/trace_io.py': [
+        ('write_trace(path, events)', 'Write event dicts or a TRACE_DTYPE array to a trace file.'),
+        ('open_trace(path)', 'Memory-map the rows of a trace file as a read-only TRACE_DTYPE array.'),
+        ('iter_trace_file(path)', 'Yield event dicts from a trace file chunk by chunk.'),
+    ],
+    'utils/workloads.py': [
+        ('generate_workload(num_requests, family, seed, ..., decode)', 'Draw Poisson/bursty arrivals, lognormal prompts and Pareto generation lengths as a time-ordered trace array (alloc/free, or prefill/append/end).'),
+        ('workload_from_config(workload, seed)', 'Build a trace from the config `workload:` block.'),
+        ('generate_requests(num_requests, ..., priority_levels) / requests_from_config(workload, seed)', 'The same requests as one REQUEST_DTYPE row each, for the scheduler.'),
+    ],
+    'utils/compression_bench.py': [
+        ('make_kv_pages(num_pages, page_size, head_dim, seed) / load_kv_pages(path, page_size)', 'Synthetic KV-like float16 pages, or pages cut from a .npy tensor.'),
+        ('benchmark(pages, codecs)', 'Measured ratio, compress/decompress MB/s and relative error per codec.'),
+        ('save_profile(path, profile) / load_profile(path)', 'Write or read one codec profile as YAML.'),
+    ],
+    'memory_models/prefix_shared_kv.py': [
+        ('PrefixSharedKV.allocate(alloc_id, num_blocks, tokens, prefix, prefix_len)', 'Reuse indexed prefix pages (refcount + 1) and allocate the rest.'),
+        ('PrefixSharedKV.prefill / append / end', 'Decode growth; appending to a shared partly filled page copies it first.'),
+        ('PrefixSharedKV.occupancy()', 'O(1) snapshot including shared pages and pages saved by sharing.'),
+    ],
+    'memory_models/tiered_kv.py': [
+        ('TieredKV(tiers, page_size, bytes_per_token)', 'Tiers fastest first with pages, bandwidth_gbps and latency_us; tiers_from_config(config) builds the list.'),
+        ('TieredKV.allocate / prefill / append / end / free', 'Place pages in the fastest tier, demoting LRU pages down; append promotes the sequence first.'),
+        ('TieredKV.take_step_costs()', 'Bytes moved and stall seconds per tier since the last call.'),
+    ],
+    'utils/instrumentation.py': [
+        ('instrument(model, methods)', 'Attach a Counters object to a model and time its public methods on that instance.'),
+        ('Counters.add / fail / observe / snapshot()', 'Count work, failures by cause and per-pass values; snapshot() returns a nested dict.'),
+        ('failed(model, cause)', 'Count a failure on an instrumented model and return False.'),
+    ],
+    'scripts/benchmark.py': [
+        ('run_suite(sizes, ops, repeat, models)', 'Time every hot path per model and pool size; results in ns per call plus scaling exponents.'),
+        ('scaling_exponent(by_size)', 'Slope of log(ns) against log(pages): ~0 for O(1), ~1 for a linear scan.'),
+        ('compare(baseline, current, threshold, exponent_slack, max_exponent)', 'List slowdowns and scaling blowups against a baseline.'),
+    ],
+    'core/scheduler.py': [
+        ('build_serving_models(config)', 'Fresh instances of every memory model behind a prefill/append/end/stall interface.'),
+        ('ContinuousBatchScheduler(model, max_batch_size, max_batch_tokens, policy, preemption, ...)', 'Iteration-level batching: decode, preempt on page exhaustion, admit in policy order.'),
+        ('ContinuousBatchScheduler.run(requests)', 'Serve requests to completion; per-request queueing delay, TTFT, TPOT and finish times.'),
+        ('serving_summary(result, scheduler, ttft_slo, tpot_slo) / serve_all(config, requests)', 'Percentiles, throughput and goodput, per model.'),
+    ],
+    'core/sharded.py': [
+        ('assign_devices(trace, devices, placement) / shard_trace(...)', 'Route every request to a device (round_robin, hash, least_loaded) and group the rows per device.'),
+        ('run_sharded(config, devices, placement, seed, workers, trace_file, samples)', 'Replay each device\'s rows in a worker process; per-device stats, occupancy samples and wall/worker time.'),
+        ('aggregate_devices(results) / format_sharded_table(result)', 'Cluster memory, device imbalance and failures per model, and their text table.'),
+    ],
+    'core/engine.py': [
+        ('SimulatorEngine.register(op, handler) / observe(observer)', 'Attach callbacks run for each event of an op, or after every event.'),
+        ('SimulatorEngine.schedule(time, event) / schedule_after(delay, event)', 'Queue a future event.'),
+        ('SimulatorEngine.add_source(events)', 'Merge a time-ordered event stream without loading it into the queue.'),
+        ('SimulatorEngine.run(until=None)', 'Process events in (time, insertion) order, jumping over idle time.'),
+        ('SimulatorEngine.snapshot() / restore(state, events)', 'Capture the clock, queue and source cursor; continue from them with a fresh copy of the source.'),
+    ],
+    'core/checkpoint.py': [
+        ('save_snapshot(path, state) / load_snapshot(path)', 'Write or read a zlib-compressed pickled snapshot of the models, allocs tables, engine and stats.'),
+        ('check_fork(snapshot_config, config)', 'Refuse a resume that changes the trace or pool geometry.'),
+        ('apply_tunables(models, config)', 'Push a fork\'s pressure threshold, compression and tier link settings into restored models.'),
     ],
     'results/plotter.py': [
-        ('plot_records(records, out_dir)', 'Render three PNGs for memory, fragmentation, throughput and save to out_dir.'),
+        ('plot_records(records, out_dir, max_points, method)', 'Render three PNGs for memory, fragmentation, throughput and save to out_dir, downsampling each series first.'),
+        ('minmax_downsample(x, y, max_points) / lttb(x, y, max_points)', 'Shape-preserving downsamplers: per-bucket min/max, or Largest-Triangle-Three-Buckets.'),
+    ],
+    'results/cache.py': [
+        ('ResultCache.key(config, seed, trace_file, instrument)', 'SHA-256 of the result-relevant config, trace identity and code version (None for unseeded runs).'),
+        ('ResultCache.lookup(key) / store(key, records_path, summary, instrumentation)', 'Fetch an entry (marking it used) or add one, then evict least recently used entries over max_bytes.'),
+        ('ResultCache.plots(key, plot_key) / store_plots(key, plot_key, files)', 'Plots of an entry per plot setting, rendered once from its stored records.'),
     ],
     'results/stats.py': [
         ('compute_stats(records)', 'Calculate peak/avg memory per model, average fragmentation and throughput.'),
+        ('OnlineStats.update(record)', 'Feed one step; folded into running moments and quantile sketches in fixed-size chunks.'),
+        ('OnlineStats.summary()', 'Peak/mean/variance/p50/p95/p99, allocation failure rates and rolling-window aggregates so far.'),
+        ('QuantileSketch', 'Log-bucketed streaming quantile sketch with bounded relative error.'),
     ],
 }
 
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the simulator's modules are imported from its own directory (see main.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,140 @@
+import random
+
+import pytest
+
+from memory_models.contiguous_arena import PLACEMENTS, BuddyArena, _Treap, make_arena
+
+
+def _holes(arena):
+    """Arena of 100 units with free extents of 30 units at 10 and 20 units at 50."""
+    for key, amount in (('a', 10), ('b', 30), ('c', 10), ('d', 20), ('e', 30)):
+        assert arena.allocate(key, amount) == amount
+    arena.free('b')
+    arena.free('d')
+    return arena
+
+
+def _check_treap(node):
+    """(keys in order, largest length) of a subtree, asserting every node's subtree maximum."""
+    if node is None:
+        return [], 0
+    left_keys, left_max = _check_treap(node[3])
+    right_keys, right_max = _check_treap(node[4])
+    assert node[5] == max(node[1], left_max, right_max)
+    return left_keys + [node[0]] + right_keys, node[5]
+
+
+def test_first_fit_takes_lowest_address():
+    arena = _holes(make_arena(100, 'first_fit'))
+    arena.allocate('x', 15)
+    assert arena.extents['x'] == (10, 15)
+
+
+def test_best_fit_takes_smallest_extent():
+    arena = _holes(make_arena(100, 'best_fit'))
+    arena.allocate('x', 15)
+    assert arena.extents['x'] == (50, 15)
+    # the 5 units left after x beat the 30 at address 10
+    arena.allocate('z', 5)
+    assert arena.extents['z'] == (65, 5)
+
+
+def test_best_fit_breaks_ties_by_address():
+    arena = make_arena(100, 'best_fit')
+    for key, amount in (('a', 10), ('b', 20), ('c', 10), ('d', 20), ('e', 40)):
+        arena.allocate(key, amount)
+    arena.free('d')
+    arena.free('b')
+    arena.allocate('x', 20)
+    assert arena.extents['x'] == (10, 20)
+
+
+def test_allocate_fails_without_a_large_enough_extent():
+    arena = _holes(make_arena(100, 'first_fit'))
+    assert arena.allocate('x', 40) == 0
+    assert arena.free_units == 50
+    assert arena.largest_free() == 30
+    assert arena.fragmentation() == pytest.approx(1 - 30 / 50)
+
+
+@pytest.mark.parametrize('placement', PLACEMENTS)
+def test_duplicate_key_is_rejected(placement):
+    arena = make_arena(64, placement)
+    arena.allocate('a', 4)
+    with pytest.raises(ValueError):
+        arena.allocate('a', 4)
+
+
+def test_treap_subtree_maxima_survive_inserts_and_removes():
+    rng = random.Random(1)
+    tree = _Treap(seed=2)
+    live = {}
+    for _ in range(2000):
+        if live and rng.random() < 0.4:
+            key = rng.choice(list(live))
+            tree.remove(key)
+            del live[key]
+        else:
+            key = rng.randrange(10000)
+            if key in live:
+                continue
+            live[key] = rng.randrange(1, 500)
+            tree.insert(key, live[key])
+        keys, largest = _check_treap(tree.root)
+        assert keys == sorted(live)
+        assert tree.largest() == largest == max(live.values(), default=0)
+    for n in (1, 50, 250, 499, 500):
+        expected = min((k for k, length in live.items() if length >= n), default=None)
+        assert tree.first_at_least(n) == expected
+
+
+@pytest.mark.parametrize('placement', PLACEMENTS)
+def test_freeing_everything_coalesces_to_one_extent(placement):
+    arena = make_arena(256, placement)
+    rng = random.Random(3)
+    keys = [k for k in range(40) if arena.allocate(k, rng.randrange(1, 12))]
+    rng.shuffle(keys)
+    for key in keys:
+        arena.free(key)
+    assert arena.free_units == 256
+    assert arena.largest_free() == 256
+    assert arena.fragmentation() == 0.0
+
+
+def test_buddy_blocks_merge_back_to_the_top_order():
+    arena = BuddyArena(64)
+    assert arena.allocate('a', 5) == 8
+    assert arena.allocate('b', 1) == 1
+    assert arena.allocate('c', 16) == 16
+    assert arena.largest_free() == 32
+    for key in ('b', 'c', 'a'):
+        arena.free(key)
+    top = arena.max_order - 1
+    assert arena._free[top] == {0}
+    assert sum(len(blocks) for blocks in arena._free) == 1
+
+
+@pytest.mark.parametrize('placement', PLACEMENTS)
+def test_compaction_keeps_every_live_extent(placement):
+    arena = make_arena(512, placement)
+    rng = random.Random(4)
+    for key in range(60):
+        arena.allocate(key, rng.randrange(1, 20))
+    for key in rng.sample(sorted(arena.extents), len(arena.extents) // 2):
+        arena.free(key)
+    before = dict(arena.extents)
+    moved = arena.compact()
+
+    assert {key: length for key, (_, length) in arena.extents.items()} == \
+        {key: length for key, (_, length) in before.items()}
+    assert moved == sum(length for key, (start, length) in before.items() if arena.extents[key][0] != start)
+    spans = sorted(arena.extents.values())
+    for (start, length), (next_start, _) in zip(spans, spans[1:]):
+        assert start + length <= next_start
+    assert spans[-1][0] + spans[-1][1] <= arena.size
+    if placement == 'buddy':
+        assert all(start % length == 0 for start, length in spans)
+    else:
+        # packed from address 0, leaving one free extent above
+        assert sum(length for _, length in spans) == spans[-1][0] + spans[-1][1]
+        assert arena.largest_free() == arena.free_units
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+from memory_models.eviction import ARCPolicy, ClockPolicy, LFUPolicy, make_policy
+
+
+def _compress(policy, k):
+    """Pop up to k victims and pack them into the first one, as PagedCompressedKV does."""
+    victims = policy.pop_victims(k)
+    if victims:
+        policy.compressed(victims[0], victims)
+    return victims
+
+
+def test_arc_target_grows_on_b1_hit_and_shrinks_on_b2_hit():
+    arc = ARCPolicy(8)
+    for page in range(4):
+        arc.add(page, page)
+    # the target starts at 0, so victims come from t1 and their ghost goes to b1
+    assert _compress(arc, 2) == [0, 1]
+    assert list(arc.b1) == [0]
+    arc.reloaded([0, 1], 10)
+    assert arc.target == 1.0
+    assert not arc.b1
+
+    arc.access(2, 11)
+    # t1 = [3] is within the target, so the victim comes from t2 and its ghost goes to b2
+    assert _compress(arc, 1) == [0]
+    assert list(arc.b2) == [0]
+    arc.reloaded([0], 12)
+    assert arc.target == 0.0
+    assert not arc.b2
+
+
+def test_arc_target_stays_within_capacity():
+    arc = ARCPolicy(2)
+    for t in range(10):
+        arc.add(t, t)
+        _compress(arc, 1)
+        arc.reloaded([t], t)
+        assert 0.0 <= arc.target <= arc.capacity
+
+
+def test_arc_ghost_lists_stay_bounded():
+    rng = random.Random(5)
+    capacity = 6
+    arc = ARCPolicy(capacity)
+    used = []
+    next_page = 0
+    for t in range(2000):
+        while len(used) < capacity:
+            arc.add(next_page, t)
+            used.append(next_page)
+            next_page += 1
+        for page in rng.sample(used, 2):
+            arc.access(page, t)
+        _compress(arc, rng.randint(1, 3))
+        if arc.b1 and rng.random() < 0.2:
+            arc.reloaded([rng.choice(list(arc.b1))], t)
+        if arc.b2 and rng.random() < 0.2:
+            arc.reloaded([rng.choice(list(arc.b2))], t)
+        used = list(arc.t1) + list(arc.t2)
+        assert len(arc.t1) + len(arc.b1) <= capacity
+        assert len(arc.t1) + len(arc.t2) + len(arc.b1) + len(arc.b2) <= 2 * capacity
+
+
+def test_lfu_evicts_lowest_count_then_oldest():
+    lfu = LFUPolicy(8)
+    for page in range(5):
+        lfu.add(page, page)
+    lfu.access(0, 5)
+    lfu.access(0, 6)
+    lfu.access(1, 7)
+    # 2, 3 and 4 were used once, in that order
+    assert lfu.pop_victims(2) == [2, 3]
+    assert lfu.pop_victims(3) == [4, 1, 0]
+
+
+def test_lfu_ties_go_to_the_page_that_reached_the_count_first():
+    lfu = LFUPolicy(4)
+    lfu.add(0, 0)
+    lfu.add(1, 1)
+    lfu.access(1, 2)
+    lfu.access(0, 3)
+    assert lfu.pop_victims(1) == [1]
+
+
+def test_lfu_putback_keeps_the_victims_first_in_line():
+    lfu = LFUPolicy(4)
+    for page in range(3):
+        lfu.add(page, page)
+    victims = lfu.pop_victims(2)
+    lfu.putback(victims)
+    assert lfu.pop_victims(3) == [0, 1, 2]
+
+
+def test_clock_gives_referenced_pages_a_second_chance():
+    clock = ClockPolicy(4)
+    for page in range(3):
+        clock.add(page, page)
+    # every page is referenced: one sweep clears the bits, then the hand evicts the first
+    assert clock.pop_victims(1) == [0]
+    assert clock.scanned == 4
+    clock.access(1, 3)
+    assert clock.pop_victims(1) == [2]
+    assert dict(clock.ring) == {1: 0}
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        make_policy('mru', 4)
@@ -0,0 +1,207 @@
+"""
+Compression benchmark on KV-like float16 tensors, producing a calibrated
+profile for PagedCompressedKV.
+
+Pages are (page_size, head_dim) float16 chunks, either synthesized (per-channel
+lognormal scales with a few outlier channels and values that drift slowly along
+the token axis, roughly how keys and values look) or cut from a .npy file.
+Every codec runs over all pages on the CPU, measuring the real compressed size
+and throughput:
+
+  zlib, lzma - lossless stdlib compressors on the raw float16 bytes
+  int8, int4 - symmetric per-token quantization (int4 packed two per byte)
+               with a float16 scale per token
+  topk       - keeps the `topk_keep` fraction of largest-magnitude values as
+               (index, float16 value) pairs
+
+A profile is {'codec', 'ratio', 'compress_mb_s', 'decompress_mb_s', 'error'}
+(`error` is the relative RMS reconstruction error, 0 for lossless codecs). Point
+the config's `compression_profile` at a saved profile (or inline it) and
+compression_from_config turns it into the model's compression ratio and
+per-page compress/decompress times.
+"""
+import argparse
+import lzma
+import time
+import zlib
+
+import numpy as np
+import yaml
+
+DEFAULT_TOPK_KEEP = 0.25
+
+
+def make_kv_pages(num_pages, page_size=32, head_dim=128, seed=None):
+    """Synthesize num_pages float16 KV pages of shape (page_size, head_dim)."""
+    rng = np.random.default_rng(seed)
+    scale = rng.lognormal(0.0, 0.5, head_dim)
+    # a few outlier channels with much larger magnitude
+    outliers = rng.choice(head_dim, max(1, head_dim // 32), replace=False)
+    scale[outliers] *= 10
+    tokens = num_pages * page_size
+    drift = np.cumsum(rng.normal(0, 0.1, (tokens, head_dim)), axis=0)
+    values = (rng.normal(0, 1, (tokens, head_dim)) + 0.5 * np.tanh(drift)) * scale
+    return values.astype(np.float16).reshape(num_pages, page_size, head_dim)
+
+
+def load_kv_pages(path, page_size=32):
+    """Cut a .npy tensor (last axis = channels) into float16 pages of page_size tokens; the tail is dropped."""
+    data = np.load(path).astype(np.float16)
+    data = data.reshape(-1, data.shape[-1])
+    num_pages = len(data) // page_size
+    if not num_pages:
+        raise ValueError(f"{path} holds fewer than {page_size} tokens")
+    return data[:num_pages * page_size].reshape(num_pages, page_size, data.shape[-1])
+
+
+# Codecs: name -> (compress(page) -> tuple of payload parts, decompress(parts, shape) -> float16 page).
+# A payload's size is the sum of its parts' byte lengths.
+
+def _lossless(module):
+    def compress(page):
+        return (module.compress(page.tobytes()),)
+
+    def decompress(parts, shape):
+        return np.frombuffer(module.decompress(parts[0]), dtype=np.float16).reshape(shape)
+    return compress, decompress
+
+
+def _quantize(page, levels):
+    absmax = np.abs(page).max(axis=1, keepdims=True).astype(np.float32)
+    scale = np.where(absmax > 0, absmax / levels, 1).astype(np.float16)
+    q = np.clip(np.rint(page / scale), -levels, levels).astype(np.int8)
+    return q, scale
+
+
+def _int8_compress(page):
+    return _quantize(page, 127)
+
+
+def _int8_decompress(parts, shape):
+    q, scale = parts
+    return (q * scale.astype(np.float32)).astype(np.float16)
+
+
+def _int4_compress(page):
+    q, scale = _quantize(page, 7)
+    nibbles = (q.ravel() + 8).astype(np.uint8)
+    if len(nibbles) % 2:
+        nibbles = np.append(nibbles, np.uint8(8))
+    return (nibbles[0::2] << 4) | nibbles[1::2], scale
+
+
+def _int4_decompress(parts, shape):
+    packed, scale = parts
+    nibbles = np.empty(len(packed) * 2, dtype=np.int8)
+    nibbles[0::2] = packed >> 4
+    nibbles[1::2] = packed & 0xF
+    q = nibbles[:shape[0] * shape[1]].reshape(shape) - 8
+    return (q * scale.astype(np.float32)).astype(np.float16)
+
+
+def _topk(keep):
+    def compress(page):
+        flat = page.ravel()
+        k = max(1, int(len(flat) * keep))
+        index = np.argpartition(np.abs(flat), len(flat) - k)[len(flat) - k:]
+        index.sort()
+        return index.astype(np.uint16 if len(flat) <= 1 << 16 else np.uint32), flat[index]
+
+    def decompress(parts, shape):
+        index, values = parts
+        page = np.zeros(shape[0] * shape[1], dtype=np.float16)
+        page[index] = values
+        return page.reshape(shape)
+    return compress, decompress
+
+
+def make_codecs(topk_keep=DEFAULT_TOPK_KEEP):
+    return {
+        'zlib': _lossless(zlib),
+        'lzma': _lossless(lzma),
+        'int8': (_int8_compress, _int8_decompress),
+        'int4': (_int4_compress, _int4_decompress),
+        'topk': _topk(topk_keep),
+    }
+
+
+CODECS = make_codecs()
+
+
+def _payload_bytes(parts):
+    return sum(len(p) if isinstance(p, bytes) else p.nbytes for p in parts)
+
+
+def benchmark_codec(pages, codec):
+    """Run one (compress, decompress) pair over every page; returns its profile without the codec name."""
+    compress, decompress = codec
+    raw = pages.nbytes
+    start = time.perf_counter()
+    payloads = [compress(page) for page in pages]
+    compress_s = time.perf_counter() - start
+    start = time.perf_counter()
+    restored = [decompress(parts, page.shape) for parts, page in zip(payloads, pages)]
+    decompress_s = time.perf_counter() - start
+
+    original = pages.astype(np.float32)
+    diff = np.stack(restored).astype(np.float32) - original
+    norm = np.sqrt(np.mean(original ** 2))
+    return {
+        'ratio': sum(_payload_bytes(parts) for parts in payloads) / raw,
+        'compress_mb_s': raw / compress_s / 1e6,
+        'decompress_mb_s': raw / decompress_s / 1e6,
+        'error': float(np.sqrt(np.mean(diff ** 2)) / norm) if norm else 0.0,
+    }
+
+
+def benchmark(pages, codecs=None):
+    """Profiles of the named codecs (default: all of CODECS) on pages, keyed by codec name."""
+    names = codecs or list(CODECS)
+    unknown = set(names) - set(CODECS)
+    if unknown:
+        raise ValueError(f"unknown codecs: {sorted(unknown)}")
+    return {name: dict(codec=name, **benchmark_codec(pages, CODECS[name])) for name in names}
+
+
+def save_profile(path, profile):
+    with open(path, 'w') as f:
+        yaml.safe_dump({k: float(v) if k != 'codec' else v for k, v in profile.items()}, f, sort_keys=False)
+
+
+def load_profile(path):
+    with open(path, 'r') as f:
+        return yaml.safe_load(f)
+
+
+def format_table(results):
+    lines = [f"{'codec':<6} {'ratio':>7} {'comp MB/s':>10} {'decomp MB/s':>12} {'rel err':>9}"]
+    for p in results.values():
+        lines.append(f"{p['codec']:<6} {p['ratio']:>7.3f} {p['compress_mb_s']:>10.1f} "
+                     f"{p['decompress_mb_s']:>12.1f} {p['error']:>9.4f}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark KV-page codecs and write a calibrated compression profile')
+    parser.add_argument('--npy', default=None, help='Benchmark pages cut from this .npy tensor instead of synthetic ones')
+    parser.add_argument('--pages', type=int, default=256, help='Synthetic pages to generate')
+    parser.add_argument('--page-size', type=int, default=32, help='Tokens per page')
+    parser.add_argument('--head-dim', type=int, default=128, help='Channels per token of synthetic pages')
+    parser.add_argument('--codecs', nargs='+', default=None, choices=sorted(CODECS))
+    parser.add_argument('--profile', default=None, help='Write the profile of --codec to this YAML file')
+    parser.add_argument('--codec', default='int8', help='Codec whose profile --profile writes')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if args.npy:
+        pages = load_kv_pages(args.npy, args.page_size)
+    else:
+        pages = make_kv_pages(args.pages, args.page_size, args.head_dim, seed=args.seed)
+    codecs = args.codecs or list(CODECS)
+    if args.profile and args.codec not in codecs:
+        codecs.append(args.codec)
+    results = benchmark(pages, codecs)
+    print(f"{len(pages)} pages of {pages.shape[1]}x{pages.shape[2]} float16 ({pages.nbytes / 1e6:.1f} MB)")
+    print(format_table(results))
+    if args.profile:
+        save_profile(args.profile, results[args.codec])
+        print(f"Wrote {args.codec} profile to {args.profile}")
@@ -1,56 +1,228 @@
 """
 Helper functions for the simulator.
 """
+import heapq
+import math
 import random
+from collections import deque
 
+import numpy as np
 
-def generate_synthetic_trace(num_steps, workload_type, free_probability=0.3, lifetime_range=(5, 50)):
+# Fixed-width array form of a trace: one row per event.
+# Decode traces use prefill (prompt tokens), append (tokens generated) and end
+# instead of alloc/free; `size` holds the token count for prefill and append.
+OP_ALLOC = 0
+OP_FREE = 1
+OP_PREFILL = 2
+OP_APPEND = 3
+OP_END = 4
+OP_NAMES = {OP_ALLOC: 'alloc', OP_FREE: 'free', OP_PREFILL: 'prefill', OP_APPEND: 'append', OP_END: 'end'}
+OP_CODES = {name: code for code, name in OP_NAMES.items()}
+# Ops that ask the models for memory (and can therefore fail)
+GROW_OPS = ('alloc', 'prefill', 'append')
+# alloc/prefill rows may declare that their first prefix_len tokens are shared prefix `prefix` (-1: none)
+NO_PREFIX = -1
+TRACE_DTYPE = np.dtype([('op', 'u1'), ('id', '<i8'), ('size', '<u4'), ('timestamp', '<u8'),
+                        ('prefix', '<i8'), ('prefix_len', '<u4')])
+
+
+def iter_synthetic_trace(num_steps, workload_type, free_probability=0.3, lifetime_range=(5, 50), seed=None,
+                         arrival_probability=1.0):
     """
-    Generate a sequence of events with allocations and frees.
+    Lazily yield a time-ordered sequence of events with allocations and frees.
 
     Each event is a dict:
-      - {'op': 'alloc', 'id': int, 'size': int}
-      - {'op': 'free', 'id': int}
+      - {'op': 'alloc', 'id': int, 'size': int, 'time': int}
+      - {'op': 'free', 'id': int, 'time': int}
 
     We schedule frees for allocations after a random lifetime (within lifetime_range).
     free_probability is the fraction of allocated objects that are eligible to be freed before end.
+    Every scheduled free is emitted, so several events may share a time. Allocations arrive on a
+    tick with probability arrival_probability (1.0 = every tick); idle ticks are skipped rather
+    than iterated, so sparse traces are generated in time proportional to their events.
+    Passing a seed makes the trace reproducible. Only frees that are still pending are kept in memory.
+    Returns a SyntheticTrace, whose state() can be checkpointed and restored.
+    """
+    return SyntheticTrace(num_steps, workload_type, free_probability, lifetime_range, seed, arrival_probability)
+
+
+class SyntheticTrace:
     """
-    trace = [None] * num_steps
-    alloc_id = 0
-    scheduled_frees = {}
+    Iterator behind iter_synthetic_trace, generating one tick of events at a time.
+
+    Its whole state (RNG, clock, next id, pending frees) is plain data: state() captures it and
+    restore() continues the trace from there without regenerating the events before it.
+    """
+
+    def __init__(self, num_steps, workload_type, free_probability=0.3, lifetime_range=(5, 50), seed=None,
+                 arrival_probability=1.0):
+        self.num_steps = num_steps
+        self.workload_type = workload_type
+        self.free_probability = free_probability
+        self.lifetime_range = lifetime_range
+        self.rng = random.Random(seed)
+        self.alloc_id = 0
+        self.scheduled_frees = []  # heap of (free_time, alloc_id)
+        self.pending = deque()  # generated events not yet returned
+        self.log_miss = math.log(1.0 - arrival_probability) if arrival_probability < 1 else None
+        self.t = 0 if self.log_miss is None else self._next_arrival(-1)
+
+    def _next_arrival(self, t):
+        if self.log_miss is None:
+            return t + 1
+        return t + 1 + int(math.log(1.0 - self.rng.random()) / self.log_miss)
 
-    for t in range(num_steps):
-        # Inject any scheduled frees for this time
-        if t in scheduled_frees:
-            # schedule frees at this time (may be multiple)
-            for a_id in scheduled_frees[t]:
-                trace[t] = {'op': 'free', 'id': a_id}
-                # Only one event per step in this simple generator; if multiple scheduled, keep the last
+    def __iter__(self):
+        return self
 
-        # If there's already a free scheduled at this step, sometimes also emit an alloc
-        if trace[t] is None or random.random() < 0.5:
+    def __next__(self):
+        while not self.pending:
+            if not self._generate():
+                raise StopIteration
+        return self.pending.popleft()
+
+    def _generate(self):
+        """Queue the next tick's events (or the next leftover free); False once the trace is over."""
+        rng = self.rng
+        scheduled_frees = self.scheduled_frees
+        if self.t >= self.num_steps:
+            if not scheduled_frees:
+                return False
+            free_time, a_id = heapq.heappop(scheduled_frees)
+            self.pending.append({'op': 'free', 'id': a_id, 'time': free_time})
+            return True
+
+        t = self.t
+        # Emit every free that is due by now
+        freed_now = False
+        while scheduled_frees and scheduled_frees[0][0] <= t:
+            free_time, a_id = heapq.heappop(scheduled_frees)
+            freed_now = freed_now or free_time == t
+            self.pending.append({'op': 'free', 'id': a_id, 'time': free_time})
+
+        # If there's already a free at this step, sometimes also emit an alloc
+        if not freed_now or rng.random() < 0.5:
             # create an allocation event
-            if workload_type == 'short':
-                size = random.randint(1, 4)
-            elif workload_type == 'long':
-                size = random.randint(8, 32)
+            if self.workload_type == 'short':
+                size = rng.randint(1, 4)
+            elif self.workload_type == 'long':
+                size = rng.randint(8, 32)
             else:
-                size = random.randint(1, 32)
+                size = rng.randint(1, 32)
 
-            trace[t] = {'op': 'alloc', 'id': alloc_id, 'size': size}
+            self.pending.append({'op': 'alloc', 'id': self.alloc_id, 'size': size, 'time': t})
 
             # schedule a free for this allocation with some probability
-            if random.random() < free_probability:
-                lifetime = random.randint(lifetime_range[0], lifetime_range[1])
-                free_time = min(num_steps - 1, t + lifetime)
-                scheduled_frees.setdefault(free_time, []).append(alloc_id)
+            if rng.random() < self.free_probability:
+                lifetime = rng.randint(self.lifetime_range[0], self.lifetime_range[1])
+                free_time = min(self.num_steps - 1, t + lifetime)
+                heapq.heappush(scheduled_frees, (free_time, self.alloc_id))
+
+            self.alloc_id += 1
+        self.t = self._next_arrival(t)
+        return True
+
+    def state(self):
+        return {
+            'rng': self.rng.getstate(),
+            't': self.t,
+            'alloc_id': self.alloc_id,
+            'scheduled_frees': list(self.scheduled_frees),
+            'pending': list(self.pending),
+        }
+
+    def restore(self, state):
+        self.rng.setstate(state['rng'])
+        self.t = state['t']
+        self.alloc_id = state['alloc_id']
+        self.scheduled_frees = list(state['scheduled_frees'])
+        self.pending = deque(state['pending'])
+
+
+def generate_synthetic_trace(num_steps, workload_type, free_probability=0.3, lifetime_range=(5, 50), seed=None,
+                             arrival_probability=1.0):
+    """Materialize iter_synthetic_trace as a list (see there for the event format)."""
+    return list(iter_synthetic_trace(num_steps, workload_type, free_probability, lifetime_range, seed,
+                                     arrival_probability))
 
-            alloc_id += 1
 
-    # Any remaining scheduled frees that didn't get placed overwrite some allocs near the end
-    for t, ids in scheduled_frees.items():
-        for a_id in ids:
-            if t < num_steps:
-                trace[t] = {'op': 'free', 'id': a_id}
+def trace_to_array(trace):
+    """Pack a list of event dicts into a TRACE_DTYPE array (timestamp = event 'time', else its index)."""
+    arr = np.zeros(len(trace), dtype=TRACE_DTYPE)
+    arr['op'] = [OP_CODES[e['op']] for e in trace]
+    arr['id'] = [e['id'] for e in trace]
+    arr['size'] = [e.get('size', 0) for e in trace]
+    arr['timestamp'] = [e.get('time', i) for i, e in enumerate(trace)]
+    arr['prefix'] = [e.get('prefix', NO_PREFIX) for e in trace]
+    arr['prefix_len'] = [e.get('prefix_len', 0) for e in trace]
+    return arr
+
+
+def iter_trace_array(arr, chunk_size=65536, start=0):
+    """
+    Yield event dicts from a TRACE_DTYPE array (from row `start`), in the same shape
+    generate_synthetic_trace uses. Returns an ArrayTrace, which tracks its position.
+    """
+    return ArrayTrace(arr, chunk_size=chunk_size, start=start)
+
+
+class ArrayTrace:
+    """Iterator behind iter_trace_array: converts one chunk of rows at a time; state() is the next row."""
+
+    def __init__(self, arr, chunk_size=65536, start=0):
+        self.arr = arr
+        self.chunk_size = chunk_size
+        self._chunk_start = start
+        self._events = []
+        self._next = 0
+
+    @property
+    def position(self):
+        return self._chunk_start + self._next
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._next == len(self._events):
+            self._chunk_start += len(self._events)
+            self._next = 0
+            self._events = _chunk_events(self.arr[self._chunk_start:self._chunk_start + self.chunk_size])
+            if not self._events:
+                raise StopIteration
+        event = self._events[self._next]
+        self._next += 1
+        return event
+
+    def state(self):
+        return self.position
+
+    def restore(self, state):
+        self._chunk_start = state
+        self._events = []
+        self._next = 0
+
+
+def decode_event(op, alloc_id, size=0, time=None, prefix=NO_PREFIX, prefix_len=0):
+    """
+    Event dict of one stored row (trace or record store): ops that grow memory carry their
+    size and any declared prefix, free/end only their id. time is added when given.
+    """
+    if op in (OP_ALLOC, OP_PREFILL, OP_APPEND):
+        event = {'op': OP_NAMES[op], 'id': alloc_id, 'size': size}
+        if time is not None:
+            event['time'] = time
+        if prefix != NO_PREFIX:
+            event['prefix'] = prefix
+            event['prefix_len'] = prefix_len
+        return event
+    event = {'op': OP_NAMES[op], 'id': alloc_id}
+    if time is not None:
+        event['time'] = time
+    return event
+
 
-    return trace
+def _chunk_events(chunk):
+    columns = (chunk['op'].tolist(), chunk['id'].tolist(), chunk['size'].tolist(), chunk['timestamp'].tolist(),
+               chunk['prefix'].tolist(), chunk['prefix_len'].tolist())
+    return [decode_event(*row) for row in zip(*columns)]
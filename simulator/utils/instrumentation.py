@@ -0,0 +1,86 @@
+"""
+Opt-in instrumentation for the memory models.
+
+Every model has a `counters` attribute that is None by default. Its hot paths
+only count when it is set (`if self.counters is not None`), so an
+uninstrumented run pays one attribute test per counting site. instrument(model)
+attaches a Counters object and wraps the model's public methods on that
+instance with wall-time timers; the class and other instances are untouched.
+Times are inclusive: a method called by another (e.g. compress_cold_blocks
+from allocate) is counted in both.
+
+Counters record work (pages scanned or allocated, compression passes and the
+pages compressed/freed per pass, ...) and allocation failures by cause.
+snapshot() returns them as a nested dict that can sit next to compute_stats
+output (and flattens the same way in sweep tables).
+"""
+import functools
+import time
+
+TIMED_METHODS = ('allocate', 'free', 'prefill', 'append', 'end', 'touch', 'touch_pages', 'compress_cold_blocks')
+
+
+class Counters:
+    def __init__(self):
+        self.counts = {}
+        self.failures = {}
+        self.per_pass = {}  # name -> [passes, total, max]
+        self.times = {}  # method -> [calls, seconds]
+
+    def add(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def fail(self, cause):
+        self.failures[cause] = self.failures.get(cause, 0) + 1
+
+    def observe(self, name, value):
+        """Record one pass's value of `name` (e.g. pages freed by one compression pass)."""
+        entry = self.per_pass.get(name)
+        if entry is None:
+            self.per_pass[name] = [1, value, value]
+        else:
+            entry[0] += 1
+            entry[1] += value
+            entry[2] = max(entry[2], value)
+
+    def snapshot(self):
+        return {
+            'counts': dict(self.counts),
+            'failures': dict(self.failures),
+            'per_pass': {name: {'mean': total / passes, 'max': peak}
+                         for name, (passes, total, peak) in self.per_pass.items()},
+            'time': {method: {'calls': calls, 'seconds': seconds}
+                     for method, (calls, seconds) in self.times.items() if calls},
+        }
+
+
+def failed(model, cause):
+    """Count a failure of `cause` on an instrumented model; always returns False."""
+    if model.counters is not None:
+        model.counters.fail(cause)
+    return False
+
+
+def _timed(method, name, counters):
+    entry = counters.times.setdefault(name, [0, 0.0])
+    clock = time.perf_counter
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            entry[0] += 1
+            entry[1] += clock() - start
+    return wrapper
+
+
+def instrument(model, methods=TIMED_METHODS):
+    """Attach a Counters object to model and time its public methods; returns the Counters."""
+    counters = model.counters = Counters()
+    for name in methods:
+        method = getattr(model, name, None)
+        if method is not None:
+            setattr(model, name, _timed(method, name, counters))
+    return counters
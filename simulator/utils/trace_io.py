@@ -0,0 +1,136 @@
+"""
+Binary trace format: record once, replay many times.
+
+A trace file is a 32-byte header followed by packed TRACE_DTYPE rows
+(op u8, id i64, size u32, timestamp u64, prefix i64, prefix_len u32; 33 bytes
+each, little-endian).
+
+Header layout:
+  magic    8 bytes  b'KVTRACE\\0'
+  version  uint32
+  row size uint32   (sanity check against TRACE_DTYPE.itemsize)
+  count    uint64   number of rows
+  reserved 8 bytes
+
+open_trace() returns a read-only numpy.memmap over the rows, so replay starts
+instantly and only touches the pages it reads, however large the file is.
+
+Version 1 files (rows without the prefix columns, 21 bytes each) are still
+read: their rows are copied into a TRACE_DTYPE array with no prefix. Writing
+always produces the current version.
+"""
+import argparse
+import struct
+
+import numpy as np
+
+from utils.helpers import NO_PREFIX, OP_CODES, TRACE_DTYPE, iter_synthetic_trace, iter_trace_array
+
+MAGIC = b'KVTRACE\x00'
+# version 2 added the shared-prefix columns
+VERSION = 2
+HEADER = struct.Struct('<8sIIQ8x')
+# Rows of version 1 files, before the prefix columns
+V1_DTYPE = np.dtype([('op', 'u1'), ('id', '<i8'), ('size', '<u4'), ('timestamp', '<u8')])
+
+
+class TraceWriter:
+    """Append events (dicts or TRACE_DTYPE arrays) to a trace file in fixed-size chunks."""
+
+    def __init__(self, path, chunk_size=65536):
+        self.path = path
+        self.count = 0
+        self._chunk = np.zeros(chunk_size, dtype=TRACE_DTYPE)
+        self._fill = 0
+        self._f = open(path, 'wb')
+        self._f.write(HEADER.pack(MAGIC, VERSION, TRACE_DTYPE.itemsize, 0))
+
+    def write(self, event):
+        if 'lifetime' in event:
+            raise ValueError("trace files need explicit free events; expand 'lifetime' before writing")
+        row = self._chunk[self._fill]
+        row['op'] = OP_CODES[event['op']]
+        row['id'] = event['id']
+        row['size'] = event.get('size', 0)
+        row['timestamp'] = event.get('time', self.count)
+        row['prefix'] = event.get('prefix', NO_PREFIX)
+        row['prefix_len'] = event.get('prefix_len', 0)
+        self._fill += 1
+        self.count += 1
+        if self._fill == len(self._chunk):
+            self.flush()
+
+    def write_array(self, arr):
+        self.flush()
+        self._f.write(np.ascontiguousarray(arr, dtype=TRACE_DTYPE).tobytes())
+        self.count += len(arr)
+
+    def flush(self):
+        self._f.write(self._chunk[:self._fill].tobytes())
+        self._fill = 0
+
+    def close(self):
+        if self._f.closed:
+            return
+        self.flush()
+        # patch the row count into the header now that it is known
+        self._f.seek(0)
+        self._f.write(HEADER.pack(MAGIC, VERSION, TRACE_DTYPE.itemsize, self.count))
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_trace(path, events):
+    """Write an event stream (list or generator of dicts, or a TRACE_DTYPE array) to path; returns the row count."""
+    with TraceWriter(path) as writer:
+        if isinstance(events, np.ndarray):
+            writer.write_array(events)
+        else:
+            for event in events:
+                writer.write(event)
+    return writer.count
+
+
+def open_trace(path):
+    """
+    Memory-map a trace file as a read-only TRACE_DTYPE array (no parsing, no copy). A version 1
+    file is converted into an in-memory TRACE_DTYPE array with no prefixes instead.
+    """
+    with open(path, 'rb') as f:
+        magic, version, row_size, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a KV trace file")
+    dtype = {1: V1_DTYPE, VERSION: TRACE_DTYPE}.get(version)
+    if dtype is None or row_size != dtype.itemsize:
+        raise ValueError(f"{path} has unsupported trace format (version {version}, row size {row_size})")
+    if count == 0:
+        return np.zeros(0, dtype=TRACE_DTYPE)
+    rows = np.memmap(path, dtype=dtype, mode='r', offset=HEADER.size, shape=(count,))
+    if dtype is TRACE_DTYPE:
+        return rows
+    arr = np.zeros(count, dtype=TRACE_DTYPE)
+    for name in V1_DTYPE.names:
+        arr[name] = rows[name]
+    arr['prefix'] = NO_PREFIX
+    return arr
+
+
+def iter_trace_file(path, chunk_size=65536):
+    """Yield event dicts straight off the memory-mapped file, one chunk at a time."""
+    return iter_trace_array(open_trace(path), chunk_size=chunk_size)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert a synthetic trace to the binary trace format')
+    parser.add_argument('out', help='Output trace file')
+    parser.add_argument('--steps', type=int, default=10000, help='Number of clock ticks to generate')
+    parser.add_argument('--workload', default='mixed', choices=['short', 'long', 'mixed'])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    n = write_trace(args.out, iter_synthetic_trace(args.steps, args.workload, seed=args.seed))
+    print(f"Wrote {n} events to {args.out}")
@@ -0,0 +1,202 @@
+"""
+Vectorized, seeded workload generator for LLM-serving style traces.
+
+Each request arrives, allocates KV for its prompt plus generated tokens, and
+is freed once decoding finishes. Everything is drawn with NumPy in one shot
+and returned as a TRACE_DTYPE array (time-ordered alloc/free rows), which
+main.py replays directly or trace_io.write_trace saves to disk.
+
+Arrival families:
+  poisson - exponential inter-arrival times at `arrival_rate` requests per tick
+  bursty  - gamma inter-arrival times with the same mean and a coefficient of
+            variation of `burstiness` (>1 gives clustered bursts and lulls)
+
+Prompt lengths are lognormal (median `prompt_median`, log-space sigma
+`prompt_sigma`); generation lengths are Pareto with minimum `gen_min` and
+tail index `gen_alpha` (heavier tail as alpha approaches 1). A request lives
+for 1 + ceil(generated tokens * ticks_per_token) ticks.
+
+By default each request is one alloc of prompt + generated tokens and one
+free. With decode=True it is a prefill of the prompt, one single-token append
+per generated token (the k-th at arrival + 1 + floor(k * ticks_per_token)) and
+an end, so the models see sequences grow the way decoding grows them.
+
+With shared_prefixes > 0 every request starts with one of that many system
+prompts of prefix_tokens tokens (picked uniformly), declared in the trace's
+prefix/prefix_len columns so prefix-sharing models can reuse its pages.
+
+generate_requests draws the same requests but returns them one row each
+(arrival, prompt, generated, prefix, priority) for the continuous-batching
+scheduler in core/scheduler.py, which decides itself when they run.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.helpers import NO_PREFIX, OP_ALLOC, OP_APPEND, OP_END, OP_FREE, OP_PREFILL, TRACE_DTYPE
+
+ARRIVAL_FAMILIES = ('poisson', 'bursty')
+
+# One row per request for request-level (scheduler) simulation; times in ticks
+REQUEST_DTYPE = np.dtype([
+    ('id', '<i8'),
+    ('arrival', '<i8'),
+    ('prompt', '<i8'),
+    ('generated', '<i8'),
+    ('prefix', '<i8'),
+    ('prefix_len', '<i8'),
+    ('priority', '<i8'),
+])
+
+
+def generate_workload(num_requests, family='poisson', seed=None, arrival_rate=1.0, burstiness=4.0,
+                      prompt_median=256, prompt_sigma=1.0, max_prompt=4096,
+                      gen_min=16, gen_alpha=1.5, max_gen=2048, ticks_per_token=0.05, decode=False,
+                      shared_prefixes=0, prefix_tokens=512):
+    """Return a time-ordered TRACE_DTYPE array: alloc/free per request, or prefill/appends/end with decode."""
+    if not ticks_per_token > 0:
+        # a request's appends must land before its end (or free), which takes some decode time
+        raise ValueError(f"ticks_per_token must be > 0, got {ticks_per_token!r}")
+    rng = np.random.default_rng(seed)
+    n = int(num_requests)
+    arrivals, prompt, generated, prefix, prefix_len = _draw_requests(
+        rng, n, family, arrival_rate, burstiness, prompt_median, prompt_sigma, max_prompt,
+        gen_min, gen_alpha, max_gen, shared_prefixes, prefix_tokens)
+    free_times = arrivals + 1 + np.ceil(generated * ticks_per_token).astype(np.int64)
+    if decode:
+        return _decode_trace(arrivals, prompt, generated, free_times, ticks_per_token, prefix, prefix_len)
+
+    # Arrivals are already sorted; sort only the frees and merge the two runs by rank.
+    # At equal times frees go first, so memory is released before new requests arrive.
+    free_order = np.argsort(free_times, kind='stable')
+    free_times = free_times[free_order]
+    alloc_pos = np.arange(n) + np.searchsorted(free_times, arrivals, side='right')
+    free_pos = np.arange(n) + np.searchsorted(arrivals, free_times, side='left')
+
+    trace = np.empty(2 * n, dtype=TRACE_DTYPE)
+    trace['op'][alloc_pos] = OP_ALLOC
+    trace['id'][alloc_pos] = np.arange(n)
+    trace['size'][alloc_pos] = prompt + generated
+    trace['timestamp'][alloc_pos] = arrivals
+    trace['prefix'][alloc_pos] = prefix
+    trace['prefix_len'][alloc_pos] = prefix_len
+    trace['op'][free_pos] = OP_FREE
+    trace['id'][free_pos] = free_order
+    trace['size'][free_pos] = 0
+    trace['timestamp'][free_pos] = free_times
+    trace['prefix'][free_pos] = NO_PREFIX
+    trace['prefix_len'][free_pos] = 0
+    return trace
+
+
+def generate_requests(num_requests, family='poisson', seed=None, arrival_rate=1.0, burstiness=4.0,
+                      prompt_median=256, prompt_sigma=1.0, max_prompt=4096,
+                      gen_min=16, gen_alpha=1.5, max_gen=2048, shared_prefixes=0, prefix_tokens=512,
+                      priority_levels=0, **unused):
+    """
+    The same requests as generate_workload (same seed, same draws) as a REQUEST_DTYPE array in
+    arrival order, for schedulers that decide themselves when each request runs. With
+    priority_levels > 0 each request gets a uniform priority in [0, priority_levels), 0 = most urgent.
+    Trace-only parameters (ticks_per_token, decode) are accepted and ignored.
+    """
+    if not ticks_per_token > 0:
+        # a request's appends must land before its end (or free), which takes some decode time
+        raise ValueError(f"ticks_per_token must be > 0, got {ticks_per_token!r}")
+    rng = np.random.default_rng(seed)
+    n = int(num_requests)
+    arrivals, prompt, generated, prefix, prefix_len = _draw_requests(
+        rng, n, family, arrival_rate, burstiness, prompt_median, prompt_sigma, max_prompt,
+        gen_min, gen_alpha, max_gen, shared_prefixes, prefix_tokens)
+    requests = np.empty(n, dtype=REQUEST_DTYPE)
+    requests['id'] = np.arange(n)
+    requests['arrival'] = arrivals
+    requests['prompt'] = prompt
+    requests['generated'] = generated
+    requests['prefix'] = prefix
+    requests['prefix_len'] = prefix_len
+    requests['priority'] = rng.integers(0, priority_levels, n) if priority_levels > 0 else 0
+    return requests
+
+
+def _draw_requests(rng, n, family, arrival_rate, burstiness, prompt_median, prompt_sigma, max_prompt,
+                   gen_min, gen_alpha, max_gen, shared_prefixes, prefix_tokens):
+    """Arrival ticks, prompt lengths (prefix included), generation lengths and prefix columns."""
+    if family not in ARRIVAL_FAMILIES:
+        raise ValueError(f"unknown workload family {family!r}; expected one of {ARRIVAL_FAMILIES}")
+    if family == 'poisson':
+        gaps = rng.exponential(1.0 / arrival_rate, n)
+    else:
+        # gamma with shape k has CV 1/sqrt(k); scale keeps the mean at 1/arrival_rate
+        shape = 1.0 / (burstiness ** 2)
+        gaps = rng.gamma(shape, 1.0 / (arrival_rate * shape), n)
+    arrivals = np.cumsum(gaps).astype(np.int64)
+    del gaps
+
+    prompt = np.clip(rng.lognormal(np.log(prompt_median), prompt_sigma, n), 1, max_prompt).astype(np.int64)
+    generated = np.clip(gen_min * (1.0 + rng.pareto(gen_alpha, n)), gen_min, max_gen).astype(np.int64)
+    # drawn last so traces without prefixes are unchanged for a given seed
+    prefix = rng.integers(0, shared_prefixes, n) if shared_prefixes > 0 else np.full(n, NO_PREFIX)
+    prefix_len = np.full(n, prefix_tokens if shared_prefixes > 0 else 0)
+    prompt += prefix_len
+    return arrivals, prompt, generated, prefix, prefix_len
+
+
+def _decode_trace(arrivals, prompt, generated, ends, ticks_per_token, prefix, prefix_len):
+    n = len(arrivals)
+    # one append per generated token; k numbers a request's tokens from 0
+    seq = np.repeat(np.arange(n), generated)
+    k = np.arange(len(seq)) - np.repeat(np.cumsum(generated) - generated, generated)
+    append_times = arrivals[seq] + 1 + np.floor(k * ticks_per_token).astype(np.int64)
+    # the last append lands strictly before the end, so ordering by (time, op rank) is safe:
+    # within a tick ends release memory first, then appends, then new prefills
+    times = np.concatenate([arrivals, append_times, ends])
+    rank = np.concatenate([np.full(n, 2), np.ones(len(seq), dtype=np.int64), np.zeros(n, dtype=np.int64)])
+    order = np.argsort(times * 3 + rank, kind='stable')
+
+    trace = np.empty(len(times), dtype=TRACE_DTYPE)
+    trace['op'] = np.concatenate([np.full(n, OP_PREFILL), np.full(len(seq), OP_APPEND), np.full(n, OP_END)])[order]
+    trace['id'] = np.concatenate([np.arange(n), seq, np.arange(n)])[order]
+    trace['size'] = np.concatenate([prompt, np.ones(len(seq), dtype=np.int64), np.zeros(n, dtype=np.int64)])[order]
+    trace['timestamp'] = times[order]
+    others = len(seq) + n
+    trace['prefix'] = np.concatenate([prefix, np.full(others, NO_PREFIX)])[order]
+    trace['prefix_len'] = np.concatenate([prefix_len, np.zeros(others, dtype=np.int64)])[order]
+    return trace
+
+
+def workload_from_config(workload, seed=None):
+    """Build a trace from a config `workload:` block; the block's own `seed` wins over `seed`."""
+    params = dict(workload)
+    num_requests = params.pop('num_requests')
+    params.pop('priority_levels', None)  # request-level only
+    params.setdefault('seed', seed)
+    return generate_workload(num_requests, **params)
+
+
+def requests_from_config(workload, seed=None):
+    """Build a REQUEST_DTYPE array from a config `workload:` block (see workload_from_config)."""
+    params = dict(workload)
+    num_requests = params.pop('num_requests')
+    params.setdefault('seed', seed)
+    return generate_requests(num_requests, **params)
+
+
+if __name__ == '__main__':
+    from utils.trace_io import write_trace
+
+    parser = argparse.ArgumentParser(description='Generate an LLM-serving workload as a binary trace file')
+    parser.add_argument('out', help='Output trace file')
+    parser.add_argument('--requests', type=int, default=100000, help='Number of requests (two events each)')
+    parser.add_argument('--family', default='poisson', choices=ARRIVAL_FAMILIES)
+    parser.add_argument('--rate', type=float, default=1.0, help='Mean arrivals per tick')
+    parser.add_argument('--decode', action='store_true', help='Emit prefill/append/end instead of alloc/free')
+    parser.add_argument('--shared-prefixes', type=int, default=0, help='Number of distinct shared system prompts')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    trace = generate_workload(args.requests, args.family, seed=args.seed, arrival_rate=args.rate, decode=args.decode,
+                              shared_prefixes=args.shared_prefixes)
+    elapsed = time.perf_counter() - start
+    n = write_trace(args.out, trace)
+    print(f"Generated {n} events in {elapsed:.2f}s; wrote {args.out}")